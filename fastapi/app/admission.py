@@ -0,0 +1,222 @@
+import asyncio
+import math
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from starlette.responses import JSONResponse
+
+from app.metrics import ADMISSION_REJECTED
+
+# Requêtes admises au total (en réception, en attente ou en cours) avant de répondre 503
+ADMISSION_MAX_PENDING = int(os.environ.get("ADMISSION_MAX_PENDING", "64"))
+# Requêtes simultanées par client avant de répondre 429
+ADMISSION_MAX_PER_CLIENT = int(os.environ.get("ADMISSION_MAX_PER_CLIENT", "8"))
+# Requêtes décodées / transcrites en même temps ; les autres attendent, les plus courtes d'abord
+ADMISSION_MAX_ACTIVE = int(os.environ.get("ADMISSION_MAX_ACTIVE", "16"))
+# Secondes de priorité gagnées par seconde d'attente (vieillissement du plus-court-d'abord)
+SJF_AGING_RATE = float(os.environ.get("SJF_AGING_RATE", "1.0"))
+# En-tête identifiant le client (à défaut, son adresse IP)
+CLIENT_ID_HEADER = "x-client-id"
+
+_MAX_RETRY_AFTER_S = 60
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée : 503 si le service est saturé, 429 si le client dépasse sa limite."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    expected_s: float
+    enqueued: float
+    future: asyncio.Future
+
+
+@dataclass
+class Ticket:
+    """Place réservée par une requête admise, libérée à la fin de sa réponse."""
+    controller: "AdmissionController"
+    client: str
+    expected_s: float = 0.0
+    active_since: float | None = None
+    released: bool = field(default=False)
+
+    async def start(self, expected_s: float) -> None:
+        """Attend un créneau de traitement ; ``expected_s`` est la durée audio estimée."""
+        self.expected_s = expected_s
+        await self.controller._acquire_active(self)
+        if self.released:
+            # Ticket libéré pendant l'attente : personne ne rendrait ce créneau
+            self.controller._release_active()
+            raise asyncio.CancelledError
+        self.active_since = time.monotonic()
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Contrôle d'admission des requêtes de transcription.
+
+    Deux niveaux :
+
+    - à l'arrivée (avant même la réception du corps), la requête réserve une
+      place parmi ``max_pending`` au total et ``max_per_client`` pour son
+      client ; sinon elle est refusée tout de suite (503 ou 429, avec
+      ``Retry-After``) au lieu de s'empiler dans uvicorn ;
+    - une fois l'audio reçu et sa durée lue dans l'en-tête, elle attend l'un
+      des ``max_active`` créneaux de décodage/transcription. Les créneaux
+      libérés vont à la requête la plus courte, avec vieillissement
+      (``aging_rate`` secondes de priorité gagnées par seconde d'attente).
+
+    ``Retry-After`` est estimé à partir du travail en attente et du facteur
+    temps réel observé sur les requêtes terminées.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = ADMISSION_MAX_PENDING,
+        max_per_client: int = ADMISSION_MAX_PER_CLIENT,
+        max_active: int = ADMISSION_MAX_ACTIVE,
+        aging_rate: float = SJF_AGING_RATE,
+    ):
+        self.max_pending = max_pending
+        self.max_per_client = max_per_client
+        self.max_active = max_active
+        self.aging_rate = aging_rate
+        self.pending = 0
+        self.active = 0
+        self.rejected = Counter()
+        self._per_client: Counter[str] = Counter()
+        self._waiters: list[_Waiter] = []
+        # Temps de traitement / durée audio, moyenne glissante
+        self._rtf = 0.5
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def oldest_wait(self) -> float:
+        """Attente (s) de la plus ancienne requête en attente d'un créneau."""
+        if not self._waiters:
+            return 0.0
+        return time.monotonic() - min(waiter.enqueued for waiter in self._waiters)
+
+    def reserve(self, client: str) -> Ticket:
+        if self.pending >= self.max_pending:
+            self.rejected["overloaded"] += 1
+            ADMISSION_REJECTED.labels("overloaded").inc()
+            raise AdmissionRejected(503, "Service saturé, réessayer plus tard.", self.retry_after())
+        if self._per_client[client] >= self.max_per_client:
+            self.rejected["client_limit"] += 1
+            ADMISSION_REJECTED.labels("client_limit").inc()
+            raise AdmissionRejected(429, "Trop de requêtes simultanées pour ce client.", self.retry_after())
+        self.pending += 1
+        self._per_client[client] += 1
+        return Ticket(self, client)
+
+    def retry_after(self) -> int:
+        """Délai (s) estimé avant qu'une place se libère."""
+        queued_s = sum(waiter.expected_s for waiter in self._waiters)
+        estimate = queued_s * self._rtf / max(1, self.max_active)
+        return max(1, min(_MAX_RETRY_AFTER_S, math.ceil(estimate)))
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_pending": self.max_pending,
+            "max_per_client": self.max_per_client,
+            "max_active": self.max_active,
+            "rejected": dict(self.rejected),
+        }
+
+    async def _acquire_active(self, ticket: Ticket) -> None:
+        if self.active < self.max_active and not self._waiters:
+            self.active += 1
+            return
+        waiter = _Waiter(ticket.expected_s, time.monotonic(), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif not waiter.future.cancelled():
+                # Le créneau venait d'être transmis : le rendre
+                self._release_active()
+            raise
+
+    def _release_active(self) -> None:
+        if self._waiters:
+            # Le créneau passe directement à la requête de plus petite priorité effective
+            now = time.monotonic()
+            waiter = min(self._waiters, key=lambda w: w.expected_s - self.aging_rate * (now - w.enqueued))
+            self._waiters.remove(waiter)
+            waiter.future.set_result(None)
+        else:
+            self.active -= 1
+
+    def _release(self, ticket: Ticket) -> None:
+        self.pending -= 1
+        self._per_client[ticket.client] -= 1
+        if self._per_client[ticket.client] <= 0:
+            del self._per_client[ticket.client]
+        if ticket.active_since is not None:
+            if ticket.expected_s > 0:
+                rtf = (time.monotonic() - ticket.active_since) / ticket.expected_s
+                self._rtf = 0.9 * self._rtf + 0.1 * rtf
+            self._release_active()
+
+
+class AdmissionMiddleware:
+    """
+    Middleware ASGI : réserve une place pour chaque requête des routes
+    ``paths`` avant la lecture du corps, et la libère une fois la réponse
+    entièrement envoyée (flux compris). Le ticket est disponible dans
+    ``request.state.admission``.
+    """
+
+    def __init__(self, app, controller: AdmissionController, paths: tuple[str, ...]):
+        self.app = app
+        self.controller = controller
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        client = headers.get(CLIENT_ID_HEADER.encode(), b"").decode("latin-1")
+        if not client:
+            client = scope["client"][0] if scope.get("client") else "unknown"
+        try:
+            ticket = self.controller.reserve(client)
+        except AdmissionRejected as exc:
+            response = JSONResponse(
+                {"detail": exc.detail},
+                status_code=exc.status_code,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["admission"] = ticket
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            ticket.release()
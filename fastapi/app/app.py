@@ -1,53 +1,551 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from contextlib import asynccontextmanager
+from dataclasses import replace
+
+from fastapi import Depends, FastAPI, UploadFile, File, HTTPException, Query, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from faster_whisper import WhisperModel
-import shutil
+import numpy as np
+import asyncio
+import json
 import os
-import uuid
+import time
+
+from app.admission import SJF_AGING_RATE, AdmissionController, AdmissionMiddleware
+from app.audio import AudioDecodeError, decode_upload, probe_duration
+from app.batch import BatchInputError, expand_uploads
+from app.cache import TranscriptionCache, file_digest
+from app.chunking import LONG_AUDIO_MIN_S, transcribe_chunked
+from app.inference import SAMPLING_RATE, DecodeOptions, TranscriptionResult, transcribe_batch, transcribe_stream
+from app.jobs import JobManager
+from app.metrics import (
+    ADMISSION_ACTIVE,
+    ADMISSION_WAITING,
+    MODEL_MEMORY,
+    MODEL_REQUESTS,
+    QUEUE_DEPTH,
+    RequestTimings,
+    instrument_requests,
+    render_metrics,
+)
+from app.policy import DECODING_TIERS, Decision, DecodingPolicy
+from app.realtime import serve_realtime
+from app.registry import DEFAULT_MODEL, MODEL_VARIANTS, ModelRegistry, UnknownModel, parse_variants
+from app.replicas import REPLICAS, ReplicaPool
+from app.scheduler import MicroBatchScheduler
+from app.startup import MODEL_WARMUP, ModelHolder, warmup_model
+from app.stub import STUB_MODEL, StubModel, stub_transcribe_batch, stub_transcribe_stream
+
+# Paramètres du micro-batching (surchargeables par variables d'environnement)
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "8"))
+BATCH_WINDOW_MS = float(os.environ.get("BATCH_WINDOW_MS", "20"))
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "1"))
+# VAD Silero avant décodage (1) : saute les silences, mais la précision diffère des benchmarks des notebooks
+VAD_FILTER = os.environ.get("VAD_FILTER", "0") == "1"
+
+# Modèle CTranslate2 local, chargé en arrière-plan au démarrage (voir lifespan)
+MODEL_PATH = os.environ.get("MODEL_PATH", "/app/models/whisper-large-v3-french-distil-dec16-ct2/ctranslate2")
+COMPUTE_TYPE = os.environ.get("COMPUTE_TYPE", "int8")
+
+# Variantes sélectionnables par requête (?model=), chargées à la première utilisation
+registry = ModelRegistry(
+    parse_variants(MODEL_VARIANTS, MODEL_PATH, COMPUTE_TYPE),
+    DEFAULT_MODEL,
+    load=lambda variant: StubModel(variant) if STUB_MODEL else WhisperModel(
+        variant.path, device="cpu", compute_type=variant.compute_type, num_workers=INFERENCE_WORKERS
+    ),
+)
+
+# Modèle factice (STUB_MODEL=1) : pas de préchauffage ni de réplicas, inférence simulée
+run_batch = stub_transcribe_batch if STUB_MODEL else transcribe_batch
+run_stream = stub_transcribe_stream if STUB_MODEL else transcribe_stream
+warmup = MODEL_WARMUP and not STUB_MODEL
+
+# Paramètres de décodage historiques de l'API (sans VAD, segments horodatés par Whisper)
+DEFAULT_OPTIONS = DecodeOptions(
+    beam_size=5,
+    language="fr",
+    condition_on_previous_text=False,
+    vad_filter=VAD_FILTER,
+    variant=registry.default,
+)
+WARMUP_OPTIONS = DEFAULT_OPTIONS if warmup else None
+if warmup:
+    registry.warmup = lambda model: warmup_model(model, DEFAULT_OPTIONS)
+
+if REPLICAS > 0 and not STUB_MODEL:
+    # Plusieurs processus, chacun avec sa copie du modèle et ses propres cœurs :
+    # un batch par réplica, envoyé au moins chargé (variante par défaut uniquement)
+    models = None
+    default_variant = registry.variants[registry.default]
+    replicas = ReplicaPool(
+        default_variant.path,
+        default_variant.compute_type,
+        batch_size=BATCH_MAX_SIZE,
+        warmup_options=WARMUP_OPTIONS,
+    )
+    batch_runner = replicas.transcribe_batch
+    stream_runner = replicas.transcribe_stream
+    scheduler_workers = REPLICAS
+else:
+    replicas = None
+    # Le préchauffage du modèle par défaut est fait (et chronométré) par ModelHolder
+    models = ModelHolder(lambda: registry.load(warmup=False), DEFAULT_OPTIONS, warmup=warmup)
+    MODEL_MEMORY.set_function(lambda: registry.stats()["memory_bytes"])
+
+    # Les runners attendent la fin du chargement : les requêtes déjà en file ne sont pas perdues
+    def batch_runner(audios, options):
+        models.wait()
+        with registry.use(options.variant) as model:
+            return run_batch(model, audios, options, batch_size=BATCH_MAX_SIZE)
+
+    def stream_runner(audio, options):
+        models.wait()
+        # Le modèle reste réservé jusqu'au dernier segment
+        with registry.use(options.variant) as model:
+            yield from run_stream(model, audio, options)
 
-app = FastAPI(title="ASR Whisper API")
+    scheduler_workers = INFERENCE_WORKERS
 
-# Charger le modèle une fois au démarrage (modèle CTranslate2 local)
-MODEL_PATH = "/app/models/whisper-large-v3-french-distil-dec16-ct2/ctranslate2"
-model = WhisperModel(MODEL_PATH, device="cpu", compute_type="int8")
+# Les requêtes sont regroupées en batches et exécutées hors de la boucle asyncio
+scheduler = MicroBatchScheduler(
+    batch_runner,
+    max_batch_size=BATCH_MAX_SIZE,
+    window_s=BATCH_WINDOW_MS / 1000,
+    workers=scheduler_workers,
+    stream_runner=stream_runner,
+    aging_rate=SJF_AGING_RATE,
+)
+
+# Places limitées pour les transcriptions synchrones : refus rapide (429/503) plutôt qu'empilement
+admission = AdmissionController()
+
+QUEUE_DEPTH.set_function(lambda: scheduler.queue_depth)
+ADMISSION_WAITING.set_function(lambda: admission.waiting)
+ADMISSION_ACTIVE.set_function(lambda: admission.active)
+
+# Paramètres de décodage par requête : niveau demandé, dégradé si l'attente menace l'objectif de latence
+policy = DecodingPolicy(DEFAULT_OPTIONS, current_wait=lambda: max(admission.oldest_wait, scheduler.oldest_wait))
+TIER_PATTERN = f"^({'|'.join(DECODING_TIERS)})$"
+
+# Résultats déjà calculés, indexés par contenu audio + options + modèle
+cache = TranscriptionCache()
+
+# Jobs asynchrones pour les longs enregistrements (file SQLite persistante)
+jobs = JobManager(scheduler, DEFAULT_OPTIONS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Le chargement du modèle ne bloque pas le démarrage : /healthz répond tout de suite,
+    # /readyz seulement une fois le modèle chargé et préchauffé
+    if replicas is not None:
+        replicas.start()
+    else:
+        models.start()
+    scheduler.start()
+    jobs.start()
+    yield
+    await jobs.stop()
+    await scheduler.stop()
+    if replicas is not None:
+        await run_in_threadpool(replicas.stop)
+    else:
+        await models.stop()
+
+app = FastAPI(title="ASR Whisper API", lifespan=lifespan)
+
+# Réservation d'une place avant même la réception de l'upload
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=admission,
+    paths=("/transcribe", "/transcribe/stream", "/transcribe/batch"),
+)
+# Requêtes en cours, durée et code de retour de chaque requête HTTP (exportés sur /metrics)
+app.middleware("http")(instrument_requests)
 
 class Segment(BaseModel):
     start: float
     end: float
     text: str
 
+class Decoding(BaseModel):
+    tier: str
+    model: str
+    beam_size: int
+    best_of: int
+    temperatures: list[float]
+    vad_filter: bool
+    degraded: bool
+
 class Transcription(BaseModel):
     language_detected: str
     segments: list[Segment]
+    decoding: Decoding | None = None
+
+class BatchItem(BaseModel):
+    language_detected: str | None = None
+    duration: float | None = None
+    segments: list[Segment] = []
+    error: str | None = None
 
-@app.post("/transcribe", response_model=Transcription)
-async def transcribe(file: UploadFile = File(...)):
+class BatchTranscription(BaseModel):
+    results: dict[str, BatchItem]
+    decoding: Decoding
+
+class JobCreated(BaseModel):
+    id: str
+    status: str
+
+class Job(BaseModel):
+    id: str
+    filename: str
+    status: str
+    language_detected: str | None
+    duration: float | None
+    progress: float
+    error: str | None
+    created_at: float
+    updated_at: float
+    segments: list[Segment]
+
+
+def model_ready() -> bool:
+    return replicas.ready if replicas is not None else models.ready
+
+
+def require_ready():
+    # Tant que le modèle n'est pas prêt, refuser plutôt que de laisser la requête attendre
+    if not model_ready():
+        raise HTTPException(status_code=503, detail="Modèle en cours de chargement.", headers={"Retry-After": "5"})
+
+
+def decide(tier: str | None, model: str | None) -> Decision:
+    # Variante demandée (défaut si absente) et niveau de décodage autorisé par la charge
+    try:
+        name = registry.resolve(model)
+    except UnknownModel:
+        raise HTTPException(status_code=400, detail=f"Modèle inconnu : {model}")
+    if replicas is not None and name != registry.default:
+        raise HTTPException(status_code=400, detail="Avec REPLICAS > 0, seul le modèle par défaut est servi.")
+    MODEL_REQUESTS.labels(name).inc()
+    decision = policy.choose(tier)
+    return replace(decision, options=replace(decision.options, variant=name))
+
+
+def check_audio_format(file: UploadFile):
     # Vérification plus souple du format audio
     filename = file.filename.lower()
     if not (filename.endswith(".wav") or filename.endswith(".mp3")):
         raise HTTPException(status_code=400, detail="Format audio non supporté (wav ou mp3 uniquement).")
 
-    # Sauvegarder temporairement le fichier
-    temp_filename = f"/tmp/{uuid.uuid4().hex}_{file.filename}"
-    with open(temp_filename, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Transcrire
-    segments, info = model.transcribe(
-        temp_filename,
-        beam_size=5,
-        language="fr",
-        condition_on_previous_text=False
-    )
 
-    # Supprimer le fichier temporaire
-    os.remove(temp_filename)
+async def wait_turn(request: Request, file: UploadFile, timings: RequestTimings):
+    # Durée lue dans l'en-tête, sans décoder : les audios courts passent en premier
+    duration = await run_in_threadpool(probe_duration, file.file)
+    if duration is None:
+        # En-tête illisible : estimation d'après la taille (mp3 à 128 kbit/s)
+        duration = (file.size or 0) / 16000
+    with timings.stage("admission"):
+        await request.state.admission.start(duration)
+
+
+async def infer(audio: np.ndarray, options: DecodeOptions) -> TranscriptionResult:
+    # Les longs audios sont découpés aux silences et leurs morceaux transcrits en parallèle
+    if len(audio) > LONG_AUDIO_MIN_S * SAMPLING_RATE:
+        return await transcribe_chunked(scheduler, audio, options)
+    # Sinon la requête rejoint le prochain micro-batch
+    return await scheduler.submit(audio, options)
+
+
+async def read_audio(file: UploadFile, timings: RequestTimings):
+    check_audio_format(file)
+
+    # Décoder l'audio directement depuis l'upload, hors de la boucle asyncio
+    try:
+        with timings.stage("decode"):
+            return await run_in_threadpool(decode_upload, file.file)
+    except AudioDecodeError:
+        raise HTTPException(status_code=400, detail="Fichier audio illisible.")
+    finally:
+        await file.close()
+
+
+@app.post("/transcribe", response_model=Transcription, dependencies=[Depends(require_ready)])
+async def transcribe(
+    request: Request,
+    file: UploadFile = File(...),
+    tier: str | None = Query(None, pattern=TIER_PATTERN),
+    model: str | None = Query(None),
+):
+    timings = RequestTimings("/transcribe", request)
+    check_audio_format(file)
+    decision = decide(tier, model)
+
+    # Un fichier déjà transcrit avec les mêmes paramètres n'est ni décodé ni retranscrit
+    digest = await run_in_threadpool(file_digest, file.file)
+    key = cache.make_key(digest, decision.options, registry.model_id(decision.options.variant))
+
+    if (result := cache.get(key)) is None:
+        # Admission et décodage restent propres à chaque requête : seule l'inférence est partagée
+        await wait_turn(request, file, timings)
+        audio = await read_audio(file, timings)
+
+        async def compute():
+            start = time.perf_counter()
+            result = await infer(audio, decision.options)
+            timings.add_inference(result, time.perf_counter() - start)
+            policy.observe(timings.stages.get("admission", 0.0) + timings.stages.get("queue", 0.0))
+            return result
+
+        result = await cache.get_or_compute(key, compute)
+
+    # Construire la réponse (sérialisée ici pour en mesurer le coût)
+    with timings.stage("serialize"):
+        body = Transcription(
+            language_detected=result.language,
+            segments=result.segments,
+            decoding=decision.describe(),
+        ).model_dump_json()
+    timings.observe()
+    return Response(body, media_type="application/json", headers=timings.headers())
+
+
+@app.post("/transcribe/stream", dependencies=[Depends(require_ready)])
+async def transcribe_streaming(
+    request: Request,
+    file: UploadFile = File(...),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$"),
+    tier: str | None = Query(None, pattern=TIER_PATTERN),
+    model: str | None = Query(None),
+):
+    """
+    Transcription en flux : les métadonnées (langue, durée, paramètres de
+    décodage) sont envoyées d'abord, puis chaque segment dès qu'il est décodé,
+    en NDJSON (une ligne JSON par message) ou en Server-Sent Events (``format=sse``).
+    """
+    timings = RequestTimings("/transcribe/stream", request)
+    check_audio_format(file)
+    # Le créneau reste occupé jusqu'à la fin du flux (libéré par AdmissionMiddleware)
+    await wait_turn(request, file, timings)
+    policy.observe(timings.stages.get("admission", 0.0))
+    decision = decide(tier, model)
+    audio = await read_audio(file, timings)
+    # L'en-tête part avant le décodage : il ne contient que la réception et le décodage audio
+    headers = timings.headers()
+
+    def encode(event: str, data: dict) -> str:
+        payload = json.dumps(data, ensure_ascii=False)
+        if format == "sse":
+            return f"event: {event}\ndata: {payload}\n\n"
+        return payload + "\n"
+
+    async def events():
+        start = time.perf_counter()
+        try:
+            async for item in scheduler.stream(audio, decision.options):
+                if isinstance(item, TranscriptionResult):
+                    yield encode("transcription", {
+                        "language_detected": item.language,
+                        "duration": item.duration,
+                        "decoding": decision.describe(),
+                    })
+                else:
+                    yield encode("segment", item)
+        except Exception as exc:
+            yield encode("error", {"error": str(exc)})
+            return
+        # Décodage séquentiel : les étapes du modèle ne sont pas séparées
+        elapsed = time.perf_counter() - start
+        timings.add("transcribe", elapsed)
+        timings.observe_audio(len(audio) / SAMPLING_RATE, elapsed)
+        timings.observe()
+        # En NDJSON la fin du flux suffit ; en SSE on la signale explicitement
+        if format == "sse":
+            yield encode("end", {})
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers=headers)
+
+
+@app.post("/transcribe/batch", response_model=BatchTranscription, dependencies=[Depends(require_ready)])
+async def transcribe_many(
+    request: Request,
+    files: list[UploadFile] = File(...),
+    tier: str | None = Query(None, pattern=TIER_PATTERN),
+    model: str | None = Query(None),
+    stream: bool = Query(False),
+):
+    """
+    Transcription de plusieurs fichiers en une requête : wav/mp3 et archives
+    zip/tar (dont les fichiers audio sont extraits). Les fichiers sont décodés
+    en parallèle et soumis ensemble au micro-batching, qui les transcrit par
+    batches. Les résultats sont indexés par nom de fichier ; un fichier
+    illisible donne une entrée ``error`` sans faire échouer les autres.
+
+    Avec ``stream=true``, la réponse est en NDJSON : une première ligne avec
+    le nombre de fichiers et les paramètres de décodage, puis une ligne par
+    fichier (champ ``filename``) dès qu'il est transcrit.
+    """
+    timings = RequestTimings("/transcribe/batch", request)
+    try:
+        items = await run_in_threadpool(expand_uploads, [(file.filename, file.file) for file in files])
+    except BatchInputError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    # Un seul créneau pour tout le lot, priorité selon la durée audio totale
+    durations = await asyncio.gather(*(run_in_threadpool(probe_duration, fileobj) for _, fileobj in items))
+    with timings.stage("admission"):
+        await request.state.admission.start(sum(duration or 0.0 for duration in durations))
+    policy.observe(timings.stages["admission"])
+    decision = decide(tier, model)
+    model_id = registry.model_id(decision.options.variant)
+
+    async def transcribe_one(name: str, fileobj) -> tuple[str, dict]:
+        digest = await run_in_threadpool(file_digest, fileobj)
+        key = cache.make_key(digest, decision.options, model_id)
+
+        try:
+            if (result := cache.get(key)) is None:
+                # Décodé ici : la tâche partagée du cache ne lit pas les fichiers de la requête
+                audio = await run_in_threadpool(decode_upload, fileobj)
+
+                async def compute():
+                    start = time.perf_counter()
+                    result = await infer(audio, decision.options)
+                    timings.observe_audio(result.duration, sum(result.timings.values()) or time.perf_counter() - start)
+                    return result
+
+                result = await cache.get_or_compute(key, compute)
+        except AudioDecodeError:
+            return name, {"error": "Fichier audio illisible."}
+        except Exception as exc:
+            return name, {"error": str(exc)}
+        return name, {"language_detected": result.language, "duration": result.duration, "segments": result.segments}
+
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(transcribe_one(name, fileobj)) for name, fileobj in items]
+
+    def finish():
+        timings.add("transcribe", time.perf_counter() - start)
+        timings.observe()
+
+    if not stream:
+        results = dict(await asyncio.gather(*tasks))
+        finish()
+        body = BatchTranscription(results=results, decoding=decision.describe()).model_dump_json()
+        return Response(body, media_type="application/json", headers=timings.headers())
+
+    async def lines():
+        try:
+            yield json.dumps({"files": len(items), "decoding": decision.describe()}) + "\n"
+            for task in asyncio.as_completed(tasks):
+                name, item = await task
+                item = BatchItem(**item).model_dump()
+                yield json.dumps({"filename": name, **item}, ensure_ascii=False) + "\n"
+            finish()
+        finally:
+            # Client déconnecté : ne pas transcrire le reste pour rien
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=timings.headers())
+
+
+@app.websocket("/transcribe/ws")
+async def transcribe_realtime(websocket: WebSocket):
+    # Dictée en temps réel : PCM 16 bits 16 kHz en entrée, hypothèses partielles et finales en sortie
+    if not model_ready():
+        # 1013 : « try again later »
+        await websocket.close(code=1013)
+        return
+    await serve_realtime(websocket, scheduler, DEFAULT_OPTIONS)
+
+
+@app.post("/jobs", response_model=JobCreated, status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    # Transcription différée : l'audio est mis en file et l'identifiant retourné immédiatement
+    check_audio_format(file)
+    try:
+        job_id = await jobs.submit(file.file, file.filename)
+    finally:
+        await file.close()
+    return {"id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str, since: int = Query(0, ge=0)):
+    # État, progression et segments déjà transcrits (à partir du segment n° since)
+    job = await jobs.get(job_id, since)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job inconnu.")
+    return job
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    # Places occupées, requêtes en attente d'un créneau et refus (saturation, limite par client)
+    return admission.stats()
+
+
+@app.get("/decoding/policy")
+async def decoding_policy():
+    # Niveaux de décodage disponibles, niveau minimal imposé par la charge et attente observée
+    return policy.stats()
+
+
+@app.get("/models")
+async def models_stats():
+    # Variantes déclarées, modèles chargés, mémoire occupée et requêtes en cours par variante
+    return registry.stats()
+
+
+@app.post("/models/{name}/reload")
+async def reload_model(name: str, path: str | None = None, compute_type: str | None = None):
+    # Remplacement à chaud : la nouvelle version est chargée et préchauffée à côté de l'ancienne
+    if replicas is not None:
+        raise HTTPException(status_code=409, detail="Remplacement à chaud indisponible avec REPLICAS > 0.")
+    try:
+        return await run_in_threadpool(registry.reload, name, path, compute_type)
+    except UnknownModel:
+        raise HTTPException(status_code=404, detail="Modèle inconnu.")
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"Échec du chargement : {exc}")
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    # Compteurs du cache de transcriptions (succès mémoire/disque, échecs, requêtes fusionnées)
+    return cache.stats()
+
+
+@app.get("/replicas")
+async def replicas_stats():
+    # État des processus réplicas (vide quand le modèle est chargé dans le processus de l'API)
+    return replicas.stats() if replicas is not None else []
+
+
+@app.get("/metrics")
+async def metrics():
+    # Histogrammes par étape, RTF, file d'attente et requêtes en cours au format Prometheus
+    body, media_type = render_metrics()
+    return Response(body, media_type=media_type)
+
 
-    # Construire la réponse
-    result = {
-        "language_detected": info.language,
-        "segments": [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
-    }
+@app.get("/healthz")
+async def healthz():
+    # Vivacité : le processus répond, que le modèle soit chargé ou non
+    return {"status": "ok"}
 
-    return result
 
+@app.get("/readyz")
+async def readyz():
+    # Préparation : 200 seulement quand le modèle est chargé et préchauffé
+    if replicas is not None:
+        ready = replicas.ready
+        body = {"status": "ready" if ready else "loading", "replicas": replicas.stats()}
+    else:
+        ready = models.ready
+        body = {"status": models.status, "error": models.error, "timings": models.timings}
+    return JSONResponse(body, status_code=200 if ready else 503)
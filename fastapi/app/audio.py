@@ -0,0 +1,130 @@
+import os
+import struct
+from typing import BinaryIO
+
+import av
+import numpy as np
+from faster_whisper import decode_audio
+
+from app.inference import SAMPLING_RATE
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+
+
+class AudioDecodeError(ValueError):
+    """Le contenu envoyé n'a pas pu être décodé en audio."""
+
+
+def _find_wav_data(fileobj: BinaryIO) -> tuple[tuple, int] | None:
+    """
+    Parcourt les chunks RIFF d'un WAV jusqu'au chunk ``data``.
+
+    Retourne le contenu du chunk ``fmt `` et la taille des données, le
+    fichier étant positionné au début des échantillons ; None si ce n'est
+    pas un WAV.
+    """
+    header = fileobj.read(12)
+    if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    while True:
+        chunk_header = fileobj.read(8)
+        if len(chunk_header) < 8:
+            return None
+        chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack("<HHIIHH", fileobj.read(16))
+            fileobj.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+        elif chunk_id == b"data":
+            break
+        else:
+            fileobj.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+    if fmt is None:
+        return None
+    return fmt, chunk_size
+
+
+def _read_wav_16k_mono(fileobj: BinaryIO) -> np.ndarray | None:
+    """
+    Lit directement un WAV mono 16 kHz (PCM 16 bits ou float 32 bits).
+
+    Retourne None si le fichier n'est pas dans ce format : il faut alors
+    passer par le décodeur générique (rééchantillonnage, mp3...).
+    """
+    found = _find_wav_data(fileobj)
+    if found is None:
+        return None
+    fmt, chunk_size = found
+    format_tag, channels, sample_rate, _, _, bits = fmt
+    if channels != 1 or sample_rate != SAMPLING_RATE:
+        return None
+
+    data = fileobj.read(chunk_size)
+    if format_tag == _WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        return np.frombuffer(data, dtype="<f4", count=len(data) // 4)
+    if format_tag == _WAVE_FORMAT_PCM and bits == 16:
+        return np.frombuffer(data, dtype="<i2", count=len(data) // 2).astype(np.float32) / 32768.0
+    return None
+
+
+def decode_upload(fileobj: BinaryIO) -> np.ndarray:
+    """
+    Décode un fichier audio (wav/mp3) lu depuis la mémoire en PCM 16 kHz mono float32.
+
+    Les WAV déjà au bon format sont convertis sans passer par FFmpeg ;
+    les autres sont décodés et rééchantillonnés par PyAV.
+
+    Paramètres
+    ----------
+    fileobj : BinaryIO
+        Fichier ouvert en lecture (BytesIO, SpooledTemporaryFile...).
+
+    Retour
+    ------
+    np.ndarray
+        Signal float32 échantillonné à 16 kHz.
+    """
+    try:
+        fileobj.seek(0)
+        audio = _read_wav_16k_mono(fileobj)
+        if audio is None:
+            fileobj.seek(0)
+            audio = decode_audio(fileobj, sampling_rate=SAMPLING_RATE)
+    except (av.error.FFmpegError, struct.error, ValueError) as exc:
+        raise AudioDecodeError(str(exc)) from exc
+    return audio
+
+
+def probe_duration(fileobj: BinaryIO) -> float | None:
+    """
+    Estime la durée (s) d'un fichier audio à partir de ses en-têtes, sans le décoder.
+
+    WAV : taille du chunk ``data`` divisée par le débit d'octets. Autres
+    formats : durée annoncée par le conteneur (PyAV ne lit que l'en-tête et
+    les premières trames). Retourne None si la durée est inconnue ; le
+    fichier est remis au début dans tous les cas.
+    """
+    try:
+        fileobj.seek(0)
+        found = _find_wav_data(fileobj)
+        if found is not None:
+            (_, _, _, byte_rate, _, _), data_size = found
+            # WAV écrit en flux : la taille annoncée peut dépasser le fichier réel
+            data_start = fileobj.tell()
+            data_size = min(data_size, fileobj.seek(0, os.SEEK_END) - data_start)
+            return data_size / byte_rate if byte_rate else None
+        fileobj.seek(0)
+        with av.open(fileobj, mode="r", metadata_errors="ignore") as container:
+            if container.duration is not None:
+                return container.duration / av.time_base
+            stream = container.streams.audio[0]
+            if stream.duration is not None:
+                return float(stream.duration * stream.time_base)
+        return None
+    except (av.error.FFmpegError, struct.error, ValueError, IndexError):
+        return None
+    finally:
+        fileobj.seek(0)
@@ -0,0 +1,92 @@
+import io
+import os
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+from typing import BinaryIO, Callable
+
+# Nombre maximal de fichiers audio par requête /transcribe/batch (archives dépliées)
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "256"))
+# Taille décompressée maximale des fichiers audio extraits d'une archive
+BATCH_ARCHIVE_MAX_BYTES = int(os.environ.get("BATCH_ARCHIVE_MAX_MB", "512")) * 1024 * 1024
+
+AUDIO_EXTENSIONS = (".wav", ".mp3")
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz")
+
+
+class BatchInputError(ValueError):
+    """Le contenu d'une requête /transcribe/batch n'est pas exploitable."""
+
+
+def _is_audio(name: str) -> bool:
+    return name.lower().endswith(AUDIO_EXTENSIONS)
+
+
+def _zip_members(fileobj: BinaryIO) -> list[tuple[str, int, Callable[[], bytes]]]:
+    archive = zipfile.ZipFile(fileobj)
+    return [
+        (info.filename, info.file_size, lambda info=info: archive.read(info))
+        for info in archive.infolist()
+        if not info.is_dir() and _is_audio(info.filename)
+    ]
+
+
+def _tar_members(fileobj: BinaryIO) -> list[tuple[str, int, Callable[[], bytes]]]:
+    archive = tarfile.open(fileobj=fileobj, mode="r:*")
+    return [
+        (member.name, member.size, lambda member=member: archive.extractfile(member).read())
+        for member in archive.getmembers()
+        if member.isfile() and _is_audio(member.name)
+    ]
+
+
+def expand_uploads(
+    uploads: list[tuple[str, BinaryIO]],
+    max_files: int = BATCH_MAX_FILES,
+    max_archive_bytes: int = BATCH_ARCHIVE_MAX_BYTES,
+) -> list[tuple[str, BinaryIO]]:
+    """
+    Liste les fichiers audio d'une requête batch, archives zip/tar dépliées.
+
+    Les membres audio d'une archive sont lus en mémoire et nommés par leur
+    chemin dans l'archive ; les autres membres sont ignorés. Les tailles
+    annoncées par l'archive sont vérifiées avant extraction (``max_archive_bytes``
+    au total). Un même nom reçu deux fois est suffixé (``a.wav#2``) pour que
+    chaque résultat garde sa clé.
+
+    Lève BatchInputError si un fichier n'est ni audio ni archive, si une
+    archive est illisible ou si les limites sont dépassées.
+    """
+    files, names = [], set()
+    extracted = 0
+
+    def add(name: str, fileobj: BinaryIO) -> None:
+        if len(files) >= max_files:
+            raise BatchInputError(f"Trop de fichiers (maximum {max_files}).")
+        unique, index = name, 1
+        while unique in names:
+            index += 1
+            unique = f"{name}#{index}"
+        names.add(unique)
+        files.append((unique, fileobj))
+
+    for filename, fileobj in uploads:
+        lowered = filename.lower()
+        if _is_audio(lowered):
+            add(filename, fileobj)
+            continue
+        if not lowered.endswith(ARCHIVE_EXTENSIONS):
+            raise BatchInputError(f"{filename} : format non supporté (wav, mp3, zip ou tar).")
+        try:
+            fileobj.seek(0)
+            members = _zip_members(fileobj) if lowered.endswith(".zip") else _tar_members(fileobj)
+            for name, size, read in members:
+                extracted += size
+                if extracted > max_archive_bytes:
+                    raise BatchInputError(f"{filename} : archive trop volumineuse une fois décompressée.")
+                add(str(PurePosixPath(name)), io.BytesIO(read()))
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as exc:
+            raise BatchInputError(f"{filename} : archive illisible ({exc}).") from exc
+    if not files:
+        raise BatchInputError("Aucun fichier audio dans la requête.")
+    return files
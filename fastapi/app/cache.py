@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Awaitable, BinaryIO, Callable
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.inference import DecodeOptions, TranscriptionResult
+
+# Nombre de résultats gardés en mémoire (0 désactive le cache)
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "1024"))
+# Dossier du cache disque, conservé entre deux redémarrages (vide = pas de cache disque)
+CACHE_DIR = os.environ.get("CACHE_DIR", "")
+
+
+def file_digest(fileobj: BinaryIO) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier ouvert (remis au début ensuite)."""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    while chunk := fileobj.read(1024 * 1024):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+class TranscriptionCache:
+    """
+    Cache des transcriptions adressé par contenu.
+
+    La clé combine l'empreinte des octets audio, les paramètres de décodage
+    et l'identifiant du modèle : un même fichier transcrit avec d'autres
+    options ou un autre modèle donne une autre entrée.
+
+    Deux niveaux :
+
+    - une LRU en mémoire bornée à ``max_entries`` résultats ;
+    - un dossier optionnel de fichiers JSON (``directory``) qui survit aux
+      redémarrages et alimente la LRU.
+
+    Les requêtes identiques simultanées sont fusionnées (single-flight) :
+    un seul décodage est lancé et tous les appelants reçoivent son résultat.
+    Ce calcul partagé tourne dans une tâche détachée qui survit au premier
+    appelant : ``compute`` ne doit donc dépendre d'aucune ressource de sa
+    requête (ticket d'admission, upload), seulement de l'audio déjà décodé.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, directory: str | None = CACHE_DIR or None):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries: OrderedDict[str, TranscriptionResult] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self.directory is not None
+
+    @staticmethod
+    def make_key(audio_digest: str, options: DecodeOptions, model_id: str) -> str:
+        params = json.dumps({"model": model_id, **asdict(options)}, sort_keys=True)
+        return hashlib.sha256(f"{audio_digest}|{params}".encode()).hexdigest()
+
+    def get(self, key: str) -> TranscriptionResult | None:
+        """Résultat déjà en mémoire pour ``key`` (None sinon), sans rien calculer."""
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return result
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[TranscriptionResult]],
+    ) -> TranscriptionResult:
+        """
+        Retourne le résultat associé à ``key``, en le calculant avec ``compute``
+        s'il n'est ni en mémoire, ni sur disque, ni déjà en cours de calcul.
+        """
+        if not self.enabled:
+            self.misses += 1
+            return await compute()
+
+        result = self.get(key)
+        if result is not None:
+            return result
+
+        task = self._inflight.get(key)
+        if task is None:
+            # Tâche détachée : l'abandon du premier client n'annule pas les autres
+            task = asyncio.create_task(self._load_or_compute(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk": str(self.directory) if self.directory else None,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    async def _load_or_compute(self, key, compute) -> TranscriptionResult:
+        result = None
+        if self.directory is not None:
+            result = await run_in_threadpool(self._read_disk, key)
+        if result is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            result = await compute()
+            if self.directory is not None:
+                await run_in_threadpool(self._write_disk, key, result)
+        self._remember(key, result)
+        return result
+
+    def _remember(self, key: str, result: TranscriptionResult) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> TranscriptionResult | None:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return TranscriptionResult(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _write_disk(self, key: str, result: TranscriptionResult) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Écriture atomique : un redémarrage pendant l'écriture ne laisse pas de JSON tronqué
+        temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(result), f, ensure_ascii=False)
+        os.replace(temp_path, path)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+from dataclasses import dataclass
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from app.inference import SAMPLING_RATE, DecodeOptions, TranscriptionResult
+from app.scheduler import MicroBatchScheduler
+
+# Au-delà de cette durée, un audio est découpé et ses morceaux transcrits en parallèle
+LONG_AUDIO_MIN_S = float(os.environ.get("LONG_AUDIO_MIN_S", "120"))
+# Durée visée pour chaque morceau
+CHUNK_TARGET_S = float(os.environ.get("CHUNK_TARGET_S", "60"))
+# Recouvrement ajouté de part et d'autre d'une coupe faite en pleine parole
+CHUNK_OVERLAP_S = 1.0
+
+_MIN_SILENCE_MS = 300
+
+
+@dataclass
+class Chunk:
+    """
+    Morceau d'un long audio.
+
+    ``start``/``end`` délimitent la portion dont le morceau est responsable ;
+    ``audio_start``/``audio_end`` la portion réellement transcrite, élargie
+    d'un recouvrement quand la coupe tombe en pleine parole.
+    """
+    start: int
+    end: int
+    audio_start: int
+    audio_end: int
+
+
+def plan_chunks(audio: np.ndarray, target_s: float = CHUNK_TARGET_S, overlap_s: float = CHUNK_OVERLAP_S) -> list[Chunk]:
+    """
+    Découpe un audio en morceaux d'environ ``target_s`` secondes.
+
+    Les coupes sont placées au milieu des silences détectés par la VAD, au
+    plus près de la durée visée (entre 0,5 et 1,5 fois ``target_s``). Sans
+    silence dans cette plage, la coupe est faite à ``target_s`` et les deux
+    morceaux voisins se recouvrent de ``overlap_s`` secondes.
+    """
+    total = len(audio)
+    target = int(target_s * SAMPLING_RATE)
+    overlap = int(overlap_s * SAMPLING_RATE)
+    if total <= target * 3 // 2:
+        return [Chunk(0, total, 0, total)]
+
+    speech = get_speech_timestamps(audio, VadOptions(min_silence_duration_ms=_MIN_SILENCE_MS, speech_pad_ms=0))
+    silences = [(left["end"] + right["start"]) // 2 for left, right in zip(speech, speech[1:])]
+
+    # Frontières (position, coupe en pleine parole ?)
+    boundaries = [(0, False)]
+    start = 0
+    while total - start > target * 3 // 2:
+        candidates = [cut for cut in silences if start + target // 2 <= cut <= start + target * 3 // 2]
+        if candidates:
+            cut = min(candidates, key=lambda c: abs(c - (start + target)))
+            boundaries.append((cut, False))
+        else:
+            cut = start + target
+            boundaries.append((cut, True))
+        start = cut
+    boundaries.append((total, False))
+
+    chunks = []
+    for (start, hard_start), (end, hard_end) in zip(boundaries, boundaries[1:]):
+        chunks.append(Chunk(
+            start=start,
+            end=end,
+            audio_start=max(0, start - overlap) if hard_start else start,
+            audio_end=min(total, end + overlap) if hard_end else end,
+        ))
+    return chunks
+
+
+def stitch(chunks: list[Chunk], results: list[TranscriptionResult], duration: float) -> TranscriptionResult:
+    """
+    Recolle les transcriptions des morceaux en un seul résultat.
+
+    Les temps sont décalés pour redevenir absolus. Dans une zone de
+    recouvrement, le morceau de gauche garde les segments qui commencent
+    avant la coupe ; le morceau de droite ne garde que les segments dont
+    le milieu est après la fin du dernier segment retenu. Un même passage
+    n'est donc ni dupliqué ni perdu. Les temps des étapes du modèle sont
+    cumulés sur tous les morceaux.
+    """
+    stitched = TranscriptionResult(language=results[0].language, duration=duration)
+    covered_until = 0.0
+    for chunk, result in zip(chunks, results):
+        for stage, seconds in result.timings.items():
+            stitched.timings[stage] = stitched.timings.get(stage, 0.0) + seconds
+        segments, covered_until = chunk_segments(chunk, result, covered_until)
+        stitched.segments += segments
+    return stitched
+
+
+def chunk_segments(chunk: Chunk, result: TranscriptionResult, covered_until: float) -> tuple[list[dict], float]:
+    """
+    Segments d'un morceau retenus par ``stitch``, en temps absolus, et la
+    nouvelle fin de la portion couverte (``covered_until``).
+    """
+    offset = chunk.audio_start / SAMPLING_RATE
+    cut = chunk.end / SAMPLING_RATE
+    kept = []
+    for segment in result.segments:
+        start = round(segment["start"] + offset, 3)
+        end = round(segment["end"] + offset, 3)
+        if start < cut and (start + end) / 2 >= covered_until:
+            kept.append({**segment, "start": start, "end": end})
+            covered_until = end
+    return kept, covered_until
+
+
+async def transcribe_chunked(
+    scheduler: MicroBatchScheduler,
+    audio: np.ndarray,
+    options: DecodeOptions,
+    target_s: float = CHUNK_TARGET_S,
+) -> TranscriptionResult:
+    """
+    Transcrit un long audio en parallèle : les morceaux sont soumis
+    ensemble au scheduler, qui les répartit entre batches et workers.
+    """
+    chunks = await run_in_threadpool(plan_chunks, audio, target_s)
+    results = await asyncio.gather(*[
+        scheduler.submit(audio[chunk.audio_start:chunk.audio_end], options) for chunk in chunks
+    ])
+    return stitch(chunks, results, len(audio) / SAMPLING_RATE)
@@ -0,0 +1,428 @@
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Iterator
+
+import numpy as np
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import TranscriptionOptions, get_compression_ratio, get_suppressed_tokens
+from faster_whisper.vad import (
+    SpeechTimestampsMap,
+    VadOptions,
+    collect_chunks,
+    get_speech_timestamps,
+)
+
+SAMPLING_RATE = 16000
+
+
+@dataclass(frozen=True)
+class DecodeOptions:
+    """
+    Paramètres de décodage d'une requête.
+
+    Deux requêtes ne peuvent partager un batch que si leurs options sont égales
+    (la classe est hashable pour permettre ce regroupement).
+
+    ``temperatures`` : la première est utilisée pour tout le batch ; les
+    suivantes servent de repli (échantillonnage parmi ``best_of`` hypothèses)
+    pour les zones dont le résultat est trop répétitif ou trop peu probable.
+
+    Par défaut, l'audio est découpé en fenêtres fixes de 30 s sans VAD et le
+    modèle prédit les timestamps : les segments sont les phrases délimitées
+    par Whisper. Le résultat est proche de ``WhisperModel.transcribe`` des
+    notebooks (beam 5, sans VAD) sans lui être identique : les fenêtres ne
+    sont pas recalées sur le dernier timestamp (un mot à cheval sur deux
+    fenêtres peut être coupé), le premier timestamp n'est pas borné à 1 s
+    et le repli en température n'a lieu que si ``temperatures`` en prévoit
+    (niveau ``quality``). ``vad_filter`` ne garde que les zones de parole
+    détectées par Silero (plus rapide sur un audio avec des silences) ;
+    ``without_timestamps`` supprime la prédiction des timestamps et donne
+    un seul segment par zone.
+
+    ``variant`` nomme le modèle du registre qui transcrit la requête (None :
+    celui par défaut) ; il fait partie des options pour que chaque batch
+    n'utilise qu'un modèle.
+    """
+    beam_size: int = 5
+    language: str = "fr"
+    condition_on_previous_text: bool = False
+    best_of: int = 5
+    temperatures: tuple[float, ...] = (0.0,)
+    vad_filter: bool = False
+    without_timestamps: bool = False
+    variant: str | None = None
+
+
+@dataclass
+class TranscriptionResult:
+    """
+    Résultat d'une transcription : langue, durée de l'audio et segments.
+
+    ``timings`` donne le temps (s) passé dans chaque étape du modèle pour
+    ce résultat (``vad``, ``features``, ``encoder``, ``decoder``) ; dans un
+    batch, les étapes partagées sont comptées en entier pour chaque requête.
+    """
+    language: str
+    duration: float
+    segments: list = field(default_factory=list)
+    timings: dict = field(default_factory=dict)
+
+
+@dataclass
+class _PreparedAudio:
+    duration: float
+    speech_chunks: list
+    features: list
+    chunks_metadata: list
+    timings: dict
+
+
+class _TimedEncoder:
+    """Délègue au WhisperModel en mesurant le temps passé dans l'encodeur."""
+
+    def __init__(self, model: WhisperModel):
+        self._model = model
+        self.seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def encode(self, features):
+        start = time.perf_counter()
+        try:
+            return self._model.encode(features)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def _prepare_audio(model: WhisperModel, audio: np.ndarray, vad_filter: bool = False) -> _PreparedAudio:
+    """
+    Découpe un audio en zones de parole (VAD) de 30 s maximum et calcule
+    les features mel de chaque zone, comme le fait BatchedInferencePipeline.
+    Sans ``vad_filter``, les zones sont des fenêtres consécutives de 30 s.
+    """
+    chunk_length = model.feature_extractor.chunk_length
+    duration = audio.shape[0] / SAMPLING_RATE
+
+    start = time.perf_counter()
+    if vad_filter:
+        vad_options = VadOptions(max_speech_duration_s=chunk_length, min_silence_duration_ms=160)
+        speech_chunks = get_speech_timestamps(audio, vad_options)
+    else:
+        window = chunk_length * SAMPLING_RATE
+        speech_chunks = [
+            {"start": offset, "end": min(offset + window, audio.shape[0])}
+            for offset in range(0, audio.shape[0], window)
+        ]
+    timings = {"vad": time.perf_counter() - start}
+    if not speech_chunks:
+        return _PreparedAudio(duration, [], [], [], timings)
+
+    start = time.perf_counter()
+    audio_chunks, chunks_metadata = collect_chunks(audio, speech_chunks, max_duration=chunk_length)
+    features = [pad_or_trim(model.feature_extractor(chunk)[..., :-1]) for chunk in audio_chunks]
+    timings["features"] = time.perf_counter() - start
+    return _PreparedAudio(duration, speech_chunks, features, chunks_metadata, timings)
+
+
+def _transcription_options(tokenizer: Tokenizer, options: DecodeOptions) -> TranscriptionOptions:
+    # Valeurs par défaut de BatchedInferencePipeline.transcribe (faster-whisper 1.2.0)
+    return TranscriptionOptions(
+        beam_size=options.beam_size,
+        best_of=options.best_of,
+        patience=1,
+        length_penalty=1,
+        repetition_penalty=1,
+        no_repeat_ngram_size=0,
+        log_prob_threshold=-1.0,
+        no_speech_threshold=0.6,
+        compression_ratio_threshold=2.4,
+        condition_on_previous_text=False,
+        prompt_reset_on_temperature=0.5,
+        temperatures=list(options.temperatures),
+        initial_prompt=None,
+        prefix=None,
+        suppress_blank=True,
+        suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+        without_timestamps=options.without_timestamps,
+        # Non appliqué par la génération batchée (generate_segment_batched)
+        max_initial_timestamp=0.0,
+        word_timestamps=False,
+        prepend_punctuations="\"'“¿([{-",
+        append_punctuations="\"'.。,，!！?？:：”)]}、",
+        multilingual=False,
+        max_new_tokens=None,
+        clip_timestamps=[],
+        hallucination_silence_threshold=None,
+        hotwords=None,
+    )
+
+
+def _needs_fallback(avg_logprob: float, no_speech_prob: float, compression_ratio: float,
+                    options: TranscriptionOptions) -> bool:
+    # Mêmes critères que WhisperModel.generate_with_fallback
+    if no_speech_prob > options.no_speech_threshold and avg_logprob < options.log_prob_threshold:
+        return False  # silence
+    return compression_ratio > options.compression_ratio_threshold or avg_logprob < options.log_prob_threshold
+
+
+def _split_zone(model: WhisperModel, tokenizer: Tokenizer, output: dict, metadata: dict,
+                options: TranscriptionOptions) -> list[dict]:
+    """
+    Segments d'une zone décodée (``output`` : tokens, avg_logprob, no_speech_prob).
+
+    Avec timestamps, la zone est découpée aux tokens de temps comme dans
+    BatchedInferencePipeline.forward ; la fin de zone qui ne se termine pas
+    par un timestamp, que ``WhisperModel.transcribe`` redécoderait en
+    avançant sa fenêtre, est gardée jusqu'à la fin de la zone au lieu d'être
+    perdue. Sans timestamps, un seul segment couvre toute la zone.
+    """
+    tokens = output["tokens"]
+    offset, duration = metadata["offset"], metadata["duration"]
+    pieces = [(offset, offset + duration, tokens)]
+    if not options.without_timestamps:
+        subsegments, _, _ = model._split_segments_by_timestamps(
+            tokenizer=tokenizer,
+            tokens=tokens,
+            time_offset=offset,
+            segment_size=int(math.ceil(duration) * model.frames_per_second),
+            segment_duration=duration,
+            seek=0,
+        )
+        pieces = [(segment["start"], segment["end"], segment["tokens"]) for segment in subsegments]
+        tail = tokens[sum(len(segment["tokens"]) for segment in subsegments):]
+        if any(token < tokenizer.eot for token in tail):
+            start = offset + (tail[0] - tokenizer.timestamp_begin) * model.time_precision
+            pieces.append((start, offset + duration, tail))
+    return [
+        {
+            "start": start,
+            "end": end,
+            "text": tokenizer.decode(piece),
+            "avg_logprob": output["avg_logprob"],
+            "no_speech_prob": output["no_speech_prob"],
+            "compression_ratio": get_compression_ratio(tokenizer.decode(piece)),
+        }
+        for start, end, piece in pieces
+    ]
+
+
+def _decode_with_fallback(
+    model: WhisperModel,
+    tokenizer: Tokenizer,
+    features: list,
+    chunks_metadata: list,
+    first_attempts: list[tuple],
+    options: TranscriptionOptions,
+) -> list[list[dict]]:
+    """
+    Redécode des zones aux températures de repli (``options.temperatures[1:]``).
+
+    BatchedInferencePipeline n'utilise que la première température : les
+    zones dont le résultat a échoué sont ici réencodées et échantillonnées
+    parmi ``best_of`` hypothèses, température après température, jusqu'à
+    passer les seuils. À défaut, la meilleure tentative (log-prob moyenne),
+    ``first_attempts`` compris, est gardée. Retourne les segments de chaque
+    zone, dans l'ordre d'entrée.
+    """
+    prompt = model.get_prompt(tokenizer, [], without_timestamps=options.without_timestamps)
+    # Tentatives (avg_logprob, compression_ratio, segments) de chaque zone
+    attempts = [[attempt] for attempt in first_attempts]
+    pending = list(range(len(features)))
+    for temperature in options.temperatures[1:]:
+        if not pending:
+            break
+        encoder_output = model.encode(np.stack([features[index] for index in pending]))
+        results = model.model.generate(
+            encoder_output,
+            [prompt] * len(pending),
+            beam_size=1,
+            num_hypotheses=options.best_of,
+            sampling_topk=0,
+            sampling_temperature=temperature,
+            length_penalty=options.length_penalty,
+            repetition_penalty=options.repetition_penalty,
+            no_repeat_ngram_size=options.no_repeat_ngram_size,
+            max_length=model.max_length,
+            suppress_blank=options.suppress_blank,
+            suppress_tokens=options.suppress_tokens,
+            return_scores=True,
+            return_no_speech_prob=True,
+        )
+        still_pending = []
+        for index, result in zip(pending, results):
+            # Meilleure des best_of hypothèses échantillonnées
+            best = None
+            for tokens, score in zip(result.sequences_ids, result.scores):
+                avg_logprob = score * len(tokens) ** options.length_penalty / (len(tokens) + 1)
+                if best is None or avg_logprob > best[1]:
+                    best = (tokens, avg_logprob)
+            tokens, avg_logprob = best
+            compression_ratio = get_compression_ratio(tokenizer.decode(tokens).strip())
+            output = {"tokens": tokens, "avg_logprob": avg_logprob, "no_speech_prob": result.no_speech_prob}
+            segments = _split_zone(model, tokenizer, output, chunks_metadata[index], options)
+            attempts[index].append((avg_logprob, compression_ratio, segments))
+            if _needs_fallback(avg_logprob, result.no_speech_prob, compression_ratio, options):
+                still_pending.append(index)
+        pending = still_pending
+
+    outputs = []
+    for tried in attempts:
+        # Tentatives non répétitives d'abord, puis la plus probable
+        candidates = [a for a in tried if a[1] <= options.compression_ratio_threshold] or tried
+        outputs.append(max(candidates, key=lambda attempt: attempt[0])[2])
+    return outputs
+
+
+def transcribe_batch(
+    model: WhisperModel,
+    audios: list[np.ndarray],
+    options: DecodeOptions,
+    batch_size: int = 8,
+) -> list[TranscriptionResult]:
+    """
+    Transcrit plusieurs audios (PCM 16 kHz mono float32) en un seul passage batché.
+
+    Les zones de parole de toutes les requêtes sont regroupées puis envoyées
+    au modèle par paquets de ``batch_size`` : des requêtes différentes
+    partagent donc les mêmes appels à l'encodeur et au beam search. Si
+    ``options`` prévoit des températures de repli, les zones en échec sont
+    ensuite redécodées ensemble (voir ``_decode_with_fallback``).
+
+    Paramètres
+    ----------
+    model : WhisperModel
+        Modèle faster-whisper chargé.
+    audios : list[np.ndarray]
+        Audios à transcrire, un par requête.
+    options : DecodeOptions
+        Paramètres de décodage communs à tout le batch.
+    batch_size : int
+        Nombre maximal de zones de 30 s envoyées au modèle en une fois.
+
+    Retour
+    ------
+    list[TranscriptionResult]
+        Un résultat par audio, dans l'ordre d'entrée.
+    """
+    encoder = _TimedEncoder(model)
+    pipeline = BatchedInferencePipeline(encoder)
+    tokenizer = Tokenizer(
+        model.hf_tokenizer,
+        model.model.is_multilingual,
+        task="transcribe",
+        language=options.language,
+    )
+    transcription_options = _transcription_options(tokenizer, options)
+
+    prepared = [_prepare_audio(model, audio, options.vad_filter) for audio in audios]
+
+    # Aplatir les zones de parole de toutes les requêtes en gardant leur propriétaire
+    features, chunks_metadata, owners = [], [], []
+    for index, item in enumerate(prepared):
+        features += item.features
+        chunks_metadata += item.chunks_metadata
+        owners += [index] * len(item.features)
+
+    chunk_outputs = []
+    for start in range(0, len(features), batch_size):
+        stop = start + batch_size
+        encoder.seconds = 0.0
+        forward_start = time.perf_counter()
+        _, outputs = pipeline.generate_segment_batched(
+            np.stack(features[start:stop]),
+            tokenizer,
+            transcription_options,
+        )
+        outputs = [
+            _split_zone(encoder, tokenizer, output, metadata, transcription_options)
+            for output, metadata in zip(outputs, chunks_metadata[start:stop])
+        ]
+        # Le reste est le beam search (et la détokenisation)
+        decoder_seconds = time.perf_counter() - forward_start - encoder.seconds
+        for owner in set(owners[start:stop]):
+            timings = prepared[owner].timings
+            timings["encoder"] = timings.get("encoder", 0.0) + encoder.seconds
+            timings["decoder"] = timings.get("decoder", 0.0) + decoder_seconds
+        chunk_outputs += outputs
+
+    # Repli en température : seulement pour les zones dont le décodage a échoué
+    if len(options.temperatures) > 1:
+        failed = [
+            index for index, chunk_segments in enumerate(chunk_outputs)
+            if any(
+                _needs_fallback(s["avg_logprob"], s["no_speech_prob"], s["compression_ratio"], transcription_options)
+                for s in chunk_segments
+            )
+        ]
+        for start in range(0, len(failed), batch_size):
+            indices = failed[start:start + batch_size]
+            encoder.seconds = 0.0
+            fallback_start = time.perf_counter()
+            outputs = _decode_with_fallback(
+                encoder,
+                tokenizer,
+                [features[index] for index in indices],
+                [chunks_metadata[index] for index in indices],
+                [
+                    (
+                        chunk_outputs[index][0]["avg_logprob"],
+                        get_compression_ratio("".join(s["text"] for s in chunk_outputs[index]).strip()),
+                        chunk_outputs[index],
+                    )
+                    for index in indices
+                ],
+                transcription_options,
+            )
+            decoder_seconds = time.perf_counter() - fallback_start - encoder.seconds
+            for owner in {owners[index] for index in indices}:
+                timings = prepared[owner].timings
+                timings["encoder"] += encoder.seconds
+                timings["decoder"] += decoder_seconds
+            for index, chunk_segments in zip(indices, outputs):
+                chunk_outputs[index] = chunk_segments
+
+    raw_segments = [[] for _ in audios]
+    for owner, chunk_segments in zip(owners, chunk_outputs):
+        raw_segments[owner].extend(chunk_segments)
+
+    results = []
+    for item, segments in zip(prepared, raw_segments):
+        result = TranscriptionResult(language=options.language, duration=item.duration, timings=item.timings)
+        if segments:
+            # Replacer les temps (relatifs à la parole seule) sur l'audio d'origine
+            ts_map = SpeechTimestampsMap(item.speech_chunks, SAMPLING_RATE)
+            for segment in segments:
+                result.segments.append({
+                    "start": ts_map.get_original_time(segment["start"]),
+                    "end": ts_map.get_original_time(segment["end"], is_end=True),
+                    "text": segment["text"],
+                })
+        results.append(result)
+
+    return results
+
+
+def transcribe_stream(model: WhisperModel, audio: np.ndarray, options: DecodeOptions) -> Iterator:
+    """
+    Transcrit un audio segment par segment.
+
+    Le premier élément produit est un TranscriptionResult sans segments
+    (langue et durée), disponible avant tout décodage ; chaque segment
+    est ensuite produit dès que le modèle l'a décodé.
+    """
+    segments, info = model.transcribe(
+        audio,
+        beam_size=options.beam_size,
+        best_of=options.best_of,
+        temperature=list(options.temperatures),
+        vad_filter=options.vad_filter,
+        language=options.language,
+        condition_on_previous_text=options.condition_on_previous_text,
+    )
+    yield TranscriptionResult(language=info.language, duration=info.duration)
+    for segment in segments:
+        yield {"start": segment.start, "end": segment.end, "text": segment.text}
@@ -0,0 +1,267 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.audio import decode_upload
+from app.chunking import chunk_segments, plan_chunks
+from app.inference import SAMPLING_RATE, DecodeOptions
+from app.scheduler import MicroBatchScheduler
+
+# Dossier de la file persistante (base SQLite + fichiers audio en attente) ; par défaut
+# data/jobs à côté du paquet app, soit /app/data/jobs dans le conteneur
+JOBS_DIR = os.environ.get("JOBS_DIR", str(Path(__file__).resolve().parents[1] / "data" / "jobs"))
+# Nombre de jobs transcrits en parallèle (ils partagent les workers du scheduler)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+# Durée visée des morceaux d'un job (entre 0,5 et 1,5 fois : 30 s au plus par défaut)
+JOB_CHUNK_S = float(os.environ.get("JOB_CHUNK_S", "20"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    status TEXT NOT NULL,
+    language TEXT,
+    duration REAL,
+    processed_s REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS segments (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    start_s REAL NOT NULL,
+    end_s REAL NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+class JobStore:
+    """
+    File de jobs persistante dans SQLite.
+
+    Un job passe par les états ``queued`` → ``running`` → ``done``/``failed``.
+    Les segments sont enregistrés morceau par morceau et ``processed_s``
+    retient la fin du dernier morceau transcrit : un job interrompu reprend
+    à partir de là.
+    """
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def _execute(self, query: str, params: tuple = ()) -> int:
+        with self._lock:
+            return self._connection.execute(query, params).rowcount
+
+    def _query(self, query: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._connection.execute(query, params).fetchall()
+
+    def create(self, job_id: str, filename: str) -> None:
+        now = time.time()
+        self._execute(
+            "INSERT INTO jobs (id, filename, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+            (job_id, filename, now, now),
+        )
+
+    def requeue_interrupted(self) -> int:
+        """Remet en file les jobs restés ``running`` après un arrêt du service."""
+        return self._execute(
+            "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+            (time.time(),),
+        )
+
+    def claim_next(self) -> dict | None:
+        """Passe le plus ancien job en attente à l'état ``running`` et le retourne."""
+        with self._lock:
+            row = self._connection.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? "
+                "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) "
+                "RETURNING id, filename, processed_s",
+                (time.time(),),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "filename": row[1], "processed_s": row[2]}
+
+    def set_info(self, job_id: str, language: str, duration: float) -> None:
+        self._execute(
+            "UPDATE jobs SET language = ?, duration = ?, updated_at = ? WHERE id = ?",
+            (language, duration, time.time(), job_id),
+        )
+
+    def add_segments(self, job_id: str, segments: list[dict], processed_s: float) -> None:
+        """Enregistre les segments d'un morceau et sa fin dans une même transaction."""
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN")
+            for segment in segments:
+                self._connection.execute(
+                    "INSERT INTO segments (job_id, idx, start_s, end_s, text) "
+                    "VALUES (?, (SELECT COUNT(*) FROM segments WHERE job_id = ?), ?, ?, ?)",
+                    (job_id, job_id, segment["start"], segment["end"], segment["text"]),
+                )
+            self._connection.execute(
+                "UPDATE jobs SET processed_s = ?, updated_at = ? WHERE id = ?",
+                (processed_s, time.time(), job_id),
+            )
+
+    def finish(self, job_id: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = 'done', processed_s = COALESCE(duration, processed_s), updated_at = ? WHERE id = ?",
+            (time.time(), job_id),
+        )
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+            (error, time.time(), job_id),
+        )
+
+    def get(self, job_id: str, since: int = 0) -> dict | None:
+        rows = self._query(
+            "SELECT id, filename, status, language, duration, processed_s, error, created_at, updated_at "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        row = rows[0]
+        segments = self._query(
+            "SELECT start_s, end_s, text FROM segments WHERE job_id = ? AND idx >= ? ORDER BY idx",
+            (job_id, since),
+        )
+        duration, processed = row[4], row[5]
+        return {
+            "id": row[0],
+            "filename": row[1],
+            "status": row[2],
+            "language_detected": row[3],
+            "duration": duration,
+            "progress": min(processed / duration, 1.0) if duration else 0.0,
+            "error": row[6],
+            "created_at": row[7],
+            "updated_at": row[8],
+            "segments": [{"start": s, "end": e, "text": t} for s, e, t in segments],
+        }
+
+
+class JobManager:
+    """
+    Transcription asynchrone des longs enregistrements.
+
+    ``submit`` enregistre l'audio sur disque et crée le job ; ``workers``
+    tâches asyncio prennent les jobs dans l'ordre d'arrivée. Chaque
+    enregistrement est découpé aux silences en morceaux d'environ
+    ``chunk_s`` secondes, soumis un à un au scheduler : un morceau occupe
+    une place dans un micro-batch comme n'importe quelle requête, si bien
+    qu'un long job ne monopolise pas un worker au détriment de
+    ``/transcribe``. Les segments de chaque morceau sont enregistrés dès
+    qu'il est transcrit ; au redémarrage, les jobs interrompus reprennent
+    au premier morceau non terminé.
+    """
+
+    def __init__(
+        self,
+        scheduler: MicroBatchScheduler,
+        options: DecodeOptions,
+        directory: str = JOBS_DIR,
+        workers: int = JOB_WORKERS,
+        chunk_s: float = JOB_CHUNK_S,
+    ):
+        self.scheduler = scheduler
+        self.options = options
+        self.directory = Path(directory)
+        self.workers = workers
+        self.chunk_s = chunk_s
+        self.store: JobStore | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        (self.directory / "audio").mkdir(parents=True, exist_ok=True)
+        self.store = JobStore(str(self.directory / "jobs.sqlite3"))
+        self.store.requeue_interrupted()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        # Les jobs en cours restent "running" et seront repris au prochain démarrage
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _audio_path(self, job_id: str, filename: str) -> Path:
+        return self.directory / "audio" / f"{job_id}{Path(filename).suffix.lower()}"
+
+    async def submit(self, fileobj: BinaryIO, filename: str) -> str:
+        """Enregistre l'audio et met le job en file ; retourne son identifiant."""
+        job_id = uuid.uuid4().hex
+
+        def save():
+            fileobj.seek(0)
+            with open(self._audio_path(job_id, filename), "wb") as f:
+                shutil.copyfileobj(fileobj, f)
+            self.store.create(job_id, filename)
+
+        await run_in_threadpool(save)
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id: str, since: int = 0) -> dict | None:
+        return await run_in_threadpool(self.store.get, job_id, since)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await run_in_threadpool(self.store.claim_next)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: dict) -> None:
+        job_id = job["id"]
+        path = self._audio_path(job_id, job["filename"])
+        try:
+            def load():
+                with open(path, "rb") as f:
+                    return decode_upload(f)
+
+            audio = await run_in_threadpool(load)
+            await run_in_threadpool(self.store.set_info, job_id, self.options.language, len(audio) / SAMPLING_RATE)
+            chunks = await run_in_threadpool(plan_chunks, audio, self.chunk_s)
+
+            # Reprise éventuelle : sauter les morceaux déjà enregistrés
+            covered_until = job["processed_s"]
+            for chunk in chunks:
+                end = chunk.end / SAMPLING_RATE
+                if end <= job["processed_s"]:
+                    continue
+                result = await self.scheduler.submit(audio[chunk.audio_start:chunk.audio_end], self.options)
+                segments, covered_until = chunk_segments(chunk, result, covered_until)
+                await run_in_threadpool(self.store.add_segments, job_id, segments, end)
+
+            await run_in_threadpool(self.store.finish, job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            await run_in_threadpool(self.store.fail, job_id, str(exc))
+        path.unlink(missing_ok=True)
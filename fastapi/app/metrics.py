@@ -0,0 +1,129 @@
+import os
+import time
+from contextlib import contextmanager
+
+from fastapi import Request
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from app.inference import TranscriptionResult
+
+# Renvoyer le détail des étapes dans l'en-tête Server-Timing des réponses de transcription
+TIMING_HEADER = os.environ.get("METRICS_TIMING_HEADER", "0") == "1"
+
+# Étapes produites par le modèle (voir TranscriptionResult.timings)
+MODEL_STAGES = ("vad", "features", "encoder", "decoder")
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "asr_stage_seconds",
+    "Temps passé par une requête dans chaque étape (receive, admission, decode, queue, vad, features, encoder, decoder, serialize)",
+    ["endpoint", "stage"],
+    buckets=_LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "asr_request_seconds",
+    "Durée des requêtes HTTP (jusqu'au premier octet pour les réponses en flux)",
+    ["endpoint", "method"],
+    buckets=_LATENCY_BUCKETS,
+)
+REQUESTS = Counter("asr_requests_total", "Requêtes HTTP traitées", ["endpoint", "method", "status"])
+IN_FLIGHT = Gauge("asr_in_flight_requests", "Requêtes HTTP en cours de traitement")
+QUEUE_DEPTH = Gauge("asr_queue_depth", "Requêtes en attente d'un micro-batch")
+ADMISSION_WAITING = Gauge("asr_admission_waiting", "Requêtes admises en attente d'un créneau de traitement")
+ADMISSION_ACTIVE = Gauge("asr_admission_active", "Requêtes en cours de décodage ou de transcription")
+ADMISSION_REJECTED = Counter("asr_admission_rejected_total", "Requêtes refusées à l'admission", ["reason"])
+DECODING_LEVEL = Gauge("asr_decoding_degradation_level", "Crans de dégradation du décodage imposés par la charge (0 : aucun)")
+DECODING_REQUESTS = Counter("asr_decoding_requests_total", "Requêtes par niveau de décodage appliqué", ["tier"])
+MODEL_REQUESTS = Counter("asr_model_requests_total", "Requêtes par variante de modèle", ["model"])
+MODEL_MEMORY = Gauge("asr_model_memory_bytes", "Mémoire estimée des modèles chargés dans le processus de l'API")
+AUDIO_SECONDS = Histogram(
+    "asr_audio_duration_seconds",
+    "Durée des audios transcrits",
+    ["endpoint"],
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600),
+)
+REAL_TIME_FACTOR = Histogram(
+    "asr_real_time_factor",
+    "Temps d'inférence divisé par la durée de l'audio (real_time_factor des notebooks de benchmark)",
+    ["endpoint"],
+    buckets=(0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5),
+)
+
+
+class RequestTimings:
+    """
+    Temps des étapes d'une requête de transcription.
+
+    Les étapes sont accumulées pendant la requête, puis ``observe`` les
+    exporte dans les histogrammes ; ``headers`` les met en forme pour
+    l'en-tête ``Server-Timing`` (en millisecondes) si ``TIMING_HEADER``.
+    """
+
+    def __init__(self, endpoint: str, request: Request | None = None):
+        self.endpoint = endpoint
+        self.stages: dict[str, float] = {}
+        # Réception et parsing multipart : du début de la requête à l'appel de l'endpoint
+        started_at = getattr(request.state, "started_at", None) if request is not None else None
+        if started_at is not None:
+            self.add("receive", time.perf_counter() - started_at)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add_inference(self, result: TranscriptionResult, elapsed: float) -> None:
+        """
+        Ajoute les étapes du modèle d'un résultat ; ``elapsed`` est le temps
+        total d'attente du résultat, dont le reste est compté en ``queue``.
+        """
+        inference = 0.0
+        for stage in MODEL_STAGES:
+            if stage in result.timings:
+                self.add(stage, result.timings[stage])
+                inference += result.timings[stage]
+        self.add("queue", max(0.0, elapsed - inference))
+        self.observe_audio(result.duration, inference or elapsed)
+
+    def observe_audio(self, duration: float, inference: float) -> None:
+        AUDIO_SECONDS.labels(self.endpoint).observe(duration)
+        if duration > 0:
+            REAL_TIME_FACTOR.labels(self.endpoint).observe(inference / duration)
+
+    def observe(self) -> None:
+        for stage, seconds in self.stages.items():
+            STAGE_SECONDS.labels(self.endpoint, stage).observe(seconds)
+
+    def headers(self) -> dict:
+        if not TIMING_HEADER:
+            return {}
+        return {"Server-Timing": ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items())}
+
+
+async def instrument_requests(request: Request, call_next):
+    """Middleware HTTP : requêtes en cours, durée et code de retour par route."""
+    request.state.started_at = time.perf_counter()
+    IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        endpoint = route.path if route is not None else "other"
+        REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - request.state.started_at)
+        REQUESTS.labels(endpoint, request.method, str(status)).inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Métriques au format texte Prometheus et leur type MIME."""
+    return generate_latest(), CONTENT_TYPE_LATEST
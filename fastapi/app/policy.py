@@ -0,0 +1,143 @@
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Callable
+
+from app.inference import DecodeOptions
+from app.metrics import DECODING_LEVEL, DECODING_REQUESTS
+
+# Niveau de décodage utilisé quand la requête n'en demande pas
+DECODING_TIER = os.environ.get("DECODING_TIER", "balanced")
+# Objectif de latence (ms) ; 0 désactive la dégradation automatique
+LATENCY_SLO_MS = float(os.environ.get("LATENCY_SLO_MS", "10000"))
+# Fractions de l'objectif : attente au-delà de laquelle on dégrade, en deçà de laquelle on remonte
+POLICY_DEGRADE_AT = float(os.environ.get("POLICY_DEGRADE_AT", "0.5"))
+POLICY_RECOVER_AT = float(os.environ.get("POLICY_RECOVER_AT", "0.2"))
+# Délai minimal (s) entre deux changements de niveau
+POLICY_HOLD_S = float(os.environ.get("POLICY_HOLD_S", "5"))
+
+# Du plus précis au plus rapide : le repli en température redécode les zones douteuses,
+# puis le beam search se rétrécit jusqu'au décodage glouton (VAD et timestamps : ceux de ``base``)
+_TIERS = {
+    "quality": {"beam_size": 5, "best_of": 5, "temperatures": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)},
+    "balanced": {"beam_size": 5, "best_of": 5, "temperatures": (0.0,)},
+    "fast": {"beam_size": 2, "best_of": 1, "temperatures": (0.0,)},
+    "greedy": {"beam_size": 1, "best_of": 1, "temperatures": (0.0,)},
+}
+DECODING_TIERS = tuple(_TIERS)
+
+
+def tier_options(base: DecodeOptions) -> dict[str, DecodeOptions]:
+    """Options de décodage de chaque niveau, à partir de ``base`` (langue...)."""
+    return {name: replace(base, **settings) for name, settings in _TIERS.items()}
+
+
+@dataclass(frozen=True)
+class Decision:
+    """Niveau retenu pour une requête et options de décodage correspondantes."""
+    tier: str
+    options: DecodeOptions
+    degraded: bool
+
+    def describe(self) -> dict:
+        return {
+            "tier": self.tier,
+            "model": self.options.variant,
+            "beam_size": self.options.beam_size,
+            "best_of": self.options.best_of,
+            "temperatures": list(self.options.temperatures),
+            "vad_filter": self.options.vad_filter,
+            "degraded": self.degraded,
+        }
+
+
+class DecodingPolicy:
+    """
+    Choix des paramètres de décodage de chaque requête selon la charge.
+
+    Le client demande un niveau (``quality``, ``balanced``, ``fast``,
+    ``greedy``), ``default_tier`` sinon. Le service peut le dégrader de lui-
+    même : si l'attente (admission + file du micro-batching) dépasse
+    ``degrade_at`` × ``slo_s``, le niveau minimal descend d'un cran ; il
+    remonte d'un cran quand elle repasse sous ``recover_at`` × ``slo_s``.
+    Au plus un changement toutes les ``hold_s`` secondes, pour ne pas osciller.
+
+    L'attente est la plus grande de la moyenne des attentes observées
+    (``observe``) sur les ``window_s`` dernières secondes et de l'attente
+    courante de la plus ancienne requête en file (``current_wait``), qui
+    réagit avant qu'une requête lente ne se termine.
+    """
+
+    def __init__(
+        self,
+        base: DecodeOptions,
+        current_wait: Callable[[], float] = lambda: 0.0,
+        default_tier: str = DECODING_TIER,
+        slo_s: float = LATENCY_SLO_MS / 1000,
+        degrade_at: float = POLICY_DEGRADE_AT,
+        recover_at: float = POLICY_RECOVER_AT,
+        hold_s: float = POLICY_HOLD_S,
+        window_s: float = 10.0,
+    ):
+        if default_tier not in _TIERS:
+            raise ValueError(f"Niveau de décodage inconnu : {default_tier}")
+        self.tiers = tier_options(base)
+        self.current_wait = current_wait
+        self.default_tier = default_tier
+        self.slo_s = slo_s
+        self.degrade_at = degrade_at
+        self.recover_at = recover_at
+        self.hold_s = hold_s
+        self.window_s = window_s
+        # Indice du niveau le plus précis autorisé (0 : aucune dégradation)
+        self.level = 0
+        self.changes = 0
+        self._waits: deque[tuple[float, float]] = deque()
+        self._changed_at = time.monotonic()
+        DECODING_LEVEL.set(0)
+
+    @property
+    def wait(self) -> float:
+        horizon = time.monotonic() - self.window_s
+        while self._waits and self._waits[0][0] < horizon:
+            self._waits.popleft()
+        observed = sum(wait for _, wait in self._waits) / len(self._waits) if self._waits else 0.0
+        return max(observed, self.current_wait())
+
+    def observe(self, wait_s: float) -> None:
+        """Enregistre l'attente subie par une requête terminée."""
+        self._waits.append((time.monotonic(), wait_s))
+
+    def choose(self, tier: str | None = None) -> Decision:
+        self._update()
+        requested = DECODING_TIERS.index(tier or self.default_tier)
+        applied = DECODING_TIERS[max(requested, self.level)]
+        DECODING_REQUESTS.labels(applied).inc()
+        return Decision(applied, self.tiers[applied], applied != DECODING_TIERS[requested])
+
+    def stats(self) -> dict:
+        self._update()
+        return {
+            "default_tier": self.default_tier,
+            "best_allowed_tier": DECODING_TIERS[self.level],
+            "wait_s": self.wait,
+            "slo_s": self.slo_s,
+            "changes": self.changes,
+            "tiers": {name: Decision(name, options, False).describe() for name, options in self.tiers.items()},
+        }
+
+    def _update(self) -> None:
+        now = time.monotonic()
+        if self.slo_s <= 0 or now - self._changed_at < self.hold_s:
+            return
+        wait = self.wait
+        if wait > self.degrade_at * self.slo_s and self.level < len(DECODING_TIERS) - 1:
+            self.level += 1
+        elif wait < self.recover_at * self.slo_s and self.level > 0:
+            self.level -= 1
+        else:
+            return
+        self.changes += 1
+        self._changed_at = now
+        DECODING_LEVEL.set(self.level)
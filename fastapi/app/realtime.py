@@ -0,0 +1,217 @@
+import asyncio
+import os
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+from app.inference import SAMPLING_RATE, DecodeOptions
+from app.scheduler import MicroBatchScheduler
+
+# Silence (ms) qui clôt un énoncé et déclenche l'hypothèse finale
+ENDPOINT_SILENCE_MS = int(os.environ.get("REALTIME_ENDPOINT_SILENCE_MS", "600"))
+# Intervalle (s) d'audio nouveau entre deux hypothèses partielles
+PARTIAL_INTERVAL_S = float(os.environ.get("REALTIME_PARTIAL_INTERVAL_S", "1.0"))
+# Durée maximale d'un énoncé avant finalisation forcée (une fenêtre Whisper = 30 s)
+MAX_UTTERANCE_S = float(os.environ.get("REALTIME_MAX_UTTERANCE_S", "25"))
+
+# Les partiels sont décodés en glouton pour rester rapides, les finaux en beam search
+PARTIAL_OPTIONS = DecodeOptions(beam_size=1, language="fr", condition_on_previous_text=False)
+
+_VAD_STEP_S = 0.2
+_SPEECH_PAD_MS = 100
+_SILENCE_KEEP_S = 0.5
+
+
+@dataclass
+class DecodeRequest:
+    """Décodage demandé par la session : hypothèse partielle ou finale."""
+    kind: str
+    audio: np.ndarray
+    offset: float
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """Convertit des échantillons PCM 16 bits little-endian en float32 normalisé."""
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+class RealtimeSession:
+    """
+    Tampon glissant d'une session de dictée en temps réel.
+
+    L'audio reçu est accumulé ; la VAD (Silero) est relancée toutes les
+    200 ms d'audio nouveau sur le tampon courant :
+
+    - pas de parole : le tampon est réduit à ses 0,5 dernières secondes ;
+    - parole suivie d'au moins ``endpoint_silence_ms`` de silence (ou énoncé
+      trop long) : l'énoncé est retiré du tampon et doit être décodé en final ;
+    - parole en cours : une hypothèse partielle est demandée toutes les
+      ``partial_interval_s`` secondes d'audio nouveau.
+
+    La classe ne fait aucun décodage : ``poll`` indique seulement quoi décoder.
+    ``append`` peut être appelé depuis la boucle asyncio pendant qu'un ``poll``
+    tourne dans un thread : l'audio reçu transite par une liste protégée par
+    un verrou et seul ``poll`` modifie le tampon.
+    """
+
+    def __init__(
+        self,
+        endpoint_silence_ms: int = ENDPOINT_SILENCE_MS,
+        partial_interval_s: float = PARTIAL_INTERVAL_S,
+        max_utterance_s: float = MAX_UTTERANCE_S,
+    ):
+        self.endpoint_silence_ms = endpoint_silence_ms
+        self.partial_interval = int(partial_interval_s * SAMPLING_RATE)
+        self.max_utterance = int(max_utterance_s * SAMPLING_RATE)
+        self.vad_options = VadOptions(
+            min_silence_duration_ms=endpoint_silence_ms,
+            speech_pad_ms=_SPEECH_PAD_MS,
+        )
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.offset = 0.0
+        self._vad_checked = 0
+        self._partial_at = 0
+        self._incoming: list[np.ndarray] = []
+        self._lock = threading.Lock()
+
+    def append(self, audio: np.ndarray) -> None:
+        with self._lock:
+            self._incoming.append(audio)
+
+    def _drain(self) -> None:
+        with self._lock:
+            incoming, self._incoming = self._incoming, []
+        if incoming:
+            self.buffer = np.concatenate([self.buffer, *incoming])
+
+    def _cut(self, end: int) -> np.ndarray:
+        utterance = self.buffer[:end]
+        self.buffer = self.buffer[end:]
+        self.offset += end / SAMPLING_RATE
+        self._vad_checked = 0
+        self._partial_at = 0
+        return utterance
+
+    def poll(self) -> DecodeRequest | None:
+        """Analyse le tampon et retourne le décodage à effectuer, s'il y en a un."""
+        self._drain()
+        if len(self.buffer) - self._vad_checked < _VAD_STEP_S * SAMPLING_RATE:
+            return None
+        self._vad_checked = len(self.buffer)
+
+        speech = get_speech_timestamps(self.buffer, self.vad_options)
+        if not speech:
+            keep = int(_SILENCE_KEEP_S * SAMPLING_RATE)
+            if len(self.buffer) > keep:
+                self._cut(len(self.buffer) - keep)
+            return None
+
+        # Deux zones de parole distinctes sont séparées par au moins endpoint_silence_ms :
+        # la première est donc un énoncé terminé
+        speech_end = speech[0]["end"]
+        trailing_silence_ms = (len(self.buffer) - speech_end) * 1000 / SAMPLING_RATE
+        if len(speech) > 1 or trailing_silence_ms >= self.endpoint_silence_ms - _SPEECH_PAD_MS:
+            offset = self.offset
+            return DecodeRequest("final", self._cut(speech_end), offset)
+        if len(self.buffer) >= self.max_utterance:
+            offset = self.offset
+            return DecodeRequest("final", self._cut(len(self.buffer)), offset)
+        if len(self.buffer) - self._partial_at >= self.partial_interval:
+            self._partial_at = len(self.buffer)
+            return DecodeRequest("partial", self.buffer.copy(), self.offset)
+        return None
+
+    def flush(self) -> DecodeRequest | None:
+        """Fin du flux : retourne le reste du tampon à décoder en final."""
+        self._drain()
+        if not len(self.buffer):
+            return None
+        offset = self.offset
+        return DecodeRequest("final", self._cut(len(self.buffer)), offset)
+
+
+async def serve_realtime(websocket: WebSocket, scheduler: MicroBatchScheduler, final_options: DecodeOptions) -> None:
+    """
+    Boucle d'une connexion WebSocket de transcription en temps réel.
+
+    Protocole :
+
+    - le client envoie des messages binaires de PCM 16 bits mono 16 kHz,
+      puis le message texte ``"end"`` quand l'enregistrement est terminé ;
+      un échantillon peut être coupé entre deux messages (l'octet restant
+      d'un message de taille impaire est gardé pour le suivant) ;
+    - le serveur répond ``{"type": "partial", "text": ...}`` pendant un
+      énoncé, ``{"type": "final", "start": ..., "end": ..., "text": ...}``
+      quand il est terminé, et ``{"type": "end"}`` avant de fermer.
+
+    La réception et le décodage tournent dans deux tâches séparées : l'audio
+    continue d'être lu pendant qu'une hypothèse est décodée, et les décodages
+    passent par le scheduler (donc par les micro-batches partagés).
+    """
+    await websocket.accept()
+    session = RealtimeSession()
+    pending = asyncio.Event()
+    finished = asyncio.Event()
+    disconnected = False
+
+    async def receive():
+        nonlocal disconnected
+        remainder = b""
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    disconnected = True
+                    break
+                if message.get("bytes"):
+                    data = remainder + message["bytes"]
+                    usable = len(data) - len(data) % 2
+                    data, remainder = data[:usable], data[usable:]
+                    session.append(pcm16_to_float32(data))
+                    pending.set()
+                elif message.get("text") == "end":
+                    break
+        finally:
+            finished.set()
+            pending.set()
+
+    async def decode(request: DecodeRequest):
+        options = PARTIAL_OPTIONS if request.kind == "partial" else final_options
+        result = await scheduler.submit(request.audio, options)
+        text = "".join(segment["text"] for segment in result.segments).strip()
+        if request.kind == "partial":
+            await websocket.send_json({"type": "partial", "text": text})
+        elif text:
+            await websocket.send_json({
+                "type": "final",
+                "start": round(request.offset + result.segments[0]["start"], 3),
+                "end": round(request.offset + result.segments[-1]["end"], 3),
+                "text": text,
+            })
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            await pending.wait()
+            pending.clear()
+            # Traiter tout ce qui est décodable dans le tampon avant d'attendre à nouveau
+            while not disconnected and (request := await run_in_threadpool(session.poll)) is not None:
+                await decode(request)
+            if finished.is_set():
+                break
+        # Propager une éventuelle erreur de la réception plutôt que de finir la session normalement
+        await receiver
+        if disconnected:
+            return
+        if (request := session.flush()) is not None:
+            await decode(request)
+        await websocket.send_json({"type": "end"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
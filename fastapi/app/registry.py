@@ -0,0 +1,294 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Callable, Iterator
+
+from faster_whisper import WhisperModel
+
+# Variantes servies : "nom=chemin[:compute_type]" séparées par des virgules (vide : MODEL_PATH seul)
+MODEL_VARIANTS = os.environ.get("MODEL_VARIANTS", "")
+# Variante utilisée quand la requête n'en demande pas (défaut : la première)
+DEFAULT_MODEL = os.environ.get("DEFAULT_MODEL", "")
+# Mémoire maximale des modèles chargés (Mo) ; au-delà, les moins récemment utilisés sont déchargés (0 : sans limite)
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", "0"))
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class UnknownModel(KeyError):
+    """Variante de modèle absente du registre."""
+
+
+@dataclass(frozen=True)
+class ModelVariant:
+    """Un modèle CTranslate2 et le type de calcul avec lequel le charger."""
+    name: str
+    path: str
+    compute_type: str = "int8"
+
+    @property
+    def model_id(self) -> str:
+        # La date du modèle distingue deux versions déposées au même chemin
+        weights = Path(self.path) / "model.bin"
+        version = weights.stat().st_mtime_ns if weights.exists() else 0
+        return f"{self.path}:{self.compute_type}:{version}"
+
+
+def parse_variants(spec: str, default_path: str, default_compute_type: str) -> dict[str, ModelVariant]:
+    """
+    Lit ``MODEL_VARIANTS`` (``nom=chemin[:compute_type]``, séparés par des virgules).
+
+    Sans spécification, une seule variante ``default`` (``default_path``,
+    ``default_compute_type``).
+    """
+    if not spec.strip():
+        return {"default": ModelVariant("default", default_path, default_compute_type)}
+    variants = {}
+    for item in spec.split(","):
+        name, _, target = item.strip().partition("=")
+        if not name or not target:
+            raise ValueError(f"MODEL_VARIANTS : entrée invalide « {item} » (attendu nom=chemin[:compute_type])")
+        path, _, compute_type = target.partition(":")
+        variants[name] = ModelVariant(name, path, compute_type or default_compute_type)
+    return variants
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+@dataclass
+class _Loaded:
+    variant: ModelVariant
+    model: WhisperModel
+    memory_bytes: int
+    loaded_at: float
+    last_used: float = field(default_factory=time.monotonic)
+    in_flight: int = 0
+    uses: int = 0
+    # Remplacé par une nouvelle version : libéré dès la fin de ses requêtes en cours
+    retired: bool = False
+
+
+class ModelRegistry:
+    """
+    Registre des modèles servis, chargés à la demande.
+
+    Chaque requête choisit une variante par son nom (``use``) ; un modèle
+    est chargé (puis préchauffé par ``warmup``) à sa première utilisation.
+    Si ``memory_budget`` est dépassé, les modèles inutilisés le plus
+    anciennement sont déchargés d'abord ; un modèle avec des requêtes en
+    cours ne l'est jamais (le chargement attend qu'il se libère).
+
+    La variante par défaut n'est jamais déchargée.
+
+    ``reload`` remplace à chaud une variante (nouveau chemin, autre
+    compute_type ou simplement nouvelle version au même chemin) : la
+    nouvelle version est chargée et préchauffée à côté de l'ancienne, les
+    nouvelles requêtes basculent dessus et l'ancienne est libérée quand
+    ses requêtes en cours se terminent.
+
+    La mémoire d'un modèle est mesurée par la hausse du RSS du processus
+    pendant son chargement ; avant le premier chargement, elle est estimée
+    par la taille de ``model.bin``.
+    """
+
+    def __init__(
+        self,
+        variants: dict[str, ModelVariant],
+        default: str = "",
+        load: Callable[[ModelVariant], WhisperModel] | None = None,
+        warmup: Callable[[WhisperModel], None] | None = None,
+        memory_budget: int = MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+    ):
+        self.variants = dict(variants)
+        self.default = default or next(iter(self.variants))
+        if self.default not in self.variants:
+            raise ValueError(f"DEFAULT_MODEL : variante inconnue « {self.default} »")
+        self._load_model = load or (lambda variant: WhisperModel(variant.path, device="cpu", compute_type=variant.compute_type))
+        self.warmup = warmup
+        self.memory_budget = memory_budget
+        self.evictions = 0
+        self._loaded: dict[str, _Loaded] = {}
+        self._retired: list[_Loaded] = []
+        # Variantes en cours de chargement et mémoire qui leur est réservée
+        self._loading: dict[str, int] = {}
+        self._memory_seen: dict[str, int] = {}
+        self._lock = threading.Condition()
+
+    def resolve(self, name: str | None) -> str:
+        name = name or self.default
+        if name not in self.variants:
+            raise UnknownModel(name)
+        return name
+
+    def model_id(self, name: str | None) -> str:
+        return self.variants[self.resolve(name)].model_id
+
+    def load(self, name: str | None = None, warmup: bool = True) -> WhisperModel:
+        """Charge une variante si besoin (bloquant) et retourne son modèle."""
+        with self.use(name, warmup=warmup) as model:
+            return model
+
+    @contextmanager
+    def use(self, name: str | None = None, warmup: bool = True) -> Iterator[WhisperModel]:
+        """
+        Modèle de la variante ``name`` (défaut si None), chargé si besoin.
+
+        Le modèle reste réservé (ni déchargé ni libéré par un remplacement)
+        jusqu'à la sortie du bloc ``with``.
+        """
+        entry = self._acquire(self.resolve(name), warmup)
+        try:
+            yield entry.model
+        finally:
+            self._release(entry)
+
+    def reload(self, name: str, path: str | None = None, compute_type: str | None = None) -> dict:
+        """Charge une nouvelle version de ``name`` et la met en service sans interrompre les requêtes en cours."""
+        name = self.resolve(name)
+        variant = self.variants[name]
+        variant = replace(variant, path=path or variant.path, compute_type=compute_type or variant.compute_type)
+        with self._lock:
+            # Un seul chargement à la fois par variante
+            while name in self._loading:
+                self._lock.wait()
+            self._loading[name] = 0
+        entry = self._load_entry(variant, warmup=True, replacing=name)
+        with self._lock:
+            previous = self._loaded.get(name)
+            if previous is not None:
+                previous.retired = True
+                self._retired.append(previous)
+            self.variants[name] = variant
+            self._loaded[name] = entry
+            del self._loading[name]
+            self._drop_retired()
+            self._lock.notify_all()
+            logger.info("Modèle %s remplacé par %s (%s)", name, variant.path, variant.compute_type)
+            return self._describe(name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "default": self.default,
+                "memory_budget_bytes": self.memory_budget,
+                "memory_bytes": self._memory_used(),
+                "evictions": self.evictions,
+                "variants": [self._describe(name) for name in self.variants],
+            }
+
+    def _describe(self, name: str) -> dict:
+        variant = self.variants[name]
+        entry = self._loaded.get(name)
+        return {
+            "name": name,
+            "path": variant.path,
+            "compute_type": variant.compute_type,
+            "loaded": entry is not None,
+            "loading": name in self._loading,
+            "memory_bytes": entry.memory_bytes if entry else None,
+            "in_flight": entry.in_flight if entry else 0,
+            "uses": entry.uses if entry else 0,
+            "retired_in_flight": sum(old.in_flight for old in self._retired if old.variant.name == name),
+        }
+
+    def _memory_used(self) -> int:
+        loaded = [*self._loaded.values(), *self._retired]
+        return sum(entry.memory_bytes for entry in loaded) + sum(self._loading.values())
+
+    def _estimate(self, variant: ModelVariant) -> int:
+        if variant.name in self._memory_seen:
+            return self._memory_seen[variant.name]
+        weights = Path(variant.path) / "model.bin"
+        return weights.stat().st_size if weights.exists() else 0
+
+    def _acquire(self, name: str, warmup: bool) -> _Loaded:
+        with self._lock:
+            while True:
+                entry = self._loaded.get(name)
+                if entry is not None:
+                    entry.in_flight += 1
+                    entry.uses += 1
+                    entry.last_used = time.monotonic()
+                    return entry
+                if name not in self._loading:
+                    self._loading[name] = 0
+                    break
+                # Chargement déjà lancé par un autre thread
+                self._lock.wait()
+        entry = self._load_entry(self.variants[name], warmup)
+        with self._lock:
+            self._loaded[name] = entry
+            del self._loading[name]
+            entry.in_flight += 1
+            entry.uses += 1
+            self._lock.notify_all()
+            return entry
+
+    def _release(self, entry: _Loaded) -> None:
+        with self._lock:
+            entry.in_flight -= 1
+            entry.last_used = time.monotonic()
+            self._drop_retired()
+            self._lock.notify_all()
+
+    def _load_entry(self, variant: ModelVariant, warmup: bool, replacing: str | None = None) -> _Loaded:
+        """Charge ``variant`` ; l'appelant a déjà réservé sa place dans ``_loading``."""
+        with self._lock:
+            estimate = self._estimate(variant)
+            self._make_room(estimate, keep=replacing)
+            self._loading[variant.name] = estimate
+        try:
+            before = _rss_bytes()
+            start = time.perf_counter()
+            model = self._load_model(variant)
+            if warmup and self.warmup is not None:
+                self.warmup(model)
+            memory = max(0, _rss_bytes() - before) or self._estimate(variant)
+            logger.info("Modèle %s chargé en %.2f s (%.0f Mo)", variant.name, time.perf_counter() - start, memory / 2**20)
+            with self._lock:
+                self._memory_seen[variant.name] = memory
+            # La réservation dans ``_loading`` est levée par l'appelant, en publiant le modèle
+            return _Loaded(variant, model, memory, time.monotonic())
+        except BaseException:
+            with self._lock:
+                del self._loading[variant.name]
+                self._lock.notify_all()
+            raise
+
+    def _make_room(self, needed: int, keep: str | None = None) -> None:
+        """Décharge les modèles inutilisés les plus anciens jusqu'à libérer ``needed`` octets (verrou tenu)."""
+        if self.memory_budget <= 0:
+            return
+        while self._memory_used() + needed > self.memory_budget:
+            idle = [
+                entry for name, entry in self._loaded.items()
+                if entry.in_flight == 0 and name not in (keep, self.default)
+            ]
+            if idle:
+                victim = min(idle, key=lambda entry: entry.last_used)
+                del self._loaded[victim.variant.name]
+                self.evictions += 1
+                logger.info("Modèle %s déchargé (budget mémoire)", victim.variant.name)
+                continue
+            busy = [
+                entry for name, entry in self._loaded.items()
+                if entry.in_flight and name not in (keep, self.default)
+            ]
+            if not busy and not self._retired:
+                # Rien d'autre à libérer : on charge quand même, au-delà du budget
+                return
+            # Attendre la fin des requêtes d'un modèle déchargeable
+            self._lock.wait()
+
+    def _drop_retired(self) -> None:
+        self._retired = [entry for entry in self._retired if entry.in_flight > 0]
@@ -0,0 +1,354 @@
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Iterator
+
+import numpy as np
+
+from app.inference import SAMPLING_RATE, DecodeOptions, TranscriptionResult, transcribe_batch, transcribe_stream
+
+# Nombre de processus réplicas du modèle (0 = modèle chargé dans le processus de l'API)
+REPLICAS = int(os.environ.get("REPLICAS", "0"))
+# Threads CTranslate2 par réplica (0 = cœurs disponibles répartis entre les réplicas)
+REPLICA_THREADS = int(os.environ.get("REPLICA_THREADS", "0"))
+# Épingler chaque réplica sur son propre groupe de cœurs
+REPLICA_PIN_CPUS = os.environ.get("REPLICA_PIN_CPUS", "1") == "1"
+
+# Attente maximale d'un réplica vivant quand tous sont en cours de redémarrage
+_RESTART_WAIT_S = 120.0
+_MAX_BACKOFF_S = 30.0
+_STOP_TIMEOUT_S = 10.0
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class ReplicaError(RuntimeError):
+    """Erreur de décodage dans un réplica, ou réplica arrêté pendant la requête."""
+
+
+def _replica_main(
+    conn,
+    model_path: str,
+    compute_type: str,
+    cpu_threads: int,
+    cpus: list[int],
+    batch_size: int,
+    warmup_options: DecodeOptions | None,
+) -> None:
+    """
+    Boucle d'un processus réplica.
+
+    Un thread lit les messages du processus parent (requêtes, annulations,
+    arrêt) pendant que le thread principal décode les requêtes une à une.
+    Le lecteur démarre avant le chargement du modèle : les requêtes envoyées
+    pendant ce chargement et le préchauffage attendent dans la file locale
+    sans bloquer le parent.
+    """
+    from faster_whisper import WhisperModel
+
+    from app.startup import warmup_model
+
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+
+    requests: queue.Queue = queue.Queue()
+    cancelled: set[int] = set()
+
+    def read():
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break
+            if message[0] == "cancel":
+                cancelled.add(message[1])
+            elif message[0] == "stop":
+                break
+            else:
+                requests.put(message)
+        requests.put(None)
+
+    threading.Thread(target=read, daemon=True).start()
+
+    timings = {}
+    try:
+        start = time.perf_counter()
+        model = WhisperModel(
+            model_path, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads, num_workers=1
+        )
+        timings["load_s"] = round(time.perf_counter() - start, 3)
+        if warmup_options is not None:
+            start = time.perf_counter()
+            warmup_model(model, warmup_options)
+            timings["warmup_s"] = round(time.perf_counter() - start, 3)
+    except Exception as exc:
+        conn.send(("failed", None, f"{type(exc).__name__}: {exc}"))
+        return
+    conn.send(("ready", None, timings))
+
+    while (message := requests.get()) is not None:
+        kind, request_id, (audio, options) = message
+        try:
+            if kind == "batch":
+                conn.send(("result", request_id, transcribe_batch(model, audio, options, batch_size=batch_size)))
+            else:
+                for item in transcribe_stream(model, audio, options):
+                    if request_id in cancelled:
+                        break
+                    conn.send(("item", request_id, item))
+                conn.send(("end", request_id, None))
+        except Exception as exc:
+            conn.send(("error", request_id, f"{type(exc).__name__}: {exc}"))
+        cancelled.discard(request_id)
+
+
+class _Replica:
+    def __init__(self, index: int, cpus: list[int]):
+        self.index = index
+        self.cpus = cpus
+        self.process = None
+        self.conn = None
+        self.send_lock = threading.Lock()
+        self.alive = False
+        self.ready = False
+        # Requêtes en cours : identifiant → (file des réponses, secondes d'audio)
+        self.pending: dict[int, tuple[queue.Queue, float]] = {}
+        self.load = 0.0
+        self.restarts = 0
+        self.failures = 0
+        self.last_error: str | None = None
+        self.timings: dict[str, float] = {}
+
+
+class ReplicaPool:
+    """
+    Pool de processus, chacun avec sa propre copie du modèle.
+
+    Sur une machine à beaucoup de cœurs, on choisit ainsi entre « peu de
+    réplicas, beaucoup de threads » et « beaucoup de réplicas, peu de
+    threads » : ``replicas`` processus de ``threads`` threads CTranslate2,
+    épinglés chacun sur ``threads`` cœurs distincts si ``pin_cpus``.
+
+    Chaque requête est envoyée au réplica le moins chargé (secondes d'audio
+    en cours de décodage ou en attente). Un réplica qui s'arrête (plantage,
+    OOM) fait échouer ses requêtes en cours puis est relancé automatiquement,
+    avec un délai croissant s'il échoue à nouveau avant d'être prêt.
+    Avec ``warmup_options``, chaque réplica se préchauffe sur l'extrait
+    embarqué avant de se déclarer prêt.
+
+    ``transcribe_batch`` et ``transcribe_stream`` ont la signature des
+    runners du :class:`~app.scheduler.MicroBatchScheduler` ; ils bloquent le
+    thread appelant et sont donc exécutés dans le pool de threads du
+    scheduler.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        compute_type: str,
+        replicas: int = REPLICAS,
+        threads: int = REPLICA_THREADS,
+        pin_cpus: bool = REPLICA_PIN_CPUS,
+        batch_size: int = 8,
+        warmup_options: DecodeOptions | None = None,
+    ):
+        self.model_path = model_path
+        self.compute_type = compute_type
+        self.batch_size = batch_size
+        self.warmup_options = warmup_options
+        available = sorted(os.sched_getaffinity(0))
+        self.threads = threads or max(1, len(available) // replicas)
+        # Pas d'épinglage si les cœurs ne suffisent pas à séparer les réplicas
+        pin_cpus = pin_cpus and replicas * self.threads <= len(available)
+        self._replicas = [
+            _Replica(index, available[index * self.threads:(index + 1) * self.threads] if pin_cpus else [])
+            for index in range(replicas)
+        ]
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._ids = itertools.count()
+        self._stopping = False
+
+    def start(self) -> None:
+        """Lance les processus réplicas (le modèle se charge en arrière-plan)."""
+        self._stopping = False
+        for replica in self._replicas:
+            self._spawn(replica)
+
+    @property
+    def ready(self) -> bool:
+        """Au moins un réplica a chargé (et préchauffé) le modèle."""
+        return any(replica.ready for replica in self._replicas)
+
+    def stop(self) -> None:
+        """Demande l'arrêt des réplicas, puis termine ceux qui ne répondent pas."""
+        self._stopping = True
+        for replica in self._replicas:
+            try:
+                with replica.send_lock:
+                    replica.conn.send(("stop", None, None))
+            except (OSError, AttributeError):
+                pass
+        for replica in self._replicas:
+            if replica.process is None:
+                continue
+            replica.process.join(_STOP_TIMEOUT_S)
+            if replica.process.is_alive():
+                replica.process.terminate()
+                replica.process.join()
+
+    def transcribe_batch(self, audios: list[np.ndarray], options: DecodeOptions) -> list[TranscriptionResult]:
+        seconds = sum(len(audio) for audio in audios) / SAMPLING_RATE
+        replica, request_id, responses = self._dispatch("batch", (audios, options), seconds)
+        try:
+            kind, payload = responses.get()
+            if kind == "error":
+                raise ReplicaError(payload)
+            return payload
+        finally:
+            self._release(replica, request_id)
+
+    def transcribe_stream(self, audio: np.ndarray, options: DecodeOptions) -> Iterator:
+        replica, request_id, responses = self._dispatch("stream", (audio, options), len(audio) / SAMPLING_RATE)
+        finished = False
+        try:
+            while True:
+                kind, payload = responses.get()
+                if kind == "error":
+                    finished = True
+                    raise ReplicaError(payload)
+                if kind == "end":
+                    finished = True
+                    return
+                yield payload
+        finally:
+            # Flux abandonné par le consommateur : arrêter le décodage dans le réplica
+            if not finished:
+                try:
+                    with replica.send_lock:
+                        replica.conn.send(("cancel", request_id, None))
+                except OSError:
+                    pass
+            self._release(replica, request_id)
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [
+                {
+                    "index": replica.index,
+                    "pid": replica.process.pid if replica.process is not None else None,
+                    "cpus": replica.cpus,
+                    "threads": self.threads,
+                    "alive": replica.alive,
+                    "ready": replica.ready,
+                    "in_flight": len(replica.pending),
+                    "load_s": round(replica.load, 3),
+                    "restarts": replica.restarts,
+                    "last_error": replica.last_error,
+                    "timings": replica.timings,
+                }
+                for replica in self._replicas
+            ]
+
+    def _dispatch(self, kind: str, payload: tuple, seconds: float) -> tuple[_Replica, int, queue.Queue]:
+        responses: queue.Queue = queue.Queue()
+        with self._available:
+            deadline = time.monotonic() + _RESTART_WAIT_S
+            while not (candidates := [replica for replica in self._replicas if replica.alive]):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopping:
+                    raise ReplicaError("Aucun réplica du modèle n'est disponible.")
+                self._available.wait(remaining)
+            # Les réplicas prêts d'abord, puis le moins chargé
+            replica = min(candidates, key=lambda r: (not r.ready, r.load, len(r.pending)))
+            request_id = next(self._ids)
+            replica.pending[request_id] = (responses, seconds)
+            replica.load += seconds
+            conn = replica.conn
+        try:
+            with replica.send_lock:
+                conn.send((kind, request_id, payload))
+        except OSError as exc:
+            self._release(replica, request_id)
+            raise ReplicaError(f"Réplica {replica.index} injoignable : {exc}") from exc
+        return replica, request_id, responses
+
+    def _release(self, replica: _Replica, request_id: int) -> None:
+        with self._lock:
+            entry = replica.pending.pop(request_id, None)
+            if entry is not None:
+                replica.load = max(0.0, replica.load - entry[1])
+
+    def _spawn(self, replica: _Replica) -> None:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_replica_main,
+            args=(
+                child_conn, self.model_path, self.compute_type, self.threads, replica.cpus, self.batch_size,
+                self.warmup_options,
+            ),
+            name=f"whisper-replica-{replica.index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        with self._available:
+            replica.process = process
+            replica.conn = parent_conn
+            replica.alive = True
+            replica.ready = False
+            self._available.notify_all()
+        threading.Thread(
+            target=self._listen, args=(replica, parent_conn, process), name=f"replica-{replica.index}-listener", daemon=True
+        ).start()
+
+    def _listen(self, replica: _Replica, conn, process) -> None:
+        """Distribue les réponses d'un réplica et le relance s'il s'arrête."""
+        while True:
+            try:
+                kind, request_id, payload = conn.recv()
+            except (EOFError, OSError):
+                break
+            if kind == "ready":
+                with self._lock:
+                    replica.ready = True
+                    replica.failures = 0
+                    replica.timings = payload
+                logger.info("Réplica %d prêt (%s)", replica.index, payload)
+                continue
+            if kind == "failed":
+                replica.last_error = payload
+                logger.error("Réplica %d : échec du chargement du modèle (%s)", replica.index, payload)
+                continue
+            with self._lock:
+                entry = replica.pending.get(request_id)
+            if entry is not None:
+                entry[0].put((kind, payload))
+
+        process.join()
+        conn.close()
+        with self._lock:
+            pending, replica.pending = replica.pending, {}
+            replica.load = 0.0
+            replica.alive = False
+            replica.ready = False
+            if not self._stopping:
+                replica.failures += 1
+                replica.last_error = replica.last_error or f"code de sortie {process.exitcode}"
+        message = f"Le réplica {replica.index} s'est arrêté (code de sortie {process.exitcode})."
+        for responses, _ in pending.values():
+            responses.put(("error", message))
+
+        if self._stopping:
+            return
+        logger.warning("%s Relance en cours.", message)
+        # Relance avec un délai croissant si le réplica échoue en boucle (modèle absent, OOM au chargement...)
+        time.sleep(min(_MAX_BACKOFF_S, 0.5 * 2 ** (replica.failures - 1)))
+        if not self._stopping:
+            replica.restarts += 1
+            self._spawn(replica)
@@ -0,0 +1,234 @@
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterator
+
+import numpy as np
+
+from app.inference import SAMPLING_RATE, DecodeOptions, TranscriptionResult
+
+BatchRunner = Callable[[list[np.ndarray], DecodeOptions], list[TranscriptionResult]]
+StreamRunner = Callable[[np.ndarray, DecodeOptions], Iterator]
+
+_END_OF_STREAM = object()
+
+# Fenêtre d'entrée de Whisper
+_WINDOW_S = 30
+
+
+@dataclass
+class _Job:
+    audio: np.ndarray
+    options: DecodeOptions
+    future: asyncio.Future
+    priority: float
+    enqueued: float
+
+
+class MicroBatchScheduler:
+    """
+    File d'attente des transcriptions avec micro-batching dynamique.
+
+    Les requêtes sont accumulées pendant ``window_s`` secondes (ou jusqu'à
+    ``max_batch_size`` requêtes), regroupées par options de décodage, puis
+    exécutées par ``runner`` sur un pool de threads dédié. La boucle asyncio
+    n'est jamais bloquée par le modèle.
+
+    Tant que tous les workers sont occupés, aucun nouveau batch n'est formé :
+    les requêtes continuent de s'accumuler et le batch suivant sera plus gros.
+
+    Le batch est formé des requêtes les plus courtes d'abord (``priority``,
+    par défaut la durée de l'audio), avec vieillissement : chaque seconde
+    d'attente retire ``aging_rate`` secondes à la priorité, si bien qu'un
+    long audio finit toujours par passer devant les clips courts.
+
+    Les transcriptions en streaming (``stream_runner``) ne sont pas batchées
+    mais occupent un worker du même pool pendant toute leur durée.
+    """
+
+    def __init__(
+        self,
+        runner: BatchRunner,
+        max_batch_size: int = 8,
+        window_s: float = 0.02,
+        workers: int = 1,
+        stream_runner: StreamRunner | None = None,
+        aging_rate: float = 1.0,
+    ):
+        self.runner = runner
+        self.stream_runner = stream_runner
+        self.max_batch_size = max_batch_size
+        self.window_s = window_s
+        self.workers = workers
+        self.aging_rate = aging_rate
+        self._pending: list[_Job] = []
+        self._arrived: asyncio.Event | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._task: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    def start(self) -> None:
+        """Démarre la boucle de collecte (à appeler depuis la boucle asyncio)."""
+        self._arrived = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        self._task = asyncio.create_task(self._collect_loop())
+
+    async def stop(self) -> None:
+        """Arrête la collecte, attend les batches en cours et libère les threads."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._task = None
+
+    async def submit(self, audio: np.ndarray, options: DecodeOptions, priority: float | None = None) -> TranscriptionResult:
+        """
+        Met un audio en file et attend sa transcription.
+
+        ``priority`` est la durée de travail attendue (s) ; les plus petites
+        valeurs passent en premier. Par défaut, la durée de l'audio.
+        """
+        if self._arrived is None:
+            raise RuntimeError("Le scheduler n'est pas démarré.")
+        if priority is None:
+            priority = len(audio) / SAMPLING_RATE
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(_Job(audio, options, future, priority, time.monotonic()))
+        self._arrived.set()
+        return await future
+
+    async def stream(self, audio: np.ndarray, options: DecodeOptions) -> AsyncIterator:
+        """
+        Transcrit un audio en streaming : produit les éléments de ``stream_runner``
+        au fur et à mesure de leur décodage dans le pool de workers.
+        """
+        if self._arrived is None:
+            raise RuntimeError("Le scheduler n'est pas démarré.")
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for item in self.stream_runner(audio, options):
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            except Exception as exc:
+                loop.call_soon_threadsafe(items.put_nowait, exc)
+            finally:
+                loop.call_soon_threadsafe(items.put_nowait, _END_OF_STREAM)
+
+        await self._slots.acquire()
+        try:
+            worker = loop.run_in_executor(self._executor, produce)
+            try:
+                while True:
+                    item = await items.get()
+                    if item is _END_OF_STREAM:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                # Client déconnecté ou erreur : arrêter le décodage au prochain segment
+                cancelled.set()
+                await worker
+        finally:
+            self._slots.release()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    @property
+    def oldest_wait(self) -> float:
+        """Attente (s) de la plus ancienne requête encore en file."""
+        if not self._pending:
+            return 0.0
+        return time.monotonic() - min(job.enqueued for job in self._pending)
+
+    def _take(self, count: int) -> list[_Job]:
+        """
+        Retire de la file les requêtes de plus petite priorité effective, dans
+        la limite de ``count`` requêtes et de ``count`` fenêtres de 30 s : un
+        clip court n'attend pas la fin d'un batch rempli de longs morceaux.
+        """
+        now = time.monotonic()
+        # Le client a pu abandonner la requête pendant l'attente
+        pending = [job for job in self._pending if not job.future.done()]
+        pending.sort(key=lambda job: job.priority - self.aging_rate * (now - job.enqueued))
+        batch, windows = [], 0
+        for job in pending:
+            job_windows = max(1, math.ceil(len(job.audio) / (_WINDOW_S * SAMPLING_RATE)))
+            if batch and (len(batch) == count or windows + job_windows > count):
+                break
+            batch.append(job)
+            windows += job_windows
+        self._pending = pending[len(batch):]
+        return batch
+
+    async def _wait_arrival(self, timeout: float | None = None) -> None:
+        self._arrived.clear()
+        await asyncio.wait_for(self._arrived.wait(), timeout)
+
+    async def _collect_loop(self) -> None:
+        while True:
+            while not self._pending:
+                await self._wait_arrival()
+            await self._slots.acquire()
+
+            # Fenêtre de regroupement : attendre d'autres requêtes sans dépasser la taille max
+            deadline = time.monotonic() + self.window_s
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await self._wait_arrival(remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = self._take(self.max_batch_size)
+            if not batch:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: list[_Job]) -> None:
+        try:
+            groups: dict[DecodeOptions, list[_Job]] = {}
+            for job in batch:
+                # Le client a pu abandonner la requête pendant l'attente
+                if not job.future.done():
+                    groups.setdefault(job.options, []).append(job)
+
+            loop = asyncio.get_running_loop()
+            for options, jobs in groups.items():
+                try:
+                    results = await loop.run_in_executor(
+                        self._executor, self.runner, [job.audio for job in jobs], options
+                    )
+                except Exception as exc:
+                    for job in jobs:
+                        if not job.future.done():
+                            job.future.set_exception(exc)
+                    continue
+                for job, result in zip(jobs, results):
+                    if not job.future.done():
+                        job.future.set_result(result)
+        finally:
+            self._slots.release()
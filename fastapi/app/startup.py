@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+from faster_whisper import WhisperModel
+
+from app.audio import decode_upload
+from app.inference import DecodeOptions, transcribe_batch
+
+# Préchauffer le modèle sur un court extrait avant de se déclarer prêt
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "1") == "1"
+# Extrait de parole (4 s, PCM 16 bits 16 kHz) embarqué pour le préchauffage
+WARMUP_AUDIO = Path(__file__).with_name("warmup.wav")
+
+# Référence approximative du démarrage du processus (import de l'application)
+PROCESS_STARTED = time.monotonic()
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class ModelNotReady(RuntimeError):
+    """Le modèle n'est pas (encore) disponible."""
+
+
+def load_warmup_audio() -> np.ndarray:
+    with open(WARMUP_AUDIO, "rb") as f:
+        return decode_upload(f)
+
+
+def warmup_model(model: WhisperModel, options: DecodeOptions) -> None:
+    """
+    Transcrit une fois l'extrait embarqué : les noyaux CTranslate2 et les
+    allocations sont faits ici plutôt que sur la première vraie requête.
+    """
+    transcribe_batch(model, [load_warmup_audio()], options)
+
+
+class ModelHolder:
+    """
+    Modèle chargé en arrière-plan pendant le démarrage de l'API.
+
+    ``start`` lance le chargement puis le préchauffage sans bloquer le
+    démarrage : le serveur accepte les connexions (``/healthz``) pendant ce
+    temps, et ``ready`` ne passe à vrai (``/readyz``) qu'une fois le modèle
+    préchauffé. ``wait`` bloque le thread appelant jusque-là, de sorte que
+    les requêtes déjà en file attendent le modèle au lieu d'échouer.
+
+    Le modèle lui-même n'est pas gardé ici : ``load`` le place dans le
+    registre (voir ``app.registry``), qui peut le remplacer à chaud.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], WhisperModel],
+        warmup_options: DecodeOptions,
+        warmup: bool = MODEL_WARMUP,
+    ):
+        self._load_model = load
+        self.warmup_options = warmup_options
+        self.warmup = warmup
+        self.status = "starting"
+        self.error: str | None = None
+        self.timings: dict[str, float] = {}
+        self._loaded = threading.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._load())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def wait(self) -> None:
+        self._loaded.wait()
+        if self.status != "ready":
+            raise ModelNotReady(f"Le modèle n'a pas pu être chargé : {self.error}")
+
+    async def _load(self) -> None:
+        try:
+            self.status = "loading"
+            start = time.perf_counter()
+            model = await run_in_threadpool(self._load_model)
+            self.timings["load_s"] = round(time.perf_counter() - start, 3)
+            logger.info("Modèle chargé en %.2f s", self.timings["load_s"])
+
+            if self.warmup:
+                self.status = "warming"
+                start = time.perf_counter()
+                await run_in_threadpool(warmup_model, model, self.warmup_options)
+                self.timings["warmup_s"] = round(time.perf_counter() - start, 3)
+                logger.info("Préchauffage terminé en %.2f s", self.timings["warmup_s"])
+
+            self.status = "ready"
+            self.timings["ready_s"] = round(time.monotonic() - PROCESS_STARTED, 3)
+            logger.info("API prête %.2f s après le démarrage du processus", self.timings["ready_s"])
+        except Exception as exc:
+            self.status = "failed"
+            self.error = f"{type(exc).__name__}: {exc}"
+            logger.exception("Échec du chargement du modèle")
+        finally:
+            self._loaded.set()
@@ -0,0 +1,61 @@
+import os
+import time
+from typing import Iterator
+
+import numpy as np
+
+from app.inference import SAMPLING_RATE, DecodeOptions, TranscriptionResult
+
+# Servir un modèle factice : aucun poids chargé, inférence simulée (tests de charge)
+STUB_MODEL = os.environ.get("STUB_MODEL", "0") == "1"
+# Temps d'inférence simulé par seconde d'audio (0 : réponse immédiate)
+STUB_RTF = float(os.environ.get("STUB_RTF", "0"))
+# Temps fixe simulé par batch (ms)
+STUB_BATCH_MS = float(os.environ.get("STUB_BATCH_MS", "0"))
+
+STUB_TEXT = "transcription simulée"
+
+
+class StubModel:
+    """
+    Modèle factice placé dans le registre à la place d'un WhisperModel.
+
+    Avec ``STUB_MODEL=1``, réception, décodage de l'upload, admission,
+    micro-batching et sérialisation restent ceux du service : seul le
+    modèle est remplacé par une attente de ``STUB_BATCH_MS`` plus
+    ``STUB_RTF`` fois la durée audio du batch. Un test de charge
+    (``benchmarks.bench_load``) mesure ainsi le coût du service lui-même
+    sur n'importe quelle machine.
+    """
+
+    def __init__(self, variant=None):
+        self.variant = variant
+
+
+def stub_transcribe_batch(
+    model: StubModel,
+    audios: list[np.ndarray],
+    options: DecodeOptions,
+    batch_size: int = 8,
+) -> list[TranscriptionResult]:
+    """Même signature et même forme de résultat que ``transcribe_batch``."""
+    durations = [len(audio) / SAMPLING_RATE for audio in audios]
+    seconds = STUB_BATCH_MS / 1000 + STUB_RTF * sum(durations)
+    if seconds > 0:
+        time.sleep(seconds)
+    # Comme dans transcribe_batch, le temps partagé du batch est compté pour chaque requête
+    return [
+        TranscriptionResult(
+            language=options.language,
+            duration=duration,
+            segments=[{"start": 0.0, "end": duration, "text": STUB_TEXT}] if duration > 0 else [],
+            timings={"decoder": seconds},
+        )
+        for duration in durations
+    ]
+
+
+def stub_transcribe_stream(model: StubModel, audio: np.ndarray, options: DecodeOptions) -> Iterator:
+    """Même signature que ``transcribe_stream`` : métadonnées puis un segment."""
+    yield TranscriptionResult(language=options.language, duration=len(audio) / SAMPLING_RATE)
+    yield from stub_transcribe_batch(model, [audio], options)[0].segments
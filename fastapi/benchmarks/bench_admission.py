@@ -0,0 +1,146 @@
+"""
+Test de charge à trafic mixte : latence des clips courts derrière de longs uploads.
+
+Des clips courts (samples embarqués) arrivent selon un processus de Poisson
+à ``--rate`` requêtes/s (boucle ouverte : l'arrivée ne dépend pas des
+réponses) et, toutes les ``--long-every`` secondes, un long upload de
+``--long-s`` secondes (samples concaténés) est envoyé. Le rapport donne,
+pour chaque classe, les latences p50/p95/p99 des requêtes réussies et le
+nombre de refus 429/503 (avec leur ``Retry-After``).
+
+Pour comparer avec un ordonnancement FIFO sans contrôle d'admission,
+relancer le service avec ``ADMISSION_MAX_PENDING=100000
+ADMISSION_MAX_ACTIVE=100000 SJF_AGING_RATE=1000000``.
+
+Usage (depuis le dossier fastapi/, avec le service démarré) :
+
+    python -m benchmarks.bench_admission --url http://localhost:10300/transcribe --rate 2 --duration 120
+"""
+import argparse
+import io
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+import uuid
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from faster_whisper import decode_audio
+
+SAMPLING_RATE = 16000
+
+SAMPLES_ROOT = Path(__file__).resolve().parents[2] / "streamlit" / "app"
+SAMPLE_SETS = {
+    "commonvoice21": SAMPLES_ROOT / "samples_commonvoice21",
+    "voxpopuli": SAMPLES_ROOT / "samples_voxpopuli",
+}
+
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def _wav_bytes(audio: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLING_RATE)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def post(url: str, filename: str, data: bytes, client_id: str) -> dict:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(url, data=body, headers={
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "X-Client-Id": client_id,
+    })
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=3600) as response:
+            response.read()
+            status, retry_after = response.status, None
+    except urllib.error.HTTPError as exc:
+        status, retry_after = exc.code, exc.headers.get("Retry-After")
+    except OSError:
+        status, retry_after = None, None
+    return {"status": status, "latency_s": time.perf_counter() - start, "retry_after": retry_after}
+
+
+def summarize(results: list[dict]) -> dict:
+    ok = [result["latency_s"] for result in results if result["status"] == 200]
+    summary = {
+        "sent": len(results),
+        "ok": len(ok),
+        "rejected_429": sum(result["status"] == 429 for result in results),
+        "rejected_503": sum(result["status"] == 503 for result in results),
+        "errors": sum(result["status"] not in (200, 429, 503) for result in results),
+    }
+    if ok:
+        summary.update({
+            "p50_s": _percentile(ok, 0.5),
+            "p95_s": _percentile(ok, 0.95),
+            "p99_s": _percentile(ok, 0.99),
+            "max_s": max(ok),
+        })
+    return summary
+
+
+def main(args) -> None:
+    short_clips = [
+        (path.name, path.read_bytes())
+        for folder in SAMPLE_SETS.values()
+        for path in sorted(folder.iterdir()) if path.suffix in (".wav", ".mp3")
+    ]
+    speech = np.concatenate([decode_audio(str(SAMPLES_ROOT / "samples_voxpopuli" / name))
+                             for name, _ in short_clips if name.endswith(".wav")])
+    long_audio = np.resize(speech, int(args.long_s * SAMPLING_RATE))
+    long_clip = ("long.wav", _wav_bytes(long_audio))
+
+    # Plan d'arrivées : Poisson pour les clips courts, périodique pour les longs
+    rng = random.Random(args.seed)
+    arrivals, at = [], 0.0
+    while (at := at + rng.expovariate(args.rate)) < args.duration:
+        arrivals.append((at, "short", rng.choice(short_clips), f"short-{len(arrivals) % args.clients}"))
+    arrivals += [(at, "long", long_clip, "long") for at in np.arange(0.0, args.duration, args.long_every)]
+    arrivals.sort(key=lambda arrival: arrival[0])
+
+    results = {"short": [], "long": []}
+    with ThreadPoolExecutor(max_workers=args.max_connections) as pool:
+        start = time.perf_counter()
+        futures = []
+        for at, kind, (filename, data), client in arrivals:
+            time.sleep(max(0.0, start + at - time.perf_counter()))
+            futures.append((kind, pool.submit(post, args.url, filename, data, client)))
+        for kind, future in futures:
+            results[kind].append(future.result())
+
+    report = {kind: summarize(values) for kind, values in results.items()}
+    report["config"] = vars(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:10300/transcribe")
+    parser.add_argument("--rate", type=float, default=2.0, help="clips courts par seconde (Poisson)")
+    parser.add_argument("--duration", type=float, default=120.0, help="durée de l'envoi (s)")
+    parser.add_argument("--long-s", type=float, default=1200.0, help="durée des longs uploads (s)")
+    parser.add_argument("--long-every", type=float, default=30.0, help="intervalle entre deux longs uploads (s)")
+    parser.add_argument("--clients", type=int, default=8, help="nombre d'identifiants clients pour les clips courts")
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="fichier JSON où écrire le rapport")
+    main(parser.parse_args())
@@ -0,0 +1,90 @@
+"""
+Benchmark de l'ingestion audio : fichier temporaire vs décodage en mémoire.
+
+Compare, pour chaque sample embarqué dans l'application Streamlit :
+
+- ``tempfile`` : l'ancien chemin de /transcribe (copie de l'upload dans
+  /tmp avec shutil.copyfileobj, décodage depuis le chemin, os.remove) ;
+- ``memory`` : le chemin actuel (upload gardé dans un SpooledTemporaryFile,
+  décodage direct par app.audio.decode_upload).
+
+Usage (depuis le dossier fastapi/) :
+
+    python -m benchmarks.bench_ingestion --repeat 5
+"""
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from faster_whisper import decode_audio
+
+from starlette.formparsers import MultiPartParser
+
+from app.audio import decode_upload
+
+SAMPLES_ROOT = Path(__file__).resolve().parents[2] / "streamlit" / "app"
+SAMPLE_SETS = {
+    "commonvoice21": SAMPLES_ROOT / "samples_commonvoice21",
+    "voxpopuli": SAMPLES_ROOT / "samples_voxpopuli",
+}
+
+
+def _upload(path: Path) -> tempfile.SpooledTemporaryFile:
+    # Reproduit l'objet fourni par Starlette pour un upload multipart
+    upload = tempfile.SpooledTemporaryFile(max_size=MultiPartParser.spool_max_size)
+    upload.write(path.read_bytes())
+    upload.seek(0)
+    return upload
+
+
+def ingest_tempfile(path: Path):
+    upload = _upload(path)
+    temp_filename = f"/tmp/{uuid.uuid4().hex}_{path.name}"
+    with open(temp_filename, "wb") as buffer:
+        shutil.copyfileobj(upload, buffer)
+    audio = decode_audio(temp_filename)
+    os.remove(temp_filename)
+    upload.close()
+    return audio
+
+
+def ingest_memory(path: Path):
+    upload = _upload(path)
+    audio = decode_upload(upload)
+    upload.close()
+    return audio
+
+
+METHODS = {"tempfile": ingest_tempfile, "memory": ingest_memory}
+
+
+def run(repeat: int) -> None:
+    print(f"{'dataset':<15}{'méthode':<10}{'fichiers':>9}{'total (s)':>11}{'moy (ms)':>10}{'p95 (ms)':>10}")
+    for dataset, folder in SAMPLE_SETS.items():
+        files = sorted(p for p in folder.iterdir() if p.suffix in (".wav", ".mp3"))
+        for name, method in METHODS.items():
+            method(files[0])  # échauffement
+            timings = []
+            for _ in range(repeat):
+                for path in files:
+                    start = time.perf_counter()
+                    method(path)
+                    timings.append(time.perf_counter() - start)
+            timings.sort()
+            p95 = timings[int(0.95 * (len(timings) - 1))]
+            print(
+                f"{dataset:<15}{name:<10}{len(files):>9}{sum(timings) / repeat:>11.3f}"
+                f"{statistics.mean(timings) * 1000:>10.2f}{p95 * 1000:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="nombre de passages sur chaque jeu de samples")
+    args = parser.parse_args()
+    run(args.repeat)
@@ -0,0 +1,211 @@
+"""
+Test de charge de ``/transcribe`` : débit, latences p50/p95/p99 et taux d'erreur.
+
+Les samples embarqués (CommonVoice et VoxPopuli) sont renvoyés tels quels
+(upload multipart, un client HTTP par requête) par paliers de charge :
+
+- boucle fermée (``--concurrency 1,4,16``) : N clients envoient chacun la
+  requête suivante dès la réponse reçue ;
+- boucle ouverte (``--rate 1,2,5``) : arrivées de Poisson à taux fixe,
+  indépendantes des réponses. La latence est comptée depuis l'heure
+  d'arrivée prévue, pour ne pas masquer l'attente si le client prend du retard.
+
+Chaque palier dure ``--warmup`` + ``--duration`` secondes ; seules les
+requêtes envoyées après le préchauffage sont comptées. Le rapport JSON
+donne par palier le débit (requêtes et secondes d'audio par seconde), les
+latences des requêtes réussies et le taux d'erreur (tout code autre que 200).
+
+Le cache de transcriptions répondrait aux clips rejoués sans inférence :
+lancer le service avec ``CACHE_MAX_ENTRIES=0`` (les succès de cache pendant
+le test sont reportés dans ``cache_hits``).
+
+Sans poids de modèle, ``STUB_MODEL=1`` (voir ``app.stub``) mesure le coût
+HTTP, upload, décodage et ordonnancement du service seul :
+
+    STUB_MODEL=1 CACHE_MAX_ENTRIES=0 uvicorn app.app:app --port 10300
+
+Avec ``--baseline``, chaque palier est comparé au même palier d'un rapport
+précédent : le code de sortie est 1 si la latence p95/p99 augmente ou si le
+débit baisse de plus de ``--tolerance``, ou si le taux d'erreur dépasse
+``--max-error-rate``.
+
+Usage (depuis le dossier fastapi/, avec le service démarré) :
+
+    python -m benchmarks.bench_load --concurrency 1,4,16 --rate 2,5 --duration 60 --output load.json
+    python -m benchmarks.bench_load --concurrency 1,4,16 --rate 2,5 --baseline load.json
+"""
+import argparse
+import io
+import json
+import random
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.audio import probe_duration
+from benchmarks.bench_admission import SAMPLE_SETS, _percentile, post
+
+
+def load_clips() -> list[tuple[str, bytes, float]]:
+    """Nom, octets et durée (s) de chaque sample embarqué."""
+    clips = []
+    for folder in SAMPLE_SETS.values():
+        for path in sorted(folder.iterdir()):
+            if path.suffix in (".wav", ".mp3"):
+                data = path.read_bytes()
+                clips.append((path.name, data, probe_duration(io.BytesIO(data)) or 0.0))
+    return clips
+
+
+def _cache_hits(url: str) -> int | None:
+    stats_url = url.split("/transcribe")[0] + "/cache/stats"
+    try:
+        with urllib.request.urlopen(stats_url, timeout=5) as response:
+            stats = json.loads(response.read())
+        return stats.get("hits", 0) + stats.get("disk_hits", 0) + stats.get("coalesced", 0)
+    except (OSError, ValueError):
+        return None
+
+
+def run_closed(url: str, clips: list, concurrency: int, warmup: float, duration: float, rng: random.Random) -> list[dict]:
+    start = time.perf_counter()
+    deadline = start + warmup + duration
+    results, lock = [], threading.Lock()
+    orders = [rng.sample(clips, len(clips)) for _ in range(concurrency)]
+
+    def client(index: int) -> None:
+        sent = 0
+        while (sent_at := time.perf_counter()) < deadline:
+            filename, data, audio_s = orders[index][sent % len(clips)]
+            result = post(url, filename, data, f"load-{index}")
+            sent += 1
+            with lock:
+                results.append({**result, "sent_at": sent_at - start, "audio_s": audio_s})
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    return results
+
+
+def run_open(url: str, clips: list, rate: float, warmup: float, duration: float, rng: random.Random,
+             max_connections: int) -> list[dict]:
+    arrivals, at = [], 0.0
+    while (at := at + rng.expovariate(rate)) < warmup + duration:
+        arrivals.append(at)
+
+    def send(at: float, clip: tuple, client_id: str) -> dict:
+        filename, data, audio_s = clip
+        result = post(url, filename, data, client_id)
+        # Depuis l'arrivée prévue : inclut le retard pris par le client s'il est saturé
+        result["latency_s"] = time.perf_counter() - (start + at)
+        return {**result, "sent_at": at, "audio_s": audio_s}
+
+    with ThreadPoolExecutor(max_workers=max_connections) as pool:
+        start = time.perf_counter()
+        futures = []
+        for index, at in enumerate(arrivals):
+            time.sleep(max(0.0, start + at - time.perf_counter()))
+            futures.append(pool.submit(send, at, rng.choice(clips), f"load-{index % max_connections}"))
+        return [future.result() for future in futures]
+
+
+def summarize(results: list[dict], warmup: float, duration: float) -> dict:
+    measured = [result for result in results if result["sent_at"] >= warmup]
+    ok = [result for result in measured if result["status"] == 200]
+    latencies = [result["latency_s"] for result in ok]
+    statuses = {}
+    for result in measured:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    summary = {
+        "sent": len(measured),
+        "ok": len(ok),
+        "error_rate": (len(measured) - len(ok)) / len(measured) if measured else 0.0,
+        "statuses": statuses,
+        "throughput_rps": len(ok) / duration,
+        "audio_s_per_s": sum(result["audio_s"] for result in ok) / duration,
+    }
+    if latencies:
+        summary.update({
+            "latency_mean_s": sum(latencies) / len(latencies),
+            "latency_p50_s": _percentile(latencies, 0.5),
+            "latency_p95_s": _percentile(latencies, 0.95),
+            "latency_p99_s": _percentile(latencies, 0.99),
+            "latency_max_s": max(latencies),
+        })
+    return summary
+
+
+def compare(report: dict, baseline: dict, tolerance: float, max_error_rate: float) -> list[str]:
+    """Régressions de chaque palier par rapport au même palier de ``baseline``."""
+    regressions = []
+    previous = {step["name"]: step for step in baseline.get("steps", [])}
+    for step in report["steps"]:
+        name = step["name"]
+        if step["error_rate"] > max_error_rate:
+            regressions.append(f"{name} : taux d'erreur {step['error_rate']:.1%} > {max_error_rate:.1%}")
+        if name not in previous:
+            continue
+        before = previous[name]
+        for key in ("latency_p95_s", "latency_p99_s"):
+            if key in step and key in before and step[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{name} : {key} {before[key]:.3f} → {step[key]:.3f} s")
+        if step["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name} : débit {before['throughput_rps']:.2f} → {step['throughput_rps']:.2f} req/s")
+    return regressions
+
+
+def main(args) -> None:
+    clips = load_clips()
+    rng = random.Random(args.seed)
+    steps = [("closed", int(level)) for level in args.concurrency.split(",") if level] + \
+            [("open", float(level)) for level in args.rate.split(",") if level]
+
+    report = {"config": vars(args), "steps": []}
+    for mode, level in steps:
+        hits_before = _cache_hits(args.url)
+        if mode == "closed":
+            results = run_closed(args.url, clips, level, args.warmup, args.duration, rng)
+            name = f"closed-c{level}"
+        else:
+            results = run_open(args.url, clips, level, args.warmup, args.duration, rng, args.max_connections)
+            name = f"open-r{level:g}"
+        hits_after = _cache_hits(args.url)
+        step = {"name": name, "mode": mode, "level": level, **summarize(results, args.warmup, args.duration)}
+        if hits_before is not None and hits_after is not None:
+            step["cache_hits"] = hits_after - hits_before
+        report["steps"].append(step)
+        print(f"{name:>12} : {step['throughput_rps']:.2f} req/s  p50 {step.get('latency_p50_s', float('nan')):.3f} s  "
+              f"p95 {step.get('latency_p95_s', float('nan')):.3f} s  p99 {step.get('latency_p99_s', float('nan')):.3f} s  "
+              f"erreurs {step['error_rate']:.1%}")
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.tolerance, args.max_error_rate)
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions:
+            sys.exit(1)
+        print("✅ Aucune régression par rapport à", args.baseline)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:10300/transcribe")
+    parser.add_argument("--concurrency", default="1,4,16", help="paliers en boucle fermée : clients simultanés, séparés par des virgules")
+    parser.add_argument("--rate", default="", help="paliers en boucle ouverte : requêtes/s (Poisson), séparés par des virgules")
+    parser.add_argument("--duration", type=float, default=60.0, help="durée mesurée de chaque palier (s)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="début de palier non compté (s)")
+    parser.add_argument("--max-connections", type=int, default=256, help="requêtes simultanées maximales en boucle ouverte")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="fichier JSON où écrire le rapport")
+    parser.add_argument("--baseline", default=None, help="rapport de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="dégradation relative tolérée (p95, p99, débit)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="taux d'erreur maximal accepté")
+    main(parser.parse_args())
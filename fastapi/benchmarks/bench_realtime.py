@@ -0,0 +1,110 @@
+"""
+Banc de latence de la transcription temps réel (WebSocket /transcribe/ws).
+
+Chaque sample embarqué est rejoué à vitesse réelle, par paquets de 100 ms de
+PCM 16 bits, suivi de 2 s de silence. On mesure la latence entre la fin de
+la parole (détectée par VAD sur le sample) et la réception de la dernière
+hypothèse finale.
+
+Usage (depuis le dossier fastapi/, avec le service démarré) :
+
+    python -m benchmarks.bench_realtime --url ws://localhost:10300/transcribe/ws --limit 10
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+import websockets
+from faster_whisper import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+SAMPLING_RATE = 16000
+CHUNK_S = 0.1
+TRAILING_SILENCE_S = 2.0
+
+SAMPLES_ROOT = Path(__file__).resolve().parents[2] / "streamlit" / "app"
+SAMPLE_SETS = {
+    "commonvoice21": SAMPLES_ROOT / "samples_commonvoice21",
+    "voxpopuli": SAMPLES_ROOT / "samples_voxpopuli",
+}
+
+
+async def replay(url: str, audio: np.ndarray) -> dict:
+    """Rejoue un audio en temps réel et retourne les instants clés de la session."""
+    # Fin de parole sans marge de VAD : instant réel où le locuteur se tait
+    speech = get_speech_timestamps(audio, VadOptions(speech_pad_ms=0))
+    speech_end_s = speech[-1]["end"] / SAMPLING_RATE if speech else len(audio) / SAMPLING_RATE
+
+    padded = np.concatenate([audio, np.zeros(int(TRAILING_SILENCE_S * SAMPLING_RATE), dtype=np.float32)])
+    pcm = (np.clip(padded, -1, 1) * 32767).astype("<i2")
+    chunk = int(CHUNK_S * SAMPLING_RATE)
+
+    finals = []
+    async with websockets.connect(url, max_size=None) as ws:
+        start = time.perf_counter()
+
+        async def send():
+            for index, offset in enumerate(range(0, len(pcm), chunk)):
+                # Cadencer l'envoi sur l'horloge réelle
+                await asyncio.sleep(max(0.0, start + index * CHUNK_S - time.perf_counter()))
+                await ws.send(pcm[offset:offset + chunk].tobytes())
+            await ws.send("end")
+
+        sender = asyncio.create_task(send())
+        async for raw in ws:
+            message = json.loads(raw)
+            if message["type"] == "final":
+                finals.append((time.perf_counter() - start, message["text"]))
+            elif message["type"] == "end":
+                break
+        await sender
+
+    if not finals:
+        return {"latency_s": None, "text": ""}
+    return {
+        "latency_s": finals[-1][0] - speech_end_s,
+        "text": " ".join(text for _, text in finals),
+    }
+
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+async def run(url: str, limit: int | None, output: str | None) -> None:
+    report = {}
+    for dataset, folder in SAMPLE_SETS.items():
+        files = sorted(p for p in folder.iterdir() if p.suffix in (".wav", ".mp3"))[:limit]
+        latencies = []
+        for path in files:
+            result = await replay(url, decode_audio(str(path)))
+            if result["latency_s"] is not None:
+                latencies.append(result["latency_s"])
+            print(f"{dataset} {path.name}: {result['latency_s']} s")
+        if latencies:
+            report[dataset] = {
+                "clips": len(files),
+                "finals": len(latencies),
+                "mean_s": statistics.mean(latencies),
+                "p50_s": _percentile(latencies, 0.5),
+                "p95_s": _percentile(latencies, 0.95),
+                "max_s": max(latencies),
+            }
+
+    print(json.dumps(report, indent=2))
+    if output:
+        Path(output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:10300/transcribe/ws")
+    parser.add_argument("--limit", type=int, default=None, help="nombre maximal de samples par jeu")
+    parser.add_argument("--output", default=None, help="fichier JSON où écrire le rapport")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.limit, args.output))
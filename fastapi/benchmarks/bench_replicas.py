@@ -0,0 +1,135 @@
+"""
+Balayage des dispositions de réplicas : « peu de réplicas, beaucoup de
+threads » contre « beaucoup de réplicas, peu de threads ».
+
+Pour chaque disposition ``RxT`` (R processus de T threads, épinglés sur des
+cœurs distincts), un ReplicaPool et un MicroBatchScheduler sont montés
+comme dans l'API, puis ``--requests`` transcriptions de samples embarqués
+sont envoyées par ``--concurrency`` clients simultanés. Le rapport donne,
+par disposition, le débit (requêtes/s et secondes d'audio par seconde) et
+les latences p50/p95.
+
+Usage (depuis le dossier fastapi/) :
+
+    python -m benchmarks.bench_replicas --layouts 1x32,2x16,4x8,8x4,16x2 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+from faster_whisper import decode_audio
+
+from app.inference import SAMPLING_RATE, DecodeOptions
+from app.replicas import ReplicaPool
+from app.scheduler import MicroBatchScheduler
+
+MODEL_PATH = "/app/models/whisper-large-v3-french-distil-dec16-ct2/ctranslate2"
+OPTIONS = DecodeOptions(beam_size=5, language="fr", condition_on_previous_text=False)
+
+SAMPLES_ROOT = Path(__file__).resolve().parents[2] / "streamlit" / "app"
+SAMPLE_SETS = {
+    "commonvoice21": SAMPLES_ROOT / "samples_commonvoice21",
+    "voxpopuli": SAMPLES_ROOT / "samples_voxpopuli",
+}
+
+
+def default_layouts() -> list[str]:
+    # Toutes les façons de répartir les cœurs disponibles en R réplicas de T threads
+    cores = len(os.sched_getaffinity(0))
+    return [f"{r}x{cores // r}" for r in range(1, cores + 1) if cores % r == 0]
+
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+async def run_layout(pool: ReplicaPool, replicas: int, clips: list, requests: int, concurrency: int, batch_size: int) -> dict:
+    scheduler = MicroBatchScheduler(
+        pool.transcribe_batch,
+        max_batch_size=batch_size,
+        workers=replicas,
+        stream_runner=pool.transcribe_stream,
+    )
+    scheduler.start()
+    limit = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def client(index: int):
+        async with limit:
+            start = time.perf_counter()
+            await scheduler.submit(clips[index % len(clips)], OPTIONS)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(index) for index in range(requests)])
+    elapsed = time.perf_counter() - start
+    await scheduler.stop()
+
+    audio_s = sum(len(clips[index % len(clips)]) for index in range(requests)) / SAMPLING_RATE
+    return {
+        "requests": requests,
+        "elapsed_s": elapsed,
+        "requests_per_s": requests / elapsed,
+        "audio_s_per_s": audio_s / elapsed,
+        "mean_s": statistics.mean(latencies),
+        "p50_s": _percentile(latencies, 0.5),
+        "p95_s": _percentile(latencies, 0.95),
+    }
+
+
+def wait_ready(pool: ReplicaPool, timeout: float = 600.0) -> float:
+    """Attend que tous les réplicas aient chargé le modèle ; retourne la durée d'attente."""
+    start = time.perf_counter()
+    while not all(replica["ready"] for replica in pool.stats()):
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError("Les réplicas n'ont pas chargé le modèle à temps.")
+        time.sleep(0.2)
+    return time.perf_counter() - start
+
+
+def main(args) -> None:
+    clips = []
+    for folder in SAMPLE_SETS.values():
+        files = sorted(p for p in folder.iterdir() if p.suffix in (".wav", ".mp3"))[:args.limit]
+        clips.extend(decode_audio(str(path), sampling_rate=SAMPLING_RATE) for path in files)
+
+    report = {}
+    for layout in args.layouts.split(","):
+        replicas, threads = (int(value) for value in layout.split("x"))
+        pool = ReplicaPool(args.model, args.compute_type, replicas=replicas, threads=threads,
+                           pin_cpus=not args.no_pin, batch_size=args.batch_size)
+        pool.start()
+        try:
+            load_s = wait_ready(pool)
+            # Un passage de chauffe par réplica avant la mesure
+            asyncio.run(run_layout(pool, replicas, clips, replicas, replicas, args.batch_size))
+            result = asyncio.run(run_layout(pool, replicas, clips, args.requests, args.concurrency, args.batch_size))
+        finally:
+            pool.stop()
+        result["load_s"] = load_s
+        report[layout] = result
+        print(f"{layout}: {result['requests_per_s']:.2f} req/s, {result['audio_s_per_s']:.1f} s audio/s, "
+              f"p95 {result['p95_s']:.2f} s")
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layouts", default=",".join(default_layouts()), help="dispositions RxT séparées par des virgules")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--requests", type=int, default=64, help="nombre de transcriptions par disposition")
+    parser.add_argument("--concurrency", type=int, default=16, help="clients simultanés")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=None, help="nombre maximal de samples par jeu")
+    parser.add_argument("--no-pin", action="store_true", help="ne pas épingler les réplicas sur des cœurs")
+    parser.add_argument("--output", default=None, help="fichier JSON où écrire le rapport")
+    main(parser.parse_args())
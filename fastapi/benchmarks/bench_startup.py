@@ -0,0 +1,122 @@
+"""
+Banc du temps de démarrage (time-to-ready) de l'API pour chaque compute_type.
+
+Pour chaque ``compute_type`` (par défaut tous ceux que CTranslate2 supporte
+sur CPU), l'API est lancée dans un processus uvicorn neuf avec
+``COMPUTE_TYPE`` positionné, puis on mesure :
+
+- ``healthz_s`` : délai avant que le serveur accepte les connexions ;
+- ``ready_s`` : délai avant que ``/readyz`` réponde 200 (modèle chargé et
+  préchauffé) — c'est ce délai qui borne la réactivité de l'autoscaling ;
+- ``load_s`` / ``warmup_s`` : détail rapporté par ``/readyz`` ;
+- ``first_request_s`` : latence de la première transcription une fois prêt.
+
+Usage (depuis le dossier fastapi/, modèle présent sous MODEL_PATH) :
+
+    python -m benchmarks.bench_startup --compute-types int8,int8_float32,float32 --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from pathlib import Path
+
+import ctranslate2
+
+SAMPLE = Path(__file__).resolve().parents[1] / "app" / "warmup.wav"
+
+
+def _get(url: str) -> tuple[int, dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read() or b"{}")
+
+
+def _post_file(url: str, path: Path) -> None:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{path.name}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + path.read_bytes() + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    with urllib.request.urlopen(request, timeout=600) as response:
+        response.read()
+
+
+def measure(compute_type: str, port: int, warmup: bool, timeout: float) -> dict:
+    env = {**os.environ, "COMPUTE_TYPE": compute_type, "MODEL_WARMUP": "1" if warmup else "0"}
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.app:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    result = {}
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn s'est arrêté (code {server.returncode})")
+            try:
+                status, body = _get(f"{base}/readyz")
+            except OSError:
+                time.sleep(0.05)
+                continue
+            result.setdefault("healthz_s", time.perf_counter() - start)
+            if status == 200:
+                result["ready_s"] = time.perf_counter() - start
+                result.update({key: value for key, value in body.get("timings", {}).items() if key != "ready_s"})
+                break
+            if body.get("status") == "failed":
+                raise RuntimeError(body.get("error"))
+            time.sleep(0.05)
+        else:
+            raise TimeoutError(f"{compute_type} : pas prêt après {timeout} s")
+
+        request_start = time.perf_counter()
+        _post_file(f"{base}/transcribe", SAMPLE)
+        result["first_request_s"] = time.perf_counter() - request_start
+    finally:
+        server.terminate()
+        server.wait()
+    return result
+
+
+def main(args) -> None:
+    report = {}
+    for compute_type in args.compute_types.split(","):
+        runs = [measure(compute_type, args.port, not args.no_warmup, args.timeout) for _ in range(args.repeat)]
+        report[compute_type] = {
+            key: {"mean": statistics.mean(run[key] for run in runs), "max": max(run[key] for run in runs)}
+            for key in runs[0]
+        }
+        print(f"{compute_type}: prêt en {report[compute_type]['ready_s']['mean']:.2f} s "
+              f"(1re requête {report[compute_type]['first_request_s']['mean']:.2f} s)")
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--compute-types",
+        default=",".join(sorted(ctranslate2.get_supported_compute_types("cpu"))),
+        help="compute_type à tester, séparés par des virgules",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="démarrages à froid par compute_type")
+    parser.add_argument("--port", type=int, default=10391)
+    parser.add_argument("--timeout", type=float, default=600.0, help="attente maximale de /readyz (s)")
+    parser.add_argument("--no-warmup", action="store_true", help="démarrer avec MODEL_WARMUP=0 pour comparer")
+    parser.add_argument("--output", default=None, help="fichier JSON où écrire le rapport")
+    main(parser.parse_args())
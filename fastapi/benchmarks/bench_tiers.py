@@ -0,0 +1,114 @@
+"""
+Banc qualité / vitesse des niveaux de décodage (``?tier=``) sur les samples embarqués.
+
+Chaque sample CommonVoice et VoxPopuli est transcrit avec les options de
+chaque niveau (voir ``app.policy``), un fichier à la fois comme dans les
+notebooks de benchmark. Le rapport donne, par niveau et par jeu :
+
+- ``WER`` / ``CER`` : moyennes par fichier, calculées comme
+  ``compute_transcription_metrics`` (textes en minuscules, jiwer) ;
+- ``real_time_factor`` : temps d'inférence divisé par la durée de l'audio,
+  en moyenne et au p95.
+
+Nécessite jiwer (comme les notebooks d'analyse). ``--corpus`` remplace les
+samples par un corpus prédécodé (``notebooks/projet9_corpus.py``) : les clips
+sont lus comme vues du memory-map, sans décodage.
+
+Usage (depuis le dossier fastapi/, modèle présent sous MODEL_PATH) :
+
+    python -m benchmarks.bench_tiers --tiers quality,balanced,fast,greedy --repeat 2
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import jiwer
+from faster_whisper import WhisperModel, decode_audio
+
+from app.inference import SAMPLING_RATE, DecodeOptions, transcribe_batch
+from app.policy import DECODING_TIERS, tier_options
+
+MODEL_PATH = os.environ.get("MODEL_PATH", "/app/models/whisper-large-v3-french-distil-dec16-ct2/ctranslate2")
+BASE_OPTIONS = DecodeOptions(beam_size=5, language="fr", condition_on_previous_text=False)
+
+SAMPLES_ROOT = Path(__file__).resolve().parents[2] / "streamlit" / "app"
+SAMPLE_SETS = {
+    "commonvoice21": SAMPLES_ROOT / "samples_commonvoice21",
+    "voxpopuli": SAMPLES_ROOT / "samples_voxpopuli",
+}
+
+
+def load_samples(corpus: str | None = None) -> dict[str, list[tuple[str, object, str]]]:
+    """Audio décodé et transcription de référence de chaque sample, par jeu."""
+    if corpus:
+        sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "notebooks"))
+        from projet9_corpus import AudioCorpus
+
+        return {Path(corpus).name: [(clip.audio_file, clip.audio, clip.raw_text) for clip in AudioCorpus(corpus)]}
+    samples = {}
+    for name, folder in SAMPLE_SETS.items():
+        references = json.loads((folder / "transcripts.json").read_text(encoding="utf-8"))
+        samples[name] = [
+            (filename, decode_audio(str(folder / filename), sampling_rate=SAMPLING_RATE), reference)
+            for filename, reference in sorted(references.items())
+            if (folder / filename).exists()
+        ]
+    return samples
+
+
+def evaluate(model: WhisperModel, options: DecodeOptions, samples: list, repeat: int) -> dict:
+    wers, cers, rtfs = [], [], []
+    for _, audio, reference in samples:
+        # Meilleur temps sur ``repeat`` passages : le texte est identique d'un passage à l'autre
+        elapsed = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = transcribe_batch(model, [audio], options)[0]
+            elapsed.append(time.perf_counter() - start)
+        hypothesis = " ".join(segment["text"].strip() for segment in result.segments).lower().strip()
+        reference = reference.lower().strip()
+        wers.append(jiwer.wer(reference, hypothesis))
+        cers.append(jiwer.cer(reference, hypothesis))
+        rtfs.append(min(elapsed) / (len(audio) / SAMPLING_RATE))
+    rtfs.sort()
+    return {
+        "files": len(samples),
+        "WER": statistics.mean(wers),
+        "CER": statistics.mean(cers),
+        "real_time_factor": statistics.mean(rtfs),
+        "real_time_factor_p95": rtfs[int(0.95 * (len(rtfs) - 1))],
+    }
+
+
+def main(args) -> None:
+    model = WhisperModel(args.model_path, device="cpu", compute_type=args.compute_type)
+    samples = load_samples(args.corpus)
+    options = tier_options(BASE_OPTIONS)
+    # Préchauffage : les premiers appels CTranslate2 fausseraient le RTF du premier niveau
+    transcribe_batch(model, [next(iter(samples.values()))[0][1]], BASE_OPTIONS)
+
+    report = {}
+    for tier in args.tiers.split(","):
+        report[tier] = {name: evaluate(model, options[tier], items, args.repeat) for name, items in samples.items()}
+        for name, metrics in report[tier].items():
+            print(f"{tier:>9} {name:>14} : WER {metrics['WER']:.3f}  CER {metrics['CER']:.3f}  "
+                  f"RTF {metrics['real_time_factor']:.3f}")
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tiers", default=",".join(DECODING_TIERS), help="niveaux à évaluer, séparés par des virgules")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--compute-type", default=os.environ.get("COMPUTE_TYPE", "int8"))
+    parser.add_argument("--repeat", type=int, default=1, help="passages par fichier (meilleur temps retenu)")
+    parser.add_argument("--corpus", default=None, help="dossier d'un corpus prédécodé à la place des samples")
+    parser.add_argument("--output", default=None, help="fichier JSON où écrire le rapport")
+    main(parser.parse_args())
@@ -0,0 +1,50 @@
+import io
+import os
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Tests lancés depuis fastapi/ (python -m pytest tests) ou depuis la racine du dépôt
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Service en mode modèle factice : configuration lue à l'import de app.app
+os.environ["STUB_MODEL"] = "1"
+os.environ.setdefault("JOBS_DIR", tempfile.mkdtemp(prefix="projet9-jobs-"))
+
+SAMPLES_ROOT = Path(__file__).resolve().parents[2] / "streamlit" / "app"
+
+
+def wav_bytes(samples: np.ndarray, rate: int = 16000) -> bytes:
+    """WAV PCM 16 bits mono à partir d'échantillons float32 dans [-1, 1]."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def tone(seconds: float, frequency: float = 220.0) -> np.ndarray:
+    t = np.arange(int(seconds * 16000)) / 16000
+    return (0.25 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.app import app, model_ready
+
+    with TestClient(app) as test_client:
+        deadline = time.monotonic() + 30
+        while not model_ready():
+            if time.monotonic() > deadline:
+                raise RuntimeError("Le modèle factice n'est pas prêt.")
+            time.sleep(0.05)
+        yield test_client
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_reserve_limits():
+    controller = AdmissionController(max_pending=2, max_per_client=1, max_active=1)
+    controller.reserve("a")
+    with pytest.raises(AdmissionRejected) as exc:
+        controller.reserve("a")
+    assert exc.value.status_code == 429
+    controller.reserve("b")
+    with pytest.raises(AdmissionRejected) as exc:
+        controller.reserve("c")
+    assert exc.value.status_code == 503
+    assert exc.value.retry_after >= 1
+
+
+def test_shortest_waiting_request_gets_released_slot():
+    async def scenario():
+        controller = AdmissionController(max_active=1)
+        first = controller.reserve("a")
+        await first.start(5.0)
+        long, short = controller.reserve("b"), controller.reserve("c")
+        long_task = asyncio.create_task(long.start(60.0))
+        short_task = asyncio.create_task(short.start(2.0))
+        await asyncio.sleep(0)
+        assert controller.waiting == 2
+
+        first.release()
+        await asyncio.sleep(0)
+        assert short_task.done() and not long_task.done()
+
+        short.release()
+        await long_task
+        long.release()
+        assert controller.stats()["active"] == 0 and controller.stats()["pending"] == 0
+
+    run(scenario())
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        controller = AdmissionController(max_active=1)
+        first = controller.reserve("a")
+        await first.start(1.0)
+        waiting = controller.reserve("b")
+        task = asyncio.create_task(waiting.start(1.0))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        waiting.release()
+        assert controller.waiting == 0
+
+        first.release()
+        assert controller.active == 0 and controller.pending == 0
+
+    run(scenario())
+
+
+def test_slot_handed_to_cancelled_waiter_is_returned():
+    async def scenario():
+        controller = AdmissionController(max_active=1)
+        first = controller.reserve("a")
+        await first.start(1.0)
+        waiting = controller.reserve("b")
+        task = asyncio.create_task(waiting.start(1.0))
+        await asyncio.sleep(0)
+        # Créneau transmis puis annulation avant que la tâche ne reprenne la main
+        first.release()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        waiting.release()
+        assert controller.active == 0
+
+    run(scenario())
+
+
+def test_ticket_released_while_waiting_does_not_leak_slot():
+    async def scenario():
+        controller = AdmissionController(max_active=1)
+        first = controller.reserve("a")
+        await first.start(1.0)
+        waiting = controller.reserve("b")
+        task = asyncio.create_task(waiting.start(1.0))
+        await asyncio.sleep(0)
+        # Client parti : le middleware libère le ticket avant qu'il n'ait obtenu un créneau
+        waiting.release()
+        first.release()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert controller.active == 0 and controller.pending == 0
+
+        # Le créneau est bien disponible pour la requête suivante
+        nxt = controller.reserve("c")
+        await asyncio.wait_for(nxt.start(1.0), timeout=1)
+        nxt.release()
+
+    run(scenario())
+
+
+def test_transcribe_releases_admission(client):
+    from app.app import admission
+    from conftest import tone, wav_bytes
+
+    response = client.post("/transcribe", files={"file": ("a.wav", wav_bytes(tone(2.0)))})
+    assert response.status_code == 200
+    assert admission.active == 0 and admission.pending == 0
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.cache import TranscriptionCache
+from app.inference import DecodeOptions, TranscriptionResult
+
+
+def test_key_depends_on_options_and_model():
+    key = TranscriptionCache.make_key("digest", DecodeOptions(), "model-a")
+    assert key == TranscriptionCache.make_key("digest", DecodeOptions(), "model-a")
+    assert key != TranscriptionCache.make_key("digest", DecodeOptions(beam_size=1), "model-a")
+    assert key != TranscriptionCache.make_key("digest", DecodeOptions(), "model-b")
+
+
+def test_coalescing_survives_cancelled_first_caller():
+    async def scenario():
+        cache = TranscriptionCache(max_entries=8, directory=None)
+        release = asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return TranscriptionResult(language="fr", duration=1.0, segments=[{"start": 0.0, "end": 1.0, "text": "ok"}])
+
+        first = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        release.set()
+        result = await second
+
+        assert result.segments[0]["text"] == "ok"
+        assert len(calls) == 1
+        assert cache.coalesced == 1
+        assert cache.get("key") is result
+
+    asyncio.run(scenario())
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    async def scenario():
+        result = TranscriptionResult(language="fr", duration=2.0, segments=[{"start": 0.0, "end": 2.0, "text": "a"}])
+
+        async def compute():
+            return result
+
+        await TranscriptionCache(max_entries=0, directory=str(tmp_path)).get_or_compute("key", compute)
+        restarted = TranscriptionCache(max_entries=8, directory=str(tmp_path))
+
+        async def fail():
+            raise AssertionError("le résultat aurait dû venir du disque")
+
+        assert (await restarted.get_or_compute("key", fail)).segments == result.segments
+        assert restarted.disk_hits == 1
+
+    asyncio.run(scenario())
+
+
+def test_identical_uploads_are_transcribed_once(client):
+    from app.app import cache
+    from conftest import tone, wav_bytes
+
+    data = wav_bytes(tone(1.5, frequency=330.0))
+    before = cache.stats()
+    responses = [client.post("/transcribe", files={"file": ("a.wav", data)}) for _ in range(2)]
+    assert [response.status_code for response in responses] == [200, 200]
+    assert responses[0].json()["segments"] == responses[1].json()["segments"]
+    after = cache.stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
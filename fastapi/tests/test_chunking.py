@@ -0,0 +1,55 @@
+import numpy as np
+
+from app.chunking import Chunk, plan_chunks, stitch
+from app.inference import SAMPLING_RATE, TranscriptionResult
+
+RATE = SAMPLING_RATE
+
+
+def test_short_audio_is_a_single_chunk():
+    audio = np.zeros(40 * RATE, dtype=np.float32)
+    assert plan_chunks(audio, target_s=60) == [Chunk(0, len(audio), 0, len(audio))]
+
+
+def test_hard_cuts_overlap_and_cover_the_audio():
+    # Silence continu : aucune pause de parole où couper, coupes forcées à target_s
+    audio = np.zeros(70 * RATE, dtype=np.float32)
+    chunks = plan_chunks(audio, target_s=20, overlap_s=1.0)
+    assert chunks[0].start == 0 and chunks[-1].end == len(audio)
+    for left, right in zip(chunks, chunks[1:]):
+        assert left.end == right.start
+        assert left.audio_end == left.end + RATE
+        assert right.audio_start == right.start - RATE
+
+
+def test_stitch_drops_overlap_duplicates():
+    chunks = [Chunk(0, 20 * RATE, 0, 21 * RATE), Chunk(20 * RATE, 40 * RATE, 19 * RATE, 40 * RATE)]
+    results = [
+        TranscriptionResult("fr", 21.0, [
+            {"start": 0.0, "end": 10.0, "text": "un"},
+            {"start": 10.0, "end": 20.5, "text": "deux"},
+        ], {"decoder": 1.0}),
+        # Relatif au début du morceau (19 s) : "deux" est redécodé dans le recouvrement
+        TranscriptionResult("fr", 21.0, [
+            {"start": 0.0, "end": 1.5, "text": "deux"},
+            {"start": 1.5, "end": 21.0, "text": "trois"},
+        ], {"decoder": 2.0}),
+    ]
+    stitched = stitch(chunks, results, 40.0)
+    assert [segment["text"] for segment in stitched.segments] == ["un", "deux", "trois"]
+    assert stitched.segments[2] == {"start": 20.5, "end": 40.0, "text": "trois"}
+    assert stitched.timings == {"decoder": 3.0}
+    assert stitched.duration == 40.0
+
+
+def test_stitch_keeps_segment_starting_before_the_cut_only_once():
+    chunks = [Chunk(0, 20 * RATE, 0, 21 * RATE), Chunk(20 * RATE, 30 * RATE, 19 * RATE, 30 * RATE)]
+    results = [
+        TranscriptionResult("fr", 21.0, [{"start": 15.0, "end": 21.0, "text": "a cheval"}]),
+        TranscriptionResult("fr", 11.0, [
+            {"start": 0.0, "end": 2.0, "text": "cheval"},
+            {"start": 2.0, "end": 11.0, "text": "suite"},
+        ]),
+    ]
+    stitched = stitch(chunks, results, 30.0)
+    assert [segment["text"] for segment in stitched.segments] == ["a cheval", "suite"]
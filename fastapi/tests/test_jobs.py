@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import numpy as np
+
+from app.inference import SAMPLING_RATE, DecodeOptions
+from app.jobs import JobManager, JobStore
+from app.scheduler import MicroBatchScheduler
+from app.stub import StubModel, stub_transcribe_batch
+from conftest import tone, wav_bytes
+
+
+def test_job_runs_to_completion(client):
+    response = client.post("/jobs", files={"file": ("long.wav", wav_bytes(tone(45.0)))})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+
+    deadline = time.monotonic() + 30
+    while (job := client.get(f"/jobs/{job_id}").json())["status"] in ("queued", "running"):
+        assert time.monotonic() < deadline, job
+        time.sleep(0.05)
+    assert job["status"] == "done", job
+    assert job["progress"] == 1.0
+    assert job["segments"] and job["segments"][-1]["end"] <= 45.0 + 1e-6
+    assert client.get(f"/jobs/{job_id}", params={"since": len(job["segments"])}).json()["segments"] == []
+
+
+def test_unknown_job_is_404(client):
+    assert client.get("/jobs/inconnu").status_code == 404
+
+
+def test_interrupted_job_resumes_after_last_chunk(tmp_path):
+    submitted = []
+
+    def runner(audios, options):
+        submitted.extend(len(audio) / SAMPLING_RATE for audio in audios)
+        return stub_transcribe_batch(StubModel(), audios, options)
+
+    # Job arrêté en cours après avoir enregistré ses 40 premières secondes
+    (tmp_path / "audio").mkdir()
+    (tmp_path / "audio" / "job.wav").write_bytes(wav_bytes(np.zeros(70 * SAMPLING_RATE, dtype=np.float32)))
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create("job", "enregistrement.wav")
+    store.claim_next()
+    store.add_segments("job", [{"start": 0.0, "end": 40.0, "text": "déjà fait"}], 40.0)
+
+    async def scenario():
+        scheduler = MicroBatchScheduler(runner)
+        scheduler.start()
+        manager = JobManager(scheduler, DecodeOptions(), directory=str(tmp_path), workers=1, chunk_s=20)
+        manager.start()
+        try:
+            deadline = time.monotonic() + 30
+            while (job := await manager.get("job"))["status"] != "done":
+                assert job["status"] != "failed", job
+                assert time.monotonic() < deadline, job
+                await asyncio.sleep(0.05)
+        finally:
+            await manager.stop()
+            await scheduler.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    # Seuls les morceaux après 40 s sont retranscrits (recouvrement de 1 s compris)
+    assert sum(submitted) <= 31.0
+    starts = [segment["start"] for segment in job["segments"]]
+    assert job["segments"][0]["text"] == "déjà fait"
+    assert all(start >= 39.0 for start in starts[1:])
+    assert job["progress"] == 1.0
+    assert not (tmp_path / "audio" / "job.wav").exists()
@@ -0,0 +1,47 @@
+"""
+Parité du décodage batché par défaut avec ``WhisperModel.transcribe`` des
+notebooks (beam 5, sans VAD), sur les samples embarqués.
+
+``transcribe_batch`` repose sur des fonctions internes de faster-whisper :
+ce test est à relancer avant toute montée de version. Il nécessite le
+modèle (``MODEL_PATH``) et est ignoré sinon.
+"""
+import difflib
+import os
+
+import pytest
+
+from app.audio import decode_upload
+from app.inference import DecodeOptions, transcribe_batch
+from conftest import SAMPLES_ROOT
+
+MODEL_PATH = os.environ.get("MODEL_PATH", "/app/models/whisper-large-v3-french-distil-dec16-ct2/ctranslate2")
+COMPUTE_TYPE = os.environ.get("COMPUTE_TYPE", "int8")
+SAMPLES = sorted((SAMPLES_ROOT / "samples_voxpopuli").glob("*.wav"))[:3]
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(MODEL_PATH), reason=f"modèle absent : {MODEL_PATH}")
+
+
+@pytest.fixture(scope="module")
+def model():
+    from faster_whisper import WhisperModel
+    return WhisperModel(MODEL_PATH, device="cpu", compute_type=COMPUTE_TYPE)
+
+
+@pytest.mark.parametrize("sample", SAMPLES, ids=lambda path: path.name)
+def test_default_decoding_matches_transcribe(model, sample):
+    with open(sample, "rb") as f:
+        audio = decode_upload(f)
+
+    # Appel historique de l'API et des notebooks
+    segments, _ = model.transcribe(audio, beam_size=5, language="fr", condition_on_previous_text=False)
+    reference = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+    result = transcribe_batch(model, [audio], DecodeOptions())[0]
+
+    expected = " ".join(s["text"].strip() for s in reference).split()
+    actual = " ".join(s["text"].strip() for s in result.segments).split()
+    assert difflib.SequenceMatcher(None, expected, actual).ratio() >= 0.95, (expected, actual)
+    # Segments horodatés par Whisper, pas une zone unique couvrant le clip
+    assert result.segments and abs(len(result.segments) - len(reference)) <= 1
+    assert abs(result.segments[0]["start"] - reference[0]["start"]) <= 1.0
+    assert abs(result.segments[-1]["end"] - reference[-1]["end"]) <= 1.0
@@ -0,0 +1,41 @@
+import numpy as np
+
+from app.realtime import pcm16_to_float32
+from conftest import tone
+
+
+def pcm(samples: np.ndarray) -> bytes:
+    return (samples * 32767).astype("<i2").tobytes()
+
+
+def test_pcm16_to_float32():
+    audio = pcm16_to_float32(np.array([0, 16384, -32768], dtype="<i2").tobytes())
+    np.testing.assert_allclose(audio, [0.0, 0.5, -1.0])
+
+
+def test_session_with_end_gets_final_then_end(client):
+    data = pcm(tone(2.0)) + bytes(2 * 16000)
+    with client.websocket_connect("/transcribe/ws") as ws:
+        # Messages de taille impaire : un échantillon coupé entre deux messages
+        for offset in range(0, len(data), 3201):
+            ws.send_bytes(data[offset:offset + 3201])
+        ws.send_text("end")
+        messages = []
+        while (message := ws.receive_json())["type"] != "end":
+            messages.append(message)
+    finals = [message for message in messages if message["type"] == "final"]
+    assert finals and finals[-1]["text"]
+    assert finals[-1]["end"] <= 3.0 + 1e-6
+
+
+def test_disconnect_without_end_leaves_service_usable(client):
+    with client.websocket_connect("/transcribe/ws") as ws:
+        ws.send_bytes(pcm(tone(1.0)))
+        ws.send_bytes(b"\x01")
+    # La session suivante fonctionne normalement
+    with client.websocket_connect("/transcribe/ws") as ws:
+        ws.send_bytes(pcm(tone(0.5)))
+        ws.send_text("end")
+        while ws.receive_json()["type"] != "end":
+            pass
+    assert client.get("/healthz").status_code == 200
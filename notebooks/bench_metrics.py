@@ -0,0 +1,104 @@
+"""
+Banc du calcul des métriques de transcription : ``compute_transcription_metrics``
+(boucle iterrows + jiwer) contre ``compute_transcription_metrics_fast``
+(normalisation par colonne, alignements sur un pool de processus).
+
+Le jeu de test est synthétique : les transcriptions de référence des samples
+CommonVoice et VoxPopuli embarqués, répétées jusqu'à ``--rows`` lignes, et
+pour chaque modèle simulé une hypothèse obtenue en substituant, supprimant ou
+insérant des mots au hasard (graine fixe). Quelques références et
+hypothèses vides couvrent les cas particuliers de jiwer ; les références
+manquantes (NaN) des samples VoxPopuli sont gardées telles quelles.
+
+Le banc vérifie que les colonnes communes aux deux résumés sont exactement
+égales (pas de tolérance), puis affiche les durées et les métriques corpus.
+
+Usage (depuis le dossier notebooks/) :
+
+    python bench_metrics.py --rows 20000 --models 3 --workers 8
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from projet9_fonctions_analysis import compute_transcription_metrics
+from projet9_metrics import compute_transcription_metrics_fast
+
+SAMPLES_ROOT = Path(__file__).resolve().parents[1] / "streamlit" / "app"
+TRANSCRIPTS = [
+    SAMPLES_ROOT / "samples_commonvoice21" / "transcripts.json",
+    SAMPLES_ROOT / "samples_voxpopuli" / "transcripts.json",
+]
+
+
+def perturb(sentence: str, error_rate: float, rng: random.Random, vocabulary: list[str]) -> str:
+    words = []
+    for word in sentence.split():
+        draw = rng.random()
+        if draw < error_rate / 3:
+            words.append(rng.choice(vocabulary))
+        elif draw < 2 * error_rate / 3:
+            continue
+        elif draw < error_rate:
+            words.extend([word, rng.choice(vocabulary)])
+        else:
+            words.append(word)
+    return " ".join(words)
+
+
+def build_dataframe(rows: int, models: int, seed: int) -> pd.DataFrame:
+    references = []
+    for path in TRANSCRIPTS:
+        references.extend(json.loads(path.read_text(encoding="utf-8")).values())
+    vocabulary = sorted({word for sentence in references for word in str(sentence).lower().split()})
+    rng = random.Random(seed)
+
+    raw_text = [references[i % len(references)] for i in range(rows)]
+    # Cas particuliers : référence vide, hypothèse vide, espaces multiples
+    raw_text[0] = ""
+    df = pd.DataFrame({"audio_file": [f"utt_{i:06d}.wav" for i in range(rows)], "raw_text": raw_text})
+    for index in range(models):
+        error_rate = 0.05 + 0.1 * index
+        hypotheses = [perturb(str(sentence), error_rate, rng, vocabulary) for sentence in raw_text]
+        hypotheses[1] = ""
+        hypotheses[2] = "  " + hypotheses[2].replace(" ", "   ") + " "
+        df[f"model{index}_transcription"] = hypotheses
+    return df
+
+
+def main(args) -> None:
+    df = build_dataframe(args.rows, args.models, args.seed)
+    print(f"{len(df)} énoncés, {args.models} modèles")
+
+    start = time.perf_counter()
+    expected = compute_transcription_metrics(df)
+    reference_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    summary, utterances = compute_transcription_metrics_fast(df, workers=args.workers)
+    fast_s = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(
+        summary[expected.columns].reset_index(drop=True),
+        expected.reset_index(drop=True),
+        check_exact=True,
+        check_dtype=False,
+    )
+    print("Résultats identiques à compute_transcription_metrics.")
+    print(f"compute_transcription_metrics      : {reference_s:.2f} s")
+    print(f"compute_transcription_metrics_fast : {fast_s:.2f} s ({reference_s / fast_s:.1f}x)")
+    print(summary[["model", "WER", "CER", "corpus_WER", "corpus_CER", "corpus_MER", "corpus_WIL"]].to_string(index=False))
+    print(f"{len(utterances)} lignes par énoncé")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="nombre d'énoncés")
+    parser.add_argument("--models", type=int, default=3, help="nombre de colonnes de transcription")
+    parser.add_argument("--workers", type=int, default=None, help="processus (défaut : tous les cœurs)")
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,375 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from rapidfuzz.distance import Levenshtein
+
+from projet9_metrics import CHUNK_SIZE, normalize_column
+
+LEVELS = ("word", "char")
+
+# Codes des opérations d'alignement stockées
+HIT, SUBSTITUTION, DELETION, INSERTION = 0, 1, 2, 3
+OPERATIONS = {"hit": HIT, "substitution": SUBSTITUTION, "deletion": DELETION, "insertion": INSERTION}
+_OPCODES = {"equal": HIT, "replace": SUBSTITUTION, "delete": DELETION, "insert": INSERTION}
+
+
+def pair_key(reference: str, hypothesis: str) -> int:
+    """Clé 64 bits d'une paire (référence, hypothèse) normalisée."""
+    digest = hashlib.blake2b(f"{reference}\x00{hypothesis}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _align(reference: list, hypothesis: list) -> np.ndarray:
+    """
+    Alignement de Levenshtein (celui de jiwer) token par token.
+
+    Retour : tableau (n, 3) [opération, token de référence, token d'hypothèse],
+    -1 pour le côté absent d'une insertion ou d'une suppression.
+    """
+    ops, refs, hyps = [], [], []
+    for tag, i1, i2, j1, j2 in Levenshtein.opcodes(reference, hypothesis):
+        op = _OPCODES[tag]
+        refs += [-1] * (j2 - j1) if op == INSERTION else reference[i1:i2]
+        hyps += [-1] * (i2 - i1) if op == DELETION else hypothesis[j1:j2]
+        ops += [op] * max(i2 - i1, j2 - j1)
+    return np.array([ops, refs, hyps], dtype=np.int32).T.reshape(-1, 3)
+
+
+def _align_chunk(pairs: list) -> list:
+    return [(_align(ref_words, hyp_words), _align(ref_chars, hyp_chars)) for ref_words, hyp_words, ref_chars, hyp_chars in pairs]
+
+
+class AlignmentStore:
+    """
+    Alignements référence / transcription calculés une fois et réutilisés.
+
+    Chaque paire (référence, hypothèse) normalisée comme pour les métriques
+    (``projet9_metrics.normalize_column``) est alignée mot à mot et caractère
+    par caractère, puis rangée sous sa clé ``pair_key`` : une même paire
+    rencontrée pour plusieurs modèles ou jeux de données n'est alignée qu'une fois.
+
+    Stockage en colonnes (tableaux numpy, ``save`` / ``load`` au format npz) :
+
+    - vocabulaire des tokens (mots et caractères) ;
+    - par niveau, les opérations de toutes les paires bout à bout
+      (opération, token de référence, token d'hypothèse) et les positions de
+      début de chaque paire ;
+    - les occurrences (jeu de données, modèle, énoncé, paire).
+
+    Les requêtes (``confusions``, ``word_error_rates``, ``top_k``) comptent
+    les opérations des paires des occurrences sélectionnées, pondérées par
+    leur nombre d'occurrences.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path else None
+        self.vocabulary: list[str] = []
+        self._token_ids: dict[str, int] = {}
+        self._pair_rows: dict[int, int] = {}
+        self.pair_keys = np.empty(0, dtype=np.uint64)
+        self.operations = {level: np.empty((0, 3), dtype=np.int32) for level in LEVELS}
+        self.offsets = {level: np.zeros(1, dtype=np.int64) for level in LEVELS}
+        self.datasets: list[str] = []
+        self.models: list[str] = []
+        self.occurrences = pd.DataFrame({
+            "dataset": pd.Series(dtype=np.int32),
+            "model": pd.Series(dtype=np.int32),
+            "utterance": pd.Series(dtype=object),
+            "pair": pd.Series(dtype=np.int64),
+        })
+        if self.path is not None and self.path.exists():
+            self._read(self.path)
+
+    def __len__(self) -> int:
+        return len(self.pair_keys)
+
+    def __repr__(self) -> str:
+        return (
+            f"AlignmentStore({len(self)} paires, {len(self.occurrences)} occurrences, "
+            f"modèles={self.models}, jeux={self.datasets})"
+        )
+
+    # --- Construction ---
+
+    def add(
+        self,
+        df: pd.DataFrame,
+        dataset: str = "default",
+        ref_col: str = "raw_text",
+        models: list | None = None,
+        id_col: str | None = "audio_file",
+        workers: int | None = None,
+    ) -> int:
+        """
+        Enregistre les transcriptions de ``df`` (colonnes ``{modèle}_transcription``)
+        pour le jeu ``dataset`` et aligne les paires encore inconnues.
+
+        Réenregistrer un couple (jeu, modèle) remplace ses occurrences.
+
+        Paramètres
+        ----------
+        df : pd.DataFrame
+            DataFrame contenant une colonne de référence et des colonnes de transcription.
+        dataset : str
+            Nom du jeu de données (CommonVoice, VoxPopuli...).
+        ref_col : str
+            Nom de la colonne contenant le texte de référence (par défaut "raw_text").
+        models : list, optional
+            Modèles à enregistrer ; par défaut toutes les colonnes ``*_transcription``.
+        id_col : str, optional
+            Colonne identifiant chaque énoncé (l'index de ``df`` sinon).
+        workers : int, optional
+            Nombre de processus pour les alignements (``os.cpu_count()`` par défaut).
+
+        Retour
+        ------
+        int
+            Nombre de nouvelles paires alignées.
+        """
+        if models is None:
+            models = [col.replace("_transcription", "") for col in df.columns if col.endswith("_transcription")]
+        utterances = df[id_col].astype(str).tolist() if id_col in df.columns else df.index.astype(str).tolist()
+        ref_words, ref_chars = normalize_column(df[ref_col])
+
+        pending, occurrences = {}, []
+        for model in models:
+            hyp_words, hyp_chars = normalize_column(df[f"{model}_transcription"])
+            rows = []
+            for pair in zip(ref_words, hyp_words, ref_chars, hyp_chars):
+                key = pair_key(pair[2], pair[3])
+                if key not in self._pair_rows and key not in pending:
+                    pending[key] = pair
+                rows.append(key)
+            occurrences.append((self._index(self.datasets, dataset), self._index(self.models, model), rows))
+
+        self._append_pairs(pending, workers)
+        for dataset_id, model_id, keys in occurrences:
+            kept = self.occurrences[(self.occurrences["dataset"] != dataset_id) | (self.occurrences["model"] != model_id)]
+            added = pd.DataFrame({
+                "dataset": np.int32(dataset_id),
+                "model": np.int32(model_id),
+                "utterance": utterances,
+                "pair": [self._pair_rows[key] for key in keys],
+            })
+            self.occurrences = pd.concat([kept, added], ignore_index=True)
+        return len(pending)
+
+    def _append_pairs(self, pending: dict, workers: int | None) -> None:
+        if not pending:
+            return
+        encoded = [
+            tuple(self._encode(tokens) for tokens in (ref_words, hyp_words, ref_chars, hyp_chars))
+            for ref_words, hyp_words, ref_chars, hyp_chars in pending.values()
+        ]
+        chunks = [encoded[start:start + CHUNK_SIZE] for start in range(0, len(encoded), CHUNK_SIZE)]
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+                aligned = [pair for part in pool.map(_align_chunk, chunks) for pair in part]
+        else:
+            aligned = [pair for chunk in chunks for pair in _align_chunk(chunk)]
+
+        for position, level in enumerate(LEVELS):
+            blocks = [pair[position] for pair in aligned]
+            lengths = np.array([len(block) for block in blocks], dtype=np.int64)
+            self.operations[level] = np.concatenate([self.operations[level], *blocks])
+            self.offsets[level] = np.concatenate([self.offsets[level], self.offsets[level][-1] + np.cumsum(lengths)])
+        first = len(self.pair_keys)
+        self.pair_keys = np.concatenate([self.pair_keys, np.array(list(pending), dtype=np.uint64)])
+        self._pair_rows.update({key: first + row for row, key in enumerate(pending)})
+
+    def _encode(self, tokens) -> list[int]:
+        try:
+            return list(map(self._token_ids.__getitem__, tokens))
+        except KeyError:
+            # Tokens nouveaux : ajoutés au vocabulaire
+            for token in tokens:
+                if token not in self._token_ids:
+                    self._token_ids[token] = len(self.vocabulary)
+                    self.vocabulary.append(token)
+            return list(map(self._token_ids.__getitem__, tokens))
+
+    @staticmethod
+    def _index(names: list, name: str) -> int:
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+
+    # --- Persistance ---
+
+    def save(self, path: str | Path | None = None) -> Path:
+        """Écrit le store (npz compressé) ; ``path`` par défaut : celui du constructeur."""
+        path = Path(path or self.path)
+        arrays = {
+            "vocabulary": np.array(self.vocabulary, dtype=str),
+            "pair_keys": self.pair_keys,
+            "datasets": np.array(self.datasets, dtype=str),
+            "models": np.array(self.models, dtype=str),
+            "occ_dataset": self.occurrences["dataset"].to_numpy(np.int32),
+            "occ_model": self.occurrences["model"].to_numpy(np.int32),
+            "occ_utterance": self.occurrences["utterance"].to_numpy(str),
+            "occ_pair": self.occurrences["pair"].to_numpy(np.int64),
+        }
+        for level in LEVELS:
+            arrays[f"{level}_operations"] = self.operations[level]
+            arrays[f"{level}_offsets"] = self.offsets[level]
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path) -> "AlignmentStore":
+        return cls(path)
+
+    def _read(self, path: Path) -> None:
+        with np.load(path, allow_pickle=False) as data:
+            self.vocabulary = data["vocabulary"].tolist()
+            self.pair_keys = data["pair_keys"]
+            self.datasets = data["datasets"].tolist()
+            self.models = data["models"].tolist()
+            self.occurrences = pd.DataFrame({
+                "dataset": data["occ_dataset"],
+                "model": data["occ_model"],
+                "utterance": data["occ_utterance"].astype(object),
+                "pair": data["occ_pair"],
+            })
+            for level in LEVELS:
+                self.operations[level] = data[f"{level}_operations"]
+                self.offsets[level] = data[f"{level}_offsets"]
+        self._token_ids = {token: token_id for token_id, token in enumerate(self.vocabulary)}
+        self._pair_rows = {int(key): row for row, key in enumerate(self.pair_keys)}
+
+    # --- Requêtes ---
+
+    def _select(self, models=None, datasets=None) -> pd.DataFrame:
+        selected = self.occurrences
+        if models is not None:
+            selected = selected[selected["model"].isin([self.models.index(m) for m in models if m in self.models])]
+        if datasets is not None:
+            selected = selected[selected["dataset"].isin([self.datasets.index(d) for d in datasets if d in self.datasets])]
+        return selected
+
+    def _operation_counts(self, level: str, occurrences: pd.DataFrame) -> pd.DataFrame:
+        """Opérations (op, ref, hyp) et leur nombre, pondérées par les occurrences des paires."""
+        weights = np.bincount(occurrences["pair"].to_numpy(np.int64), minlength=len(self.pair_keys))
+        per_operation = np.repeat(weights, np.diff(self.offsets[level]))
+        mask = per_operation > 0
+        operations = self.operations[level][mask]
+        frame = pd.DataFrame({
+            "op": operations[:, 0],
+            "ref": operations[:, 1],
+            "hyp": operations[:, 2],
+            "count": per_operation[mask],
+        })
+        return frame.groupby(["op", "ref", "hyp"], as_index=False, sort=False)["count"].sum()
+
+    def _grouped(self, by: str | None, models=None, datasets=None):
+        occurrences = self._select(models, datasets)
+        if by is None:
+            yield {}, occurrences
+            return
+        names = {"model": self.models, "dataset": self.datasets}[by]
+        for group_id, group in occurrences.groupby(by, sort=True):
+            yield {by: names[group_id]}, group
+
+    def _tokens(self, ids: np.ndarray) -> np.ndarray:
+        vocabulary = np.array(self.vocabulary + [""], dtype=object)
+        return vocabulary[ids]
+
+    def confusions(
+        self,
+        kind: str = "substitution",
+        level: str = "word",
+        models: list | None = None,
+        datasets: list | None = None,
+        by: str | None = None,
+    ) -> pd.DataFrame:
+        """
+        Table de confusion d'un type d'erreur, triée par fréquence décroissante.
+
+        - ``substitution`` : colonnes ``ref``, ``hyp``, ``count`` ;
+        - ``deletion`` : ``ref``, ``count`` (tokens de référence oubliés) ;
+        - ``insertion`` : ``hyp``, ``count`` (tokens ajoutés) ;
+        - ``error`` : ``ref``, ``count`` (tokens de référence substitués ou oubliés).
+
+        ``by`` (``"model"`` ou ``"dataset"``) ajoute une colonne et compte par groupe.
+        """
+        columns = {"substitution": ["ref", "hyp"], "deletion": ["ref"], "insertion": ["hyp"], "error": ["ref"]}[kind]
+        codes = [SUBSTITUTION, DELETION] if kind == "error" else [OPERATIONS[kind]]
+        tables = []
+        for labels, occurrences in self._grouped(by, models, datasets):
+            counts = self._operation_counts(level, occurrences)
+            counts = counts[counts["op"].isin(codes)].groupby(columns, as_index=False)["count"].sum()
+            for column in columns:
+                counts[column] = self._tokens(counts[column].to_numpy())
+            tables.append(counts.assign(**labels))
+        table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=columns + ["count"])
+        leading = [by] if by else []
+        return table[leading + columns + ["count"]].sort_values(leading + ["count"], ascending=[True] * len(leading) + [False], ignore_index=True)
+
+    def word_error_rates(
+        self,
+        level: str = "word",
+        models: list | None = None,
+        datasets: list | None = None,
+        min_count: int = 1,
+        by: str | None = None,
+    ) -> pd.DataFrame:
+        """
+        Taux d'erreur de chaque token de référence : nombre d'occurrences,
+        substitutions, suppressions et ``error_rate`` = (substitutions +
+        suppressions) / occurrences, trié par nombre d'erreurs décroissant.
+        """
+        tables = []
+        for labels, occurrences in self._grouped(by, models, datasets):
+            counts = self._operation_counts(level, occurrences)
+            counts = counts[counts["op"] != INSERTION]
+            table = counts.pivot_table(index="ref", columns="op", values="count", aggfunc="sum", fill_value=0)
+            table = table.reindex(columns=[HIT, SUBSTITUTION, DELETION], fill_value=0)
+            table.columns = ["hits", "substitutions", "deletions"]
+            table["occurrences"] = table.sum(axis=1)
+            table["errors"] = table["substitutions"] + table["deletions"]
+            table["error_rate"] = table["errors"] / table["occurrences"]
+            table = table[table["occurrences"] >= min_count].reset_index()
+            table["ref"] = self._tokens(table["ref"].to_numpy())
+            tables.append(table.rename(columns={"ref": "token"}).assign(**labels))
+        columns = ["token", "occurrences", "substitutions", "deletions", "errors", "error_rate"]
+        leading = [by] if by else []
+        if not tables:
+            return pd.DataFrame(columns=leading + columns)
+        table = pd.concat(tables, ignore_index=True)
+        return table[leading + columns].sort_values(
+            leading + ["errors", "error_rate"], ascending=[True] * len(leading) + [False, False], ignore_index=True,
+        )
+
+    def top_k(
+        self,
+        k: int = 10,
+        kind: str = "error",
+        level: str = "word",
+        models: list | None = None,
+        datasets: list | None = None,
+        by: str | None = None,
+    ) -> pd.DataFrame:
+        """Les ``k`` confusions les plus fréquentes (voir ``confusions``), par groupe si ``by``."""
+        table = self.confusions(kind, level, models, datasets, by)
+        return table.groupby(by, sort=True).head(k).reset_index(drop=True) if by else table.head(k)
+
+    def utterance_errors(self, dataset: str, model: str, utterance: str, level: str = "word") -> pd.DataFrame:
+        """Alignement complet d'un énoncé (une ligne par opération, succès compris)."""
+        occurrences = self._select([model], [dataset])
+        pair = occurrences.loc[occurrences["utterance"] == utterance, "pair"]
+        if pair.empty:
+            raise KeyError((dataset, model, utterance))
+        start, end = self.offsets[level][pair.iloc[0]], self.offsets[level][pair.iloc[0] + 1]
+        operations = self.operations[level][start:end]
+        names = {code: name for name, code in OPERATIONS.items()}
+        return pd.DataFrame({
+            "op": [names[code] for code in operations[:, 0]],
+            "ref": self._tokens(operations[:, 1]),
+            "hyp": self._tokens(operations[:, 2]),
+        })
@@ -0,0 +1,305 @@
+"""
+Benchmark de transcription reprenable, en remplacement des boucles des notebooks
+(``Projet9-BenchmarkLargeDistilledCT2CPU.ipynb``, ``Projet9-BenchmarkCT2GPU.ipynb``...).
+
+Chaque clip du manifeste est transcrit par chaque modèle configuré, sur un pool
+de ``--workers`` processus (chacun charge les modèles une fois). Chaque
+résultat est ajouté au fichier de sortie dès qu'il est mesuré (format de
+``projet9_results`` : audio_file, model, duration_s, raw_text, transcription,
+inference_time_s, elapsed_time_s, real_time_factor, language_detected) ; une
+relance saute les couples (clip, modèle) déjà présents et reprend là où le
+benchmark s'est arrêté.
+
+Manifestes acceptés :
+
+- TSV CommonVoice (colonnes ``path`` et ``sentence``), clips dans ``clips/`` à côté ;
+- TSV VoxPopuli (colonnes ``id`` et ``normalized_text``), clips ``{id}.wav`` dans ``clips/`` ;
+- ``transcripts.json`` des samples (``{fichier: texte}``), clips dans le même dossier ;
+- dossier d'un corpus prédécodé (``projet9_corpus``) : les clips sont lus
+  dans le memory-map, sans décodage ni rééchantillonnage.
+
+Modèles : ``nom=backend:chemin[:compute_type]``, backend ``ct2`` (faster-whisper)
+ou ``hf`` (transformers ; compute_type ``int8`` = quantification dynamique CPU
+comme dans le notebook CPU, ``float16`` sur GPU).
+
+Usage (depuis le dossier notebooks/) :
+
+    python projet9_benchmark.py data/subset10K/validated_subset.tsv \\
+        --model whisper_large_distilled_ct2_cpu=ct2:./models/whisper-large-v3-french-distil-dec16-ct2/ctranslate2:int8 \\
+        --model whisper_large_distilled_cpu=hf:./models/whisper-large-v3-french-distil-dec16:int8 \\
+        --workers 4 --threads 4 --output benchmark_results_commonvoice.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+
+from projet9_results import ResultWriter, iter_results
+
+SAMPLING_RATE = 16000
+BACKENDS = ("ct2", "hf")
+
+
+@dataclass(frozen=True)
+class Clip:
+    audio_file: str
+    audio_path: str
+    raw_text: str
+    # Position dans le corpus prédécodé, si le manifeste en est un
+    corpus_index: int | None = None
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    backend: str
+    path: str
+    compute_type: str | None = None
+
+
+def parse_model(spec: str) -> ModelSpec:
+    """Lit ``nom=backend:chemin[:compute_type]``."""
+    name, _, target = spec.partition("=")
+    backend, _, rest = target.partition(":")
+    path, _, compute_type = rest.partition(":")
+    if not name or backend not in BACKENDS or not path:
+        raise argparse.ArgumentTypeError(f"modèle invalide « {spec} » (attendu nom=ct2|hf:chemin[:compute_type])")
+    return ModelSpec(name, backend, path, compute_type or None)
+
+
+def read_manifest(manifest: str | Path, clips_dir: str | Path | None = None, text_column: str | None = None) -> list[Clip]:
+    """Clips d'un manifeste CommonVoice, VoxPopuli ou transcripts.json (voir l'en-tête du module)."""
+    manifest = Path(manifest)
+    if manifest.is_dir():
+        from projet9_corpus import AudioCorpus
+        entries = AudioCorpus(manifest).entries
+        return [Clip(entry["audio_file"], "", entry["raw_text"], index) for index, entry in enumerate(entries)]
+    if manifest.suffix == ".json":
+        folder = Path(clips_dir or manifest.parent)
+        transcripts = json.loads(manifest.read_text(encoding="utf-8"))
+        return [Clip(name, str(folder / name), str(text)) for name, text in transcripts.items()]
+
+    folder = Path(clips_dir or manifest.parent / "clips")
+    with open(manifest, encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f, delimiter="\t", quoting=csv.QUOTE_NONE))
+    if not rows:
+        return []
+    if "path" in rows[0]:
+        # CommonVoice
+        column = text_column or "sentence"
+        return [Clip(row["path"], str(folder / row["path"]), str(row[column])) for row in rows]
+    if "id" in rows[0]:
+        # VoxPopuli
+        column = text_column or "normalized_text"
+        return [Clip(f"{row['id']}.wav", str(folder / f"{row['id']}.wav"), str(row[column])) for row in rows]
+    raise ValueError(f"{manifest} : colonnes non reconnues ({', '.join(rows[0])})")
+
+
+class _Ct2Model:
+    def __init__(self, spec: ModelSpec, device: str, threads: int):
+        from faster_whisper import WhisperModel
+        compute_type = spec.compute_type or ("float16" if device == "cuda" else "int8")
+        self.model = WhisperModel(spec.path, device=device, compute_type=compute_type, cpu_threads=threads)
+
+    def transcribe(self, audio) -> dict:
+        start = time.perf_counter()
+        segments, info = self.model.transcribe(audio, beam_size=5, language="fr", condition_on_previous_text=False)
+        # Les segments sont produits à la demande : les consommer fait partie de l'inférence
+        transcription = " ".join(segment.text for segment in segments)
+        elapsed = time.perf_counter() - start
+        return {
+            "transcription": transcription,
+            "language_detected": info.language,
+            "inference_time_s": elapsed,
+            "elapsed_time_s": elapsed,
+        }
+
+
+class _HfModel:
+    def __init__(self, spec: ModelSpec, device: str, threads: int):
+        import torch
+        from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
+        torch.set_num_threads(threads)
+        self.torch = torch
+        self.device = device
+        self.processor = AutoProcessor.from_pretrained(spec.path)
+        dtype = torch.float16 if spec.compute_type == "float16" else torch.float32
+        model = AutoModelForSpeechSeq2Seq.from_pretrained(spec.path, torch_dtype=dtype).to(device)
+        model.eval()
+        if spec.compute_type == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.dtype = dtype
+
+    def transcribe(self, audio) -> dict:
+        start_global = time.perf_counter()
+        inputs = self.processor(audio, sampling_rate=SAMPLING_RATE, return_tensors="pt")
+        features = inputs["input_features"].to(self.device, dtype=self.dtype)
+        start_inf = time.perf_counter()
+        with self.torch.no_grad():
+            generated_ids = self.model.generate(features)
+        transcription = self.processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+        end = time.perf_counter()
+        return {
+            "transcription": transcription,
+            "language_detected": None,
+            "inference_time_s": end - start_inf,
+            "elapsed_time_s": end - start_global,
+        }
+
+
+# Modèles (et corpus prédécodé) chargés dans chaque processus du pool
+_MODELS: dict = {}
+_CORPUS = None
+
+
+def _load_models(specs: list[ModelSpec], device: str, threads: int, corpus: str | None = None) -> None:
+    global _CORPUS
+    backends = {"ct2": _Ct2Model, "hf": _HfModel}
+    for spec in specs:
+        _MODELS[spec.name] = backends[spec.backend](spec, device, threads)
+    if corpus is not None:
+        from projet9_corpus import AudioCorpus
+        _CORPUS = AudioCorpus(corpus)
+
+
+def _load_audio(clip: Clip):
+    if clip.corpus_index is not None:
+        # Vue du memory-map, passée telle quelle au modèle
+        return _CORPUS[clip.corpus_index].audio
+    import librosa
+    audio, _ = librosa.load(clip.audio_path, sr=SAMPLING_RATE, mono=True)
+    return audio
+
+
+def _run_clip(clip: Clip, models: list[str]) -> list[dict]:
+    """Transcrit un clip avec les modèles demandés ; un enregistrement par modèle."""
+    audio = _load_audio(clip)
+    duration_s = len(audio) / SAMPLING_RATE
+    records = []
+    for name in models:
+        result = _MODELS[name].transcribe(audio)
+        records.append({
+            "audio_file": clip.audio_file,
+            "model": name,
+            "duration_s": duration_s,
+            "raw_text": clip.raw_text,
+            **result,
+            "real_time_factor": result["inference_time_s"] / duration_s if duration_s else None,
+        })
+    return records
+
+
+def completed_pairs(output: str | Path) -> set[tuple[str, str]]:
+    """Couples (clip, modèle) déjà présents dans le fichier de sortie."""
+    output = Path(output)
+    if not output.exists():
+        return set()
+    done = set()
+    for chunk in iter_results(output, columns=[]):
+        done.update(zip(chunk["audio_file"], chunk["model"]))
+    return done
+
+
+def run(args) -> None:
+    clips = read_manifest(args.manifest, args.clips_dir, args.text_column)
+    corpus = args.manifest if Path(args.manifest).is_dir() else None
+    if args.limit:
+        clips = clips[:args.limit]
+    done = completed_pairs(args.output)
+    names = [spec.name for spec in args.model]
+
+    pending = []
+    for clip in clips:
+        missing = [name for name in names if (clip.audio_file, name) not in done]
+        if not missing:
+            continue
+        if clip.corpus_index is None and not os.path.exists(clip.audio_path):
+            print(f"⚠️ Fichier introuvable : {clip.audio_path}, ignoré.")
+            continue
+        pending.append((clip, missing))
+    print(f"{len(clips)} clips, {len(names)} modèles : {len(pending)} clips à traiter ({len(done)} résultats déjà présents)")
+
+    counts = {"written": 0, "failed": 0}
+    start = time.perf_counter()
+
+    def report() -> None:
+        rate = counts["written"] / max(time.perf_counter() - start, 1e-9)
+        print(f"{counts['written']} résultats écrits, {counts['failed']} échecs ({rate:.2f} résultats/s)")
+
+    # En Parquet, un fichier par lot : petits lots pour qu'un arrêt brutal perde peu de résultats
+    writer = ResultWriter(args.output, batch_size=args.checkpoint_every, flush_interval_s=args.checkpoint_interval)
+    with writer:
+
+        def save(clip: Clip, outcome) -> None:
+            if isinstance(outcome, Exception):
+                # Rien n'est écrit : la prochaine relance réessaie ce clip
+                counts["failed"] += 1
+                print(f"⚠️ {clip.audio_file} : {outcome}")
+                return
+            writer.write_many(outcome)
+            before = counts["written"]
+            counts["written"] += len(outcome)
+            if before // args.progress_every != counts["written"] // args.progress_every:
+                report()
+
+        if args.workers <= 1:
+            # Processus courant : pratique sur GPU ou pour déboguer
+            _load_models(args.model, args.device, args.threads, corpus)
+            for clip, missing in pending:
+                try:
+                    outcome = _run_clip(clip, missing)
+                except Exception as exc:
+                    outcome = exc
+                save(clip, outcome)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=args.workers,
+                initializer=_load_models,
+                initargs=(args.model, args.device, args.threads, corpus),
+            ) as pool:
+                queue = iter(pending)
+                in_flight = {}
+
+                def submit() -> None:
+                    item = next(queue, None)
+                    if item is not None:
+                        in_flight[pool.submit(_run_clip, *item)] = item[0]
+
+                # File bornée : quelques clips d'avance par worker, pas tout le manifeste
+                for _ in range(2 * args.workers):
+                    submit()
+                while in_flight:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        clip = in_flight.pop(future)
+                        save(clip, future.exception() or future.result())
+                        submit()
+    report()
+    if counts["failed"]:
+        print("Relancer la même commande pour réessayer les clips en échec.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="TSV CommonVoice / VoxPopuli, transcripts.json ou dossier de corpus prédécodé")
+    parser.add_argument("--model", type=parse_model, action="append", required=True,
+                        help="nom=backend:chemin[:compute_type], répétable")
+    parser.add_argument("--output", required=True, help="fichier .jsonl (ou dossier .parquet) de résultats")
+    parser.add_argument("--clips-dir", default=None, help="dossier des clips (défaut : clips/ à côté du TSV)")
+    parser.add_argument("--text-column", default=None, help="colonne de la transcription de référence")
+    parser.add_argument("--device", default="cpu", choices=["cpu", "cuda"])
+    parser.add_argument("--workers", type=int, default=1, help="processus de transcription")
+    parser.add_argument("--threads", type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                        help="threads par processus")
+    parser.add_argument("--limit", type=int, default=None, help="ne traiter que les N premiers clips")
+    parser.add_argument("--progress-every", type=int, default=100)
+    parser.add_argument("--checkpoint-every", type=int, default=100,
+                        help="sortie .parquet : résultats par fichier écrit")
+    parser.add_argument("--checkpoint-interval", type=float, default=60.0,
+                        help="sortie .parquet : délai maximal (s) avant écriture des résultats en attente")
+    run(parser.parse_args())
@@ -0,0 +1,309 @@
+"""
+Comparaison statistique de résultats de benchmark et contrôle de régression.
+
+Pour deux jeux de résultats ou plus (JSONL, Parquet ou JSON imbriqué, voir
+``projet9_results``), par modèle :
+
+- ``latency_table`` : moyenne et centiles p50/p90/p99 du temps d'inférence,
+  du temps total et du RTF (la queue de distribution, invisible dans
+  ``summarize_benchmark_dataframe``) ;
+- ``rtf_by_duration`` : RTF médian et p90 par classe de durée de clip ;
+- ``compare`` : écart entre un jeu de référence et un candidat, avec un
+  intervalle de confiance bootstrap, pour la latence (moyenne, centiles)
+  et le WER (moyenne par fichier, comme ``compute_transcription_metrics``,
+  et WER corpus). Le bootstrap est apparié sur les fichiers audio communs
+  aux deux jeux, indépendant sinon.
+
+En ligne de commande, le code de sortie est 1 si un candidat régresse :
+écart au-delà du seuil et intervalle de confiance entièrement au-dessus de
+zéro (une dégradation due au bruit de mesure ne bloque pas). Il est aussi
+1 si un candidat n'a donné aucun couple comparé (aucun modèle de même nom
+que la référence, sans ``--pair``) ou si un modèle de ``--pair`` est absent.
+
+Usage (depuis le dossier notebooks/) :
+
+    python projet9_compare.py reference=benchmark_v1.jsonl candidat=benchmark_v2.jsonl \\
+        --max-latency-increase 0.05 --max-wer-increase 0.005 --output comparaison.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from projet9_metrics import utterance_metrics
+from projet9_results import iter_results
+
+LATENCY_COLUMNS = ["inference_time_s", "elapsed_time_s", "real_time_factor"]
+PERCENTILES = (50, 90, 99)
+DURATION_BINS = (0, 2, 4, 6, 8, 10, 15, 20, 30, np.inf)
+# Tirages bootstrap calculés ensemble (borne la mémoire : bloc × nombre de fichiers)
+BOOTSTRAP_BLOCK = 200
+
+
+def load_result_set(source, models: list | None = None, workers: int | None = None) -> pd.DataFrame:
+    """
+    Résultats en format long avec le WER et le CER de chaque énoncé.
+
+    ``source`` : chemin de résultats ou DataFrame long (``load_results(..., wide=False)``).
+    Colonnes ajoutées : ``WER``, ``CER``, ``word_errors`` (S + D + I) et
+    ``reference_words`` (S + D + H).
+    """
+    if isinstance(source, pd.DataFrame):
+        results = source if models is None else source[source["model"].isin(models)]
+    else:
+        columns = ["duration_s", "raw_text", "transcription", *LATENCY_COLUMNS]
+        frames = list(iter_results(source, columns, models))
+        results = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["audio_file", "model", *columns])
+    results = results.reset_index(drop=True)
+    if results.empty:
+        return results.assign(WER=[], CER=[], word_errors=[], reference_words=[])
+    utterances = utterance_metrics(results["raw_text"], results["transcription"], workers)
+    return results.assign(
+        WER=utterances["WER"],
+        CER=utterances["CER"],
+        word_errors=utterances["substitutions"] + utterances["deletions"] + utterances["insertions"],
+        reference_words=utterances["hits"] + utterances["substitutions"] + utterances["deletions"],
+    )
+
+
+def _statistic(values: np.ndarray, name: str, axis=None):
+    if name == "mean":
+        return np.mean(values, axis=axis)
+    return np.percentile(values, float(name.lstrip("p")), axis=axis)
+
+
+def latency_table(sets: dict[str, pd.DataFrame], columns: list = LATENCY_COLUMNS, percentiles=PERCENTILES) -> pd.DataFrame:
+    """Nombre de fichiers, moyenne et centiles de chaque colonne de latence, par jeu et par modèle."""
+    rows = []
+    for label, results in sets.items():
+        for model, group in results.groupby("model", sort=False):
+            row = {"set": label, "model": model, "files": len(group)}
+            for column in columns:
+                values = group[column].dropna().to_numpy()
+                row[f"mean_{column}"] = values.mean() if len(values) else np.nan
+                for q in percentiles:
+                    row[f"p{q}_{column}"] = np.percentile(values, q) if len(values) else np.nan
+            row["mean_WER"] = group["WER"].mean()
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def rtf_by_duration(sets: dict[str, pd.DataFrame], bins=DURATION_BINS) -> pd.DataFrame:
+    """RTF (moyenne, médiane, p90) par classe de durée de clip, par jeu et par modèle."""
+    frames = []
+    for label, results in sets.items():
+        frame = results[["model", "duration_s", "real_time_factor"]].dropna()
+        frame = frame.assign(set=label, duration_bin=pd.cut(frame["duration_s"], bins=list(bins), right=False))
+        grouped = frame.groupby(["set", "model", "duration_bin"], observed=True, sort=True)["real_time_factor"]
+        frames.append(grouped.agg(
+            files="size",
+            mean_real_time_factor="mean",
+            p50_real_time_factor="median",
+            p90_real_time_factor=lambda values: np.percentile(values, 90),
+        ).reset_index())
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def _bootstrap(baseline: np.ndarray, candidate: np.ndarray, statistic, paired: bool, n_boot: int,
+               rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Statistique de la référence et du candidat sur ``n_boot`` rééchantillonnages."""
+    base_stats, cand_stats = [], []
+    for start in range(0, n_boot, BOOTSTRAP_BLOCK):
+        size = min(BOOTSTRAP_BLOCK, n_boot - start)
+        base_index = rng.integers(0, len(baseline), (size, len(baseline)))
+        # Apparié : les mêmes fichiers tirés des deux côtés
+        cand_index = base_index if paired else rng.integers(0, len(candidate), (size, len(candidate)))
+        base_stats.append(statistic(baseline, base_index))
+        cand_stats.append(statistic(candidate, cand_index))
+    return np.concatenate(base_stats), np.concatenate(cand_stats)
+
+
+def _delta_row(base_value, cand_value, base_boot, cand_boot, alpha: float) -> dict:
+    delta = cand_boot - base_boot
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = cand_boot / base_boot - 1
+    low, high = alpha / 2 * 100, (1 - alpha / 2) * 100
+    return {
+        "baseline": base_value,
+        "candidate": cand_value,
+        "delta": cand_value - base_value,
+        "delta_ci_low": np.percentile(delta, low),
+        "delta_ci_high": np.percentile(delta, high),
+        "relative_delta": cand_value / base_value - 1 if base_value else np.nan,
+        "relative_ci_low": np.nanpercentile(relative, low),
+        "relative_ci_high": np.nanpercentile(relative, high),
+    }
+
+
+def compare(
+    baseline: pd.DataFrame,
+    candidate: pd.DataFrame,
+    pairs: list[tuple[str, str]] | None = None,
+    latency_column: str = "inference_time_s",
+    latency_stats: tuple = ("mean", "p50", "p90", "p99"),
+    n_boot: int = 2000,
+    alpha: float = 0.05,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Écarts candidat − référence avec intervalles de confiance bootstrap à ``1 - alpha``.
+
+    ``pairs`` : couples (modèle de référence, modèle candidat) ; par défaut,
+    les modèles présents sous le même nom dans les deux jeux. Une ligne par
+    couple et par statistique : latence (``latency_column`` : ``mean``,
+    ``pNN``), ``WER`` moyen par fichier et ``corpus_WER``.
+    """
+    rng = np.random.default_rng(seed)
+    if pairs is None:
+        candidate_models = set(candidate["model"])
+        pairs = [(model, model) for model in baseline["model"].unique() if model in candidate_models]
+
+    rows = []
+    for base_model, cand_model in pairs:
+        base = baseline[baseline["model"] == base_model].drop_duplicates("audio_file").set_index("audio_file")
+        cand = candidate[candidate["model"] == cand_model].drop_duplicates("audio_file").set_index("audio_file")
+        common = base.index.intersection(cand.index)
+        paired = len(common) > 1
+        if paired:
+            base, cand = base.loc[common], cand.loc[common]
+        info = {"baseline_model": base_model, "candidate_model": cand_model, "paired": paired,
+                "baseline_files": len(base), "candidate_files": len(cand)}
+
+        metrics = [(latency_column, stat) for stat in latency_stats] + [("WER", "mean")]
+        for column, stat in metrics:
+            keep = base[column].notna() & cand[column].notna() if paired else None
+            base_values = (base[column][keep] if paired else base[column].dropna()).to_numpy(dtype=float)
+            cand_values = (cand[column][keep] if paired else cand[column].dropna()).to_numpy(dtype=float)
+            if len(base_values) < 2 or len(cand_values) < 2:
+                continue
+            base_boot, cand_boot = _bootstrap(
+                base_values, cand_values, lambda values, index: _statistic(values[index], stat, axis=1), paired, n_boot, rng,
+            )
+            rows.append({**info, "metric": column, "statistic": stat, **_delta_row(
+                _statistic(base_values, stat), _statistic(cand_values, stat), base_boot, cand_boot, alpha,
+            )})
+
+        # WER corpus : erreurs totales sur mots de référence totaux, rééchantillonnés par fichier
+        base_counts = base[["word_errors", "reference_words"]].dropna().to_numpy(dtype=float)
+        cand_counts = cand[["word_errors", "reference_words"]].dropna().to_numpy(dtype=float)
+        if paired:
+            both = base[["word_errors", "reference_words"]].notna().all(axis=1) & cand[["word_errors", "reference_words"]].notna().all(axis=1)
+            base_counts = base.loc[both, ["word_errors", "reference_words"]].to_numpy(dtype=float)
+            cand_counts = cand.loc[both, ["word_errors", "reference_words"]].to_numpy(dtype=float)
+        if len(base_counts) >= 2 and len(cand_counts) >= 2 and base_counts[:, 1].sum() and cand_counts[:, 1].sum():
+            def corpus_wer(counts, index):
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    return counts[index, 0].sum(axis=1) / counts[index, 1].sum(axis=1)
+            base_boot, cand_boot = _bootstrap(base_counts, cand_counts, corpus_wer, paired, n_boot, rng)
+            rows.append({**info, "metric": "corpus_WER", "statistic": "corpus", **_delta_row(
+                base_counts[:, 0].sum() / base_counts[:, 1].sum(),
+                cand_counts[:, 0].sum() / cand_counts[:, 1].sum(),
+                base_boot, cand_boot, alpha,
+            )})
+    return pd.DataFrame(rows)
+
+
+def find_regressions(
+    comparison: pd.DataFrame,
+    max_latency_increase: float = 0.05,
+    max_wer_increase: float = 0.005,
+    gated_stats: tuple = ("mean", "p90"),
+) -> pd.DataFrame:
+    """
+    Lignes de ``compare`` en régression.
+
+    Latence (statistiques ``gated_stats``) : hausse relative supérieure à
+    ``max_latency_increase`` ; WER moyen et WER corpus : hausse absolue
+    supérieure à ``max_wer_increase``. Dans les deux cas, la borne basse
+    de l'intervalle de confiance doit aussi être positive.
+    """
+    if comparison.empty:
+        return comparison
+    is_wer = comparison["metric"].isin(["WER", "corpus_WER"])
+    latency = ~is_wer & comparison["statistic"].isin(gated_stats) & (comparison["relative_delta"] > max_latency_increase) \
+        & (comparison["relative_ci_low"] > 0)
+    wer = is_wer & (comparison["delta"] > max_wer_increase) & (comparison["delta_ci_low"] > 0)
+    return comparison[latency | wer]
+
+
+def _parse_sources(items: list[str]) -> dict[str, str]:
+    sources = {}
+    for item in items:
+        label, _, path = item.rpartition("=")
+        sources[label or Path(path).stem] = path
+    return sources
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("results", nargs="+", help="[nom=]chemin de résultats ; le premier est la référence")
+    parser.add_argument("--pair", action="append", default=None,
+                        help="modèle_référence=modèle_candidat (répétable ; défaut : modèles de même nom)")
+    parser.add_argument("--latency-column", default="inference_time_s", choices=LATENCY_COLUMNS)
+    parser.add_argument("--gated-stats", default="mean,p90", help="statistiques de latence contrôlées (mean, pNN)")
+    parser.add_argument("--max-latency-increase", type=float, default=0.05, help="hausse relative de latence tolérée")
+    parser.add_argument("--max-wer-increase", type=float, default=0.005, help="hausse absolue de WER tolérée")
+    parser.add_argument("--bootstrap", type=int, default=2000, help="nombre de rééchantillonnages")
+    parser.add_argument("--alpha", type=float, default=0.05, help="1 - niveau de confiance des intervalles")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processus pour le calcul du WER")
+    parser.add_argument("--output", default=None, help="fichier JSON où écrire le rapport")
+    args = parser.parse_args()
+
+    sources = _parse_sources(args.results)
+    sets = {label: load_result_set(path, workers=args.workers) for label, path in sources.items()}
+    gated_stats = tuple(stat for stat in args.gated_stats.split(",") if stat)
+    latency_stats = tuple(dict.fromkeys(["mean", "p50", "p90", "p99", *gated_stats]))
+    pairs = [tuple(pair.split("=", 1)) for pair in args.pair] if args.pair else None
+
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", 30)
+    latencies = latency_table(sets)
+    by_duration = rtf_by_duration(sets)
+    print("=== Latences par modèle ===")
+    print(latencies.to_string(index=False))
+    print("\n=== RTF par durée de clip ===")
+    print(by_duration.to_string(index=False))
+
+    labels = list(sets)
+    comparisons, regressions, problems = [], [], []
+    for label in labels[1:]:
+        # Un contrôle qui n'a rien comparé ne doit pas passer
+        for base_model, cand_model in pairs or []:
+            if base_model not in set(sets[labels[0]]["model"]):
+                problems.append(f"{labels[0]} : modèle de référence absent : {base_model}")
+            if cand_model not in set(sets[label]["model"]):
+                problems.append(f"{label} : modèle candidat absent : {cand_model}")
+        comparison = compare(sets[labels[0]], sets[label], pairs, args.latency_column, latency_stats,
+                             args.bootstrap, args.alpha, args.seed).assign(baseline_set=labels[0], candidate_set=label)
+        comparisons.append(comparison)
+        regressions.append(find_regressions(comparison, args.max_latency_increase, args.max_wer_increase, gated_stats))
+        print(f"\n=== {label} contre {labels[0]} (IC {1 - args.alpha:.0%}) ===")
+        if comparison.empty:
+            problems.append(f"{label} : aucun couple de modèles comparé avec {labels[0]} (noms différents ? utiliser --pair)")
+        else:
+            print(comparison[["baseline_model", "candidate_model", "metric", "statistic", "baseline", "candidate",
+                              "delta", "delta_ci_low", "delta_ci_high", "relative_delta"]].to_string(index=False))
+
+    comparison = pd.concat(comparisons, ignore_index=True) if comparisons else pd.DataFrame()
+    regression = pd.concat(regressions, ignore_index=True) if regressions else pd.DataFrame()
+    if args.output:
+        report = {
+            "latency": latencies.to_dict(orient="records"),
+            "rtf_by_duration": by_duration.astype({"duration_bin": str}).to_dict(orient="records") if not by_duration.empty else [],
+            "comparison": comparison.to_dict(orient="records"),
+            "regressions": regression.to_dict(orient="records"),
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2, default=float), encoding="utf-8")
+
+    for row in regression.itertuples():
+        print(f"❌ {row.candidate_set}/{row.candidate_model} : {row.metric} {row.statistic} "
+              f"{row.baseline:.4f} → {row.candidate:.4f} (IC de l'écart [{row.delta_ci_low:.4f}, {row.delta_ci_high:.4f}])")
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not regression.empty or problems:
+        sys.exit(1)
+    print("✅ Aucune régression")
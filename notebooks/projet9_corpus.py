@@ -0,0 +1,220 @@
+"""
+Corpus audio prédécodé : tous les clips d'un sous-ensemble en 16 kHz mono float32,
+bout à bout dans un seul fichier lu par memory-map.
+
+Dossier d'un corpus :
+
+- ``audio.f32`` : échantillons float32 de tous les clips, concaténés ;
+- ``manifest.jsonl`` : un clip par ligne (audio_file, offset, length,
+  duration_s, raw_text), offset et length en échantillons ;
+- ``corpus.json`` : fréquence d'échantillonnage, type et décodeur utilisés.
+
+Le décodage est fait une fois (``build_corpus``), en parallèle ; ensuite
+``AudioCorpus`` donne chaque clip comme une vue du memory-map, sans copie ni
+redécodage, à passer directement au modèle (faster-whisper ou transformers
+acceptent un tableau numpy).
+
+Par défaut, le décodage passe par PyAV (``faster_whisper.decode_audio``), comme
+le service et faster-whisper lui-même ; ``--decoder librosa`` reproduit le
+chargement des notebooks.
+
+Usage (depuis le dossier notebooks/) :
+
+    python projet9_corpus.py data/subset10K/validated_subset.tsv data/subset10K/corpus --workers 8
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+SAMPLING_RATE = 16000
+DECODERS = ("pyav", "librosa")
+CHUNK_SIZE = 64
+
+
+@dataclass(frozen=True)
+class CorpusClip:
+    audio_file: str
+    raw_text: str
+    duration_s: float
+    audio: np.ndarray
+
+
+class AudioCorpus:
+    """
+    Lecture d'un corpus prédécodé.
+
+    ``corpus[i]`` ou ``corpus["fichier.mp3"]`` retourne un ``CorpusClip``
+    dont ``audio`` est une vue en lecture seule du memory-map.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.info = json.loads((self.path / "corpus.json").read_text(encoding="utf-8"))
+        self.sampling_rate = self.info["sampling_rate"]
+        self.entries = _read_manifest(self.path / "manifest.jsonl")
+        self._positions = {entry["audio_file"]: position for position, entry in enumerate(self.entries)}
+        audio_path = self.path / "audio.f32"
+        # np.memmap refuse un fichier vide
+        self.audio = (
+            np.memmap(audio_path, dtype=np.float32, mode="r")
+            if audio_path.exists() and audio_path.stat().st_size
+            else np.empty(0, dtype=np.float32)
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, audio_file: str) -> bool:
+        return audio_file in self._positions
+
+    def __getitem__(self, key: int | str) -> CorpusClip:
+        entry = self.entries[self._positions[key] if isinstance(key, str) else key]
+        return CorpusClip(
+            entry["audio_file"],
+            entry["raw_text"],
+            entry["duration_s"],
+            self.audio[entry["offset"]:entry["offset"] + entry["length"]],
+        )
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    @property
+    def total_duration_s(self) -> float:
+        return sum(entry["duration_s"] for entry in self.entries)
+
+
+def _read_manifest(path: Path) -> list[dict]:
+    entries = []
+    if not path.exists():
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Dernière ligne tronquée par une construction interrompue
+                if line.endswith("\n"):
+                    raise
+    return entries
+
+
+def _decode(audio_path: str, decoder: str) -> np.ndarray:
+    if decoder == "librosa":
+        import librosa
+        audio, _ = librosa.load(audio_path, sr=SAMPLING_RATE, mono=True)
+    else:
+        from faster_whisper import decode_audio
+        audio = decode_audio(audio_path, sampling_rate=SAMPLING_RATE)
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+
+def _decode_chunk(paths: list[str], decoder: str) -> list:
+    decoded = []
+    for audio_path in paths:
+        try:
+            decoded.append(_decode(audio_path, decoder))
+        except Exception as exc:
+            decoded.append(exc)
+    return decoded
+
+
+def build_corpus(
+    manifest: str | Path,
+    output_dir: str | Path,
+    clips_dir: str | Path | None = None,
+    text_column: str | None = None,
+    decoder: str = "pyav",
+    workers: int | None = None,
+) -> AudioCorpus:
+    """
+    Décode les clips d'un manifeste (voir ``projet9_benchmark.read_manifest``)
+    dans le corpus ``output_dir``.
+
+    Reprenable : les clips déjà présents sont sautés et les échantillons
+    écrits après la dernière entrée du manifeste (construction interrompue)
+    sont retirés avant de reprendre. Les clips introuvables ou illisibles
+    sont signalés et ignorés.
+    """
+    from projet9_benchmark import read_manifest
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    info_path = output_dir / "corpus.json"
+    info = {"sampling_rate": SAMPLING_RATE, "dtype": "float32", "decoder": decoder}
+    if info_path.exists() and json.loads(info_path.read_text(encoding="utf-8")) != info:
+        raise ValueError(f"{output_dir} : corpus existant construit avec d'autres paramètres")
+    info_path.write_text(json.dumps(info, indent=2), encoding="utf-8")
+
+    manifest_path = output_dir / "manifest.jsonl"
+    audio_path = output_dir / "audio.f32"
+    entries = _read_manifest(manifest_path)
+    done = {entry["audio_file"] for entry in entries}
+    end = max((entry["offset"] + entry["length"] for entry in entries), default=0)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        # Réécrit sans l'éventuelle ligne tronquée
+        f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+    with open(audio_path, "ab") as f:
+        f.truncate(end * 4)
+
+    clips = []
+    for clip in read_manifest(manifest, clips_dir, text_column):
+        if clip.audio_file in done:
+            continue
+        if not os.path.exists(clip.audio_path):
+            print(f"⚠️ Fichier introuvable : {clip.audio_path}, ignoré.")
+            continue
+        clips.append(clip)
+    print(f"{len(done)} clips déjà décodés, {len(clips)} à décoder")
+
+    chunks = [clips[start:start + CHUNK_SIZE] for start in range(0, len(clips), CHUNK_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    with open(audio_path, "ab") as audio_file, open(manifest_path, "a", encoding="utf-8") as manifest_file:
+        if workers > 1 and len(chunks) > 1:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(_decode_chunk, [[clip.audio_path for clip in chunk] for chunk in chunks], [decoder] * len(chunks))
+        else:
+            pool = None
+            results = (_decode_chunk([clip.audio_path for clip in chunk], decoder) for chunk in chunks)
+        try:
+            for chunk, decoded in zip(chunks, results):
+                for clip, audio in zip(chunk, decoded):
+                    if isinstance(audio, Exception):
+                        print(f"⚠️ {clip.audio_file} : {audio}")
+                        continue
+                    # Audio d'abord, entrée ensuite : une entrée présente a toujours ses échantillons
+                    audio_file.write(audio.tobytes())
+                    audio_file.flush()
+                    entry = {
+                        "audio_file": clip.audio_file,
+                        "offset": end,
+                        "length": len(audio),
+                        "duration_s": len(audio) / SAMPLING_RATE,
+                        "raw_text": clip.raw_text,
+                    }
+                    manifest_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    manifest_file.flush()
+                    end += len(audio)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+    return AudioCorpus(output_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="TSV CommonVoice / VoxPopuli ou transcripts.json")
+    parser.add_argument("output_dir", help="dossier du corpus")
+    parser.add_argument("--clips-dir", default=None, help="dossier des clips (défaut : clips/ à côté du TSV)")
+    parser.add_argument("--text-column", default=None, help="colonne de la transcription de référence")
+    parser.add_argument("--decoder", default="pyav", choices=DECODERS)
+    parser.add_argument("--workers", type=int, default=None, help="processus de décodage (défaut : tous les cœurs)")
+    args = parser.parse_args()
+    corpus = build_corpus(args.manifest, args.output_dir, args.clips_dir, args.text_column, args.decoder, args.workers)
+    print(f"{len(corpus)} clips, {corpus.total_duration_s / 3600:.2f} h d'audio dans {args.output_dir}")
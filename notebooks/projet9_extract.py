@@ -0,0 +1,376 @@
+"""
+Extraction d'un sous-ensemble de CommonVoice ou VoxPopuli (TSV + clips audio).
+
+Remplace les cellules du notebook Projet9-Data-extraction :
+
+- tirage en un seul passage sur le TSV (échantillonnage par réservoir, graine
+  fixée), sans charger toutes les lignes en mémoire ; stratification
+  possible par locuteur, par durée ou par n'importe quelle colonne (au plus
+  ``--max-per-stratum`` lignes gardées par strate, obligatoire hors durée) ;
+- index nom de fichier → dossier construit une fois (un ``os.scandir`` par
+  dossier ``train_part_*`` de VoxPopuli, au lieu de 15 ``os.path.exists`` par
+  clip), sauvegardable avec ``--index`` ;
+- copie des clips en parallèle, ou liens physiques / reflinks (``--link``),
+  reprenable : les fichiers déjà présents ne sont pas recopiés ;
+- écriture des manifestes attendus par l'application Streamlit et les
+  benchmarks : TSV réduit (lignes d'origine, dans leur ordre) et
+  ``transcripts.json``.
+
+Les lignes du TSV sont lues et réécrites telles quelles (un enregistrement
+par ligne, comme le lit ``projet9_benchmark.read_manifest``).
+
+Usage (depuis le dossier notebooks/) :
+
+    python projet9_extract.py data/common_voice_mozilla_fr/cv-corpus-21.0-2025-03-14/fr/validated.tsv \\
+        data/common_voice_mozilla_fr/cv-corpus-21.0-2025-03-14/fr/subset10K --samples 10000 --link hardlink
+    python projet9_extract.py data/voxpopuli_fr_train/asr_train.tsv data/voxpopuli_fr_train/samples_voxpopuli \\
+        --samples 50 --flat --stratify speaker --allocation equal --max-per-stratum 5 \\
+        --index data/voxpopuli_fr_train/clip_index.tsv
+"""
+import argparse
+import bisect
+import errno
+import fcntl
+import json
+import math
+import os
+import random
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+LINK_MODES = ("copy", "hardlink", "reflink", "symlink")
+ALLOCATIONS = ("proportional", "equal")
+# ioctl Linux de clonage de fichier (copy-on-write : btrfs, XFS)
+FICLONE = 0x40049409
+
+
+class _Reservoir:
+    """Échantillon uniforme de ``size`` éléments d'un flux (algorithme L de Li)."""
+
+    def __init__(self, size: int, rng: random.Random):
+        self.size = size
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+        self._weight = 0.0
+        self._next = 0
+
+    def _skip(self) -> None:
+        # Nombre d'éléments à sauter avant le prochain remplacement (loi géométrique)
+        self._next += int(math.log(self.rng.random()) / math.log(1 - self._weight)) + 1
+
+    def offer(self, item) -> None:
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            if len(self.items) == self.size:
+                self._weight = math.exp(math.log(self.rng.random()) / self.size)
+                self._next = self.seen
+                self._skip()
+        elif self.seen == self._next:
+            self.items[self.rng.randrange(self.size)] = item
+            self._weight *= math.exp(math.log(self.rng.random()) / self.size)
+            self._skip()
+
+
+def detect_format(header: list[str]) -> dict:
+    """Colonnes du fichier audio, de la transcription et du locuteur (CommonVoice ou VoxPopuli)."""
+    if "path" in header:
+        return {"dataset": "commonvoice", "file": "path", "suffix": "", "text": "sentence", "speaker": "client_id"}
+    if "id" in header:
+        return {"dataset": "voxpopuli", "file": "id", "suffix": ".wav", "text": "normalized_text", "speaker": "speaker_id"}
+    raise ValueError(f"Colonnes non reconnues ({', '.join(header)})")
+
+
+def load_durations(path: str | Path) -> dict[str, float]:
+    """Durées (s) par clip de ``clip_durations.tsv`` (CommonVoice : clip, duration[ms])."""
+    durations = {}
+    with open(path, encoding="utf-8") as f:
+        next(f)
+        for line in f:
+            clip, _, milliseconds = line.rstrip("\n").partition("\t")
+            durations[clip] = int(milliseconds) / 1000
+    return durations
+
+
+def _allocate(sizes: dict, available: dict, n: int, allocation: str) -> dict:
+    """Nombre de clips tirés par strate (plus forts restes ; places inutilisées redistribuées)."""
+    quotas = {stratum: 0 for stratum in sizes}
+    remaining, open_strata = n, [s for s in sizes if available[s] > 0]
+    while remaining > 0 and open_strata:
+        weights = {s: sizes[s] if allocation == "proportional" else 1 for s in open_strata}
+        total = sum(weights.values())
+        shares = {s: remaining * weights[s] / total for s in open_strata}
+        extra = {s: min(int(shares[s]), available[s] - quotas[s]) for s in open_strata}
+        # Plus forts restes pour les places non attribuées par la partie entière
+        leftover = remaining - sum(extra.values())
+        for s in sorted(open_strata, key=lambda s: shares[s] - int(shares[s]), reverse=True):
+            if leftover <= 0:
+                break
+            if quotas[s] + extra[s] < available[s]:
+                extra[s] += 1
+                leftover -= 1
+        if not any(extra.values()):
+            break
+        for s in open_strata:
+            quotas[s] += extra[s]
+            remaining -= extra[s]
+        open_strata = [s for s in open_strata if quotas[s] < available[s]]
+    return quotas
+
+
+def sample_rows(
+    tsv: str | Path,
+    n: int,
+    seed: int = 42,
+    stratify: str | None = None,
+    allocation: str = "proportional",
+    max_per_stratum: int | None = None,
+    durations: dict[str, float] | None = None,
+    duration_bins: list[float] | None = None,
+) -> tuple[str, dict, list[tuple[int, list[str], str]]]:
+    """
+    Tire ``n`` lignes du TSV en un passage.
+
+    Sans ``stratify``, tirage uniforme (réservoir). Avec ``stratify``
+    (``"speaker"``, ``"duration"`` ou un nom de colonne), un réservoir de
+    ``max_per_stratum`` lignes est tenu par strate, puis
+    ``n`` est réparti entre strates proportionnellement à leur taille ou à
+    parts égales (``allocation="equal"``, par exemple pour maximiser le
+    nombre de locuteurs). La durée vient de la colonne ``duration`` du TSV
+    ou de ``durations`` (``load_durations``), découpée selon ``duration_bins``
+    (secondes).
+
+    Mémoire : au plus (nombre de strates) × ``max_per_stratum`` lignes.
+    Par durée, les strates sont les ``len(duration_bins) + 2`` classes (dont
+    « inconnue ») et ``max_per_stratum`` vaut ``n`` par défaut. Par locuteur
+    ou par colonne, le nombre de strates n'est pas borné (des dizaines de
+    milliers de locuteurs dans CommonVoice) : ``max_per_stratum`` est alors
+    obligatoire. En répartition égale, ``ceil(n / strates attendues)``
+    suffit ; en proportionnelle, il doit couvrir le quota de la plus grande
+    strate, sinon les places manquantes sont redistribuées aux autres.
+
+    Retour
+    ------
+    (ligne d'en-tête, format détecté, lignes tirées dans l'ordre du fichier
+    sous forme (numéro, champs, ligne brute))
+    """
+    rng = random.Random(seed)
+    with open(tsv, encoding="utf-8", newline="") as f:
+        header_line = f.readline()
+        header = header_line.rstrip("\r\n").split("\t")
+        fmt = detect_format(header)
+        file_index = header.index(fmt["file"])
+        if stratify is None:
+            key_index = None
+        elif stratify == "duration":
+            key_index = header.index("duration") if "duration" in header else None
+            if key_index is None and durations is None:
+                raise ValueError("Stratification par durée : colonne duration absente, fournir clip_durations.tsv")
+        else:
+            column = fmt["speaker"] if stratify == "speaker" else stratify
+            if column not in header:
+                raise ValueError(f"Colonne {column} absente du TSV")
+            if max_per_stratum is None:
+                raise ValueError(f"Stratification par {column} : nombre de strates non borné, préciser max_per_stratum")
+            key_index = header.index(column)
+        bins = sorted(duration_bins or [])
+
+        def stratum(fields: list[str]):
+            if stratify != "duration":
+                return fields[key_index]
+            try:
+                seconds = float(fields[key_index]) if key_index is not None else durations[fields[file_index]]
+            except (KeyError, ValueError, IndexError):
+                return "inconnue"
+            position = bisect.bisect_right(bins, seconds)
+            low = bins[position - 1] if position else 0
+            return f"[{low:g}, {bins[position]:g}[" if position < len(bins) else f"≥ {low:g}"
+
+        reservoirs: dict = {}
+        capacity = max_per_stratum or n
+        for number, line in enumerate(f):
+            if not line.strip():
+                continue
+            fields = line.rstrip("\r\n").split("\t")
+            key = stratum(fields) if stratify else None
+            reservoir = reservoirs.get(key)
+            if reservoir is None:
+                reservoir = reservoirs[key] = _Reservoir(capacity if stratify else n, rng)
+            # Les champs ne sont gardés que pour les lignes retenues
+            reservoir.offer((number, line))
+
+    if stratify is None:
+        chosen = reservoirs[None].items if reservoirs else []
+    else:
+        sizes = {key: reservoir.seen for key, reservoir in reservoirs.items()}
+        available = {key: len(reservoir.items) for key, reservoir in reservoirs.items()}
+        quotas = _allocate(sizes, available, n, allocation)
+        chosen = []
+        for key in sorted(reservoirs, key=str):
+            chosen += rng.sample(reservoirs[key].items, quotas[key])
+    chosen.sort()
+    rows = [(number, line.rstrip("\r\n").split("\t"), line) for number, line in chosen]
+    return header_line, fmt, rows
+
+
+def build_clip_index(audio_dirs: list[str | Path]) -> dict[str, str]:
+    """Nom de fichier → dossier, en un parcours de chaque dossier (le premier trouvé l'emporte)."""
+    index = {}
+    for folder in audio_dirs:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name not in index:
+                    index[entry.name] = str(folder)
+    return index
+
+
+def load_or_build_index(audio_dirs: list[str | Path], index_path: str | Path | None = None) -> dict[str, str]:
+    """Index sauvegardé dans ``index_path`` (TSV nom, dossier) s'il existe, construit sinon."""
+    if index_path and Path(index_path).exists():
+        with open(index_path, encoding="utf-8") as f:
+            return dict(line.rstrip("\n").split("\t", 1) for line in f)
+    index = build_clip_index(audio_dirs)
+    if index_path:
+        with open(index_path, "w", encoding="utf-8") as f:
+            f.writelines(f"{name}\t{folder}\n" for name, folder in index.items())
+    return index
+
+
+def default_audio_dirs(tsv: str | Path) -> list[Path]:
+    """``clips/`` à côté du TSV (CommonVoice), sinon les dossiers ``train_part_*`` (VoxPopuli)."""
+    base = Path(tsv).parent
+    if (base / "clips").is_dir():
+        return [base / "clips"]
+    return sorted(base.glob("train_part_*"), key=lambda path: (len(path.name), path.name))
+
+
+def _reflink(src: str, dst: str) -> None:
+    with open(src, "rb") as source, open(dst, "wb") as target:
+        fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+
+def _materialize(src: str, dst: str, link: str) -> None:
+    if os.path.exists(dst) and os.path.getsize(dst) == os.path.getsize(src):
+        return
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        if link == "hardlink":
+            os.link(src, dst)
+            return
+        if link == "symlink":
+            os.symlink(os.path.abspath(src), dst)
+            return
+        if link == "reflink":
+            _reflink(src, dst)
+            return
+    except OSError as exc:
+        # Autre système de fichiers ou clonage non supporté : copie classique
+        if exc.errno not in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM):
+            raise
+        if os.path.lexists(dst):
+            os.remove(dst)
+    shutil.copyfile(src, dst)
+
+
+def extract_subset(
+    tsv: str | Path,
+    output_dir: str | Path,
+    n: int,
+    seed: int = 42,
+    audio_dirs: list[str | Path] | None = None,
+    index_path: str | Path | None = None,
+    link: str = "copy",
+    flat: bool = False,
+    workers: int = 16,
+    **sampling,
+) -> dict:
+    """
+    Tire ``n`` clips du TSV et les place dans ``output_dir``.
+
+    Sorties : ``<nom du TSV>_subset.tsv`` (lignes tirées, ordre d'origine),
+    ``transcripts.json`` (fichier → transcription de référence, clips
+    trouvés seulement) et les clips, dans ``output_dir/clips`` ou, avec
+    ``flat``, directement dans ``output_dir`` (format des samples Streamlit).
+    ``sampling`` est passé à ``sample_rows``.
+    """
+    output_dir = Path(output_dir)
+    clips_out = output_dir if flat else output_dir / "clips"
+    clips_out.mkdir(parents=True, exist_ok=True)
+
+    header_line, fmt, rows = sample_rows(tsv, n, seed, **sampling)
+    header = header_line.rstrip("\r\n").split("\t")
+    file_index, text_index = header.index(fmt["file"]), header.index(fmt["text"])
+
+    audio_dirs = audio_dirs or default_audio_dirs(tsv)
+    # Un seul dossier : chemin direct ; plusieurs (train_part_*) : index construit une fois
+    index = load_or_build_index(audio_dirs, index_path) if len(audio_dirs) > 1 else None
+
+    tasks, transcripts, missing = [], {}, []
+    for _, fields, _ in rows:
+        filename = fields[file_index] + fmt["suffix"]
+        folder = index.get(filename) if index is not None else str(audio_dirs[0]) if audio_dirs else None
+        src = os.path.join(folder, filename) if folder else None
+        if src is None or (index is None and not os.path.exists(src)):
+            missing.append(filename)
+            continue
+        tasks.append((src, str(clips_out / filename)))
+        transcripts[filename] = fields[text_index]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda task: _materialize(*task, link), tasks))
+
+    subset_tsv = output_dir / f"{Path(tsv).stem}_subset.tsv"
+    with open(subset_tsv, "w", encoding="utf-8", newline="") as f:
+        f.write(header_line)
+        f.writelines(line if line.endswith("\n") else line + "\n" for _, _, line in rows)
+    with open(output_dir / "transcripts.json", "w", encoding="utf-8") as f:
+        json.dump(transcripts, f, ensure_ascii=False, indent=2)
+
+    for filename in missing:
+        print(f"⚠️ Fichier audio introuvable : {filename}")
+    return {"tsv": str(subset_tsv), "clips_dir": str(clips_out), "sampled": len(rows), "clips": len(tasks), "missing": len(missing)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tsv", help="validated.tsv (CommonVoice) ou asr_train.tsv (VoxPopuli)")
+    parser.add_argument("output_dir", help="dossier du sous-ensemble")
+    parser.add_argument("--samples", type=int, default=10000, help="nombre de clips tirés")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stratify", default=None, help="speaker, duration ou nom d'une colonne du TSV")
+    parser.add_argument("--allocation", default="proportional", choices=ALLOCATIONS, help="répartition entre strates")
+    parser.add_argument("--max-per-stratum", type=int, default=None,
+                        help="lignes gardées par strate (obligatoire sauf --stratify duration, où il vaut --samples par défaut)")
+    parser.add_argument("--durations", default=None, help="clip_durations.tsv pour --stratify duration")
+    parser.add_argument("--duration-bins", default="2,4,6,8", help="bornes des classes de durée (s)")
+    parser.add_argument("--audio-dir", action="append", default=None, help="dossier des clips (répétable ; défaut : clips/ ou train_part_*)")
+    parser.add_argument("--index", default=None, help="fichier d'index nom → dossier (chargé s'il existe, sinon créé)")
+    parser.add_argument("--link", default="copy", choices=LINK_MODES, help="copie, lien physique, reflink ou lien symbolique")
+    parser.add_argument("--flat", action="store_true", help="clips directement dans output_dir (samples Streamlit)")
+    parser.add_argument("--workers", type=int, default=16, help="copies simultanées")
+    args = parser.parse_args()
+    if args.stratify not in (None, "duration") and args.max_per_stratum is None:
+        parser.error("--max-per-stratum est obligatoire avec --stratify speaker ou une colonne (mémoire : strates × max)")
+
+    summary = extract_subset(
+        args.tsv,
+        args.output_dir,
+        args.samples,
+        args.seed,
+        audio_dirs=args.audio_dir,
+        index_path=args.index,
+        link=args.link,
+        flat=args.flat,
+        workers=args.workers,
+        stratify=args.stratify,
+        allocation=args.allocation,
+        max_per_stratum=args.max_per_stratum,
+        durations=load_durations(args.durations) if args.durations else None,
+        duration_bins=[float(bound) for bound in args.duration_bins.split(",") if bound],
+    )
+    print("✅ Extraction terminée :")
+    print(f"- {summary['tsv']} ({summary['sampled']} lignes)")
+    print(f"- {summary['clips']} fichiers dans {summary['clips_dir']} ({summary['missing']} introuvables)")
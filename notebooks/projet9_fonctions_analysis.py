@@ -1,5 +1,6 @@
 import json
 import pandas as pd
+from projet9_results import load_results
 
 def benchmark_json_to_dataframe(json_path: str) -> pd.DataFrame:
     """
@@ -9,13 +10,17 @@ def benchmark_json_to_dataframe(json_path: str) -> pd.DataFrame:
     Paramètres
     ----------
     json_path : str
-        Chemin du fichier JSON à charger.
+        Chemin du fichier JSON à charger, ou de résultats JSONL / Parquet
+        (``projet9_results``).
     
     Retour
     ------
     pd.DataFrame
         Tableau avec une ligne par fichier audio et colonnes aplaties.
     """
+    if not str(json_path).endswith(".json"):
+        return load_results(json_path)
+
     # Charger le fichier JSON
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
@@ -37,23 +42,28 @@ def benchmark_json_to_dataframe(json_path: str) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 import pandas as pd
+from projet9_results import summarize_results
 
-def summarize_benchmark_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+def summarize_benchmark_dataframe(df) -> pd.DataFrame:
     """
     Crée un DataFrame résumé par modèle à partir d'un DataFrame
     de benchmarks aplati (issu du JSON) et trie par sum_elapsed_time_s décroissant.
 
     Paramètres
     ----------
-    df : pd.DataFrame
+    df : pd.DataFrame | str
         DataFrame contenant les colonnes duration_s, raw_text et
-        les métriques des modèles (inference_time, elapsed_time, real_time_factor).
+        les métriques des modèles (inference_time, elapsed_time, real_time_factor),
+        ou chemin de résultats JSONL / Parquet (``projet9_results``), lus par blocs.
 
     Retour
     ------
     pd.DataFrame
         Résumé par modèle avec les moyennes et sommes, trié.
     """
+    if not isinstance(df, pd.DataFrame):
+        return summarize_results(df)
+
     models = set()
     for col in df.columns:
         if col.endswith("_inference_time_s"):
@@ -169,52 +179,52 @@ from collections import Counter
 import matplotlib.cm as cm
 import numpy as np
 
-def analyze_text_from_dataframe(df: pd.DataFrame, text_col: str = "raw_text") -> None:
+from projet9_textstats import CHUNK_SIZE, text_stats
+
+def analyze_text_from_dataframe(
+    df: pd.DataFrame,
+    text_col: str = "raw_text",
+    top_k: int = None,
+    chunksize: int = CHUNK_SIZE,
+) -> None:
     """
     Analyse le texte d'un DataFrame et génère des statistiques + diagrammes circulaires.
 
+    Les transcriptions sont comptées par blocs (``projet9_textstats``) : le
+    texte du corpus n'est jamais concaténé en entier.
+
     Paramètres
     ----------
     df : pd.DataFrame
-        DataFrame contenant au moins une colonne de texte.
+        DataFrame contenant au moins une colonne de texte, ou chemin d'un
+        TSV lu par blocs (par exemple ``validated.tsv``, ``text_col="sentence"``).
     text_col : str
         Nom de la colonne contenant le texte (par défaut 'raw_text').
+    top_k : int
+        Si renseigné, seuls ``top_k`` mots sont suivis (comptes approchés,
+        mémoire bornée) et le nombre de mots différents est estimé.
+    chunksize : int
+        Nombre de transcriptions par bloc.
     """
     # -------------------------------
-    # Préparer le texte
-    # -------------------------------
-    all_text = " ".join(df[text_col].astype(str))  # concaténer toutes les phrases
-    all_text_lower = all_text.lower()             # uniformiser la casse
-
-    # -------------------------------
-    # Compter les mots
-    # -------------------------------
-    words = all_text_lower.split()                # split sur espaces
-    word_counts = Counter(words)
-    num_words = len(word_counts)
-    top10_words = word_counts.most_common(10)
-
-    # -------------------------------
-    # Compter les caractères
+    # Compter mots et caractères (texte en minuscules, caractères hors espaces)
     # -------------------------------
-    chars = list(all_text_lower.replace(" ", "")) # enlever espaces
-    char_counts = Counter(chars)
-    num_chars = len(char_counts)
-    top10_chars = char_counts.most_common(10)
+    stats = text_stats(df, text_col, top_k=top_k, chunksize=chunksize)
+    word_counts = stats.word_counts()
+    char_counts = stats.chars
 
     # -------------------------------
     # Affichage des stats
     # -------------------------------
-    print(f"Nombre de mots différents : {num_words}")
-    print(f"Nombre de caractères différents : {num_chars}")
-    print(f"Top 10 mots les plus fréquents : {top10_words}")
-    print(f"Top 10 caractères les plus fréquents : {top10_chars}")
+    print(f"Nombre de mots différents : {stats.num_words}{'' if stats.exact else ' (estimé)'}")
+    print(f"Nombre de caractères différents : {stats.num_chars}")
+    print(f"Top 10 mots les plus fréquents : {stats.most_common_words(10)}")
+    print(f"Top 10 caractères les plus fréquents : {stats.most_common_chars(10)}")
 
     # -------------------------------
     # Fonction interne pour diagramme circulaire
     # -------------------------------
-    def plot_pie_top10(counter, title):
-        total = sum(counter.values())
+    def plot_pie_top10(counter, total, title):
         top10 = counter.most_common(10)
         other_count = total - sum([c for _, c in top10])
 
@@ -231,20 +241,30 @@ def analyze_text_from_dataframe(df: pd.DataFrame, text_col: str = "raw_text") ->
     # -------------------------------
     # Afficher diagrammes circulaires
     # -------------------------------
-    plot_pie_top10(word_counts, "Proportion des 10 mots les plus fréquents")
-    plot_pie_top10(char_counts, "Proportion des 10 caractères les plus fréquents")
-
+    plot_pie_top10(word_counts, stats.total_words, "Proportion des 10 mots les plus fréquents")
+    plot_pie_top10(char_counts, stats.total_chars, "Proportion des 10 caractères les plus fréquents")
 
 
 import pandas as pd
 from collections import Counter
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
-
-def analyze_transcription_errors(df: pd.DataFrame, ref_col: str = "raw_text", models: list = None) -> None:
+from projet9_alignments import AlignmentStore
+
+def analyze_transcription_errors(
+    df: pd.DataFrame,
+    ref_col: str = "raw_text",
+    models: list = None,
+    store: AlignmentStore = None,
+    dataset: str = "default",
+) -> AlignmentStore:
     """
     Analyse les erreurs de transcription (mots et caractères) pour plusieurs modèles.
 
+    Les erreurs viennent de l'alignement de Levenshtein entre référence et
+    transcription (mots substitués ou oubliés), et non d'une comparaison
+    position par position qu'une seule insertion décale.
+
     Paramètres
     ----------
     df : pd.DataFrame
@@ -253,6 +273,16 @@ def analyze_transcription_errors(df: pd.DataFrame, ref_col: str = "raw_text", mo
         Nom de la colonne contenant le texte de référence (par défaut "raw_text").
     models : list, optional
         Liste des modèles à analyser. Si None, utilise une liste par défaut.
+    store : AlignmentStore, optional
+        Store d'alignements à compléter et réutiliser (un store en mémoire sinon).
+    dataset : str
+        Nom du jeu de données dans le store (par défaut "default").
+
+    Retour
+    ------
+    AlignmentStore
+        Le store contenant les alignements, pour d'autres requêtes
+        (``confusions``, ``word_error_rates``, ``top_k``).
     """
     # Liste par défaut si aucune fournie
     if models is None:
@@ -264,23 +294,16 @@ def analyze_transcription_errors(df: pd.DataFrame, ref_col: str = "raw_text", mo
             "whisper_large_distilled_gpu",
             "whisper_large_distilled_ct2_gpu"
         ]
+    store = store if store is not None else AlignmentStore()
+    present = [model for model in models if f"{model}_transcription" in df.columns]
+    store.add(df, dataset=dataset, ref_col=ref_col, models=present)
 
     # --- Sous-fonctions ---
-    def get_mistakes(ref_series, hyp_series):
-        mistakes = []
-        for ref, hyp in zip(ref_series.astype(str), hyp_series.astype(str)):
-            ref_words = ref.lower().split()
-            hyp_words = hyp.lower().split()
-            mistakes += [w_ref for w_ref, w_hyp in zip(ref_words, hyp_words) if w_ref != w_hyp]
-        return Counter(mistakes)
-
-    def get_char_mistakes(ref_series, hyp_series):
-        mistakes = []
-        for ref, hyp in zip(ref_series.astype(str), hyp_series.astype(str)):
-            ref_chars = list(ref.lower().replace(" ", ""))
-            hyp_chars = list(hyp.lower().replace(" ", ""))
-            mistakes += [c_ref for c_ref, c_hyp in zip(ref_chars, hyp_chars) if c_ref != c_hyp]
-        return Counter(mistakes)
+    def get_mistakes(model, level):
+        errors = store.confusions("error", level=level, models=[model], datasets=[dataset])
+        # Les espaces ne comptent pas comme caractères mal transcrits
+        errors = errors[errors["ref"] != " "]
+        return Counter(dict(zip(errors["ref"], errors["count"])))
 
     def plot_pie_top10(counter, title):
         total = sum(counter.values())
@@ -309,38 +332,53 @@ def analyze_transcription_errors(df: pd.DataFrame, ref_col: str = "raw_text", mo
             continue
 
         # Mots mal transcrits
-        word_mistakes = get_mistakes(df[ref_col], df[hyp_col])
+        word_mistakes = get_mistakes(model, "word")
         print("Top 10 mots mal transcrits :", word_mistakes.most_common(10))
         plot_pie_top10(word_mistakes, f"{model} - Top 10 mots mal transcrits")
 
         # Caractères mal transcrits
-        char_mistakes = get_char_mistakes(df[ref_col], df[hyp_col])
+        char_mistakes = get_mistakes(model, "char")
         print("Top 10 caractères mal transcrits :", char_mistakes.most_common(10))
         plot_pie_top10(char_mistakes, f"{model} - Top 10 caractères mal transcrits")
 
+    return store
+
 
 
 
 import pandas as pd
 import jiwer
+from projet9_results import transcription_metrics_results
 
-def compute_transcription_metrics(df: pd.DataFrame, ref_col: str = "raw_text") -> pd.DataFrame:
+def compute_transcription_metrics(df, ref_col: str = "raw_text") -> pd.DataFrame:
     """
     Calcule les métriques de transcription (WER, CER, MER, WIL, WIP, Sub/Ins/Del/Hits)
     pour toutes les colonnes de transcription d'un DataFrame.
 
     Paramètres
     ----------
-    df : pd.DataFrame
-        DataFrame contenant une colonne de référence et des colonnes de transcription.
+    df : pd.DataFrame | str
+        DataFrame contenant une colonne de référence et des colonnes de transcription,
+        ou chemin de résultats JSONL / Parquet (``projet9_results``), lus par blocs.
     ref_col : str
-        Nom de la colonne contenant le texte de référence (par défaut "raw_text").
+        Nom de la colonne contenant le texte de référence (par défaut "raw_text"),
+        dans le DataFrame comme dans les enregistrements du fichier.
 
     Retour
     ------
     pd.DataFrame
         DataFrame avec une ligne par modèle et les métriques, trié par WER croissant.
+
+    Notes
+    -----
+    Pour un chemin, les moyennes par fichier (WER, CER...) d'un modèle qui a
+    sauté des fichiers diffèrent du DataFrame : ces fichiers n'ont pas
+    d'enregistrement et sont ignorés, alors qu'ici une transcription absente
+    est comptée comme l'hypothèse "nan" (voir ``transcription_metrics_results``).
     """
+    if not isinstance(df, pd.DataFrame):
+        return transcription_metrics_results(df, ref_col=ref_col)
+
     # Identifier les colonnes de transcription
     transcription_cols = [col for col in df.columns if col.endswith("_transcription")]
 
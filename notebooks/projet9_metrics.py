@@ -0,0 +1,249 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from rapidfuzz.distance import Levenshtein
+
+# Nombre de paires (référence, hypothèse) traitées par tâche du pool de processus
+CHUNK_SIZE = 2000
+
+# Colonnes de comptes par énoncé : mots puis caractères
+COUNT_COLUMNS = [
+    "hits", "substitutions", "deletions", "insertions",
+    "char_hits", "char_substitutions", "char_deletions", "char_insertions",
+]
+
+# RemoveMultipleSpaces de jiwer
+_MULTIPLE_SPACES = re.compile(r"\s\s+")
+
+
+def normalize_column(texts: pd.Series) -> tuple[list, list]:
+    """
+    Normalise une colonne de textes une seule fois : minuscules et espaces
+    de bord retirés (comme ``compute_transcription_metrics``), puis découpage
+    identique aux transformations par défaut de jiwer (``wer_default`` pour
+    les mots, ``cer_default`` pour les caractères).
+
+    Retour
+    ------
+    tuple[list, list]
+        Listes de mots et chaînes de caractères, une par ligne.
+    """
+    cleaned = [str(text).lower().strip() for text in texts]
+    words = [
+        [word for word in _MULTIPLE_SPACES.sub(" ", text).strip().split(" ") if word]
+        for text in cleaned
+    ]
+    # cer_default : le texte déjà nettoyé, caractère par caractère (espaces compris)
+    return words, cleaned
+
+
+def _count_edits(reference, hypothesis) -> tuple[int, int, int, int]:
+    # Un seul alignement de Levenshtein (celui de jiwer) : le nombre de substitutions et
+    # de modifications suffit, suppressions - insertions valant len(reference) - len(hypothesis)
+    operations = [operation[0] for operation in Levenshtein.editops(reference, hypothesis).as_list()]
+    subs = operations.count("replace")
+    dels = (len(operations) - subs + len(reference) - len(hypothesis)) // 2
+    ins = len(operations) - subs - dels
+    return len(reference) - subs - dels, subs, dels, ins
+
+
+def _count_chunk(pairs: list) -> np.ndarray:
+    counts = np.empty((len(pairs), len(COUNT_COLUMNS)), dtype=np.int64)
+    for row, (ref_words, hyp_words, ref_chars, hyp_chars) in enumerate(pairs):
+        counts[row, :4] = _count_edits(ref_words, hyp_words)
+        counts[row, 4:] = _count_edits(ref_chars, hyp_chars)
+    return counts
+
+
+def _rates(hits, subs, dels, ins, ref_len, hyp_len) -> dict:
+    """
+    Taux d'erreur calculés comme jiwer (mêmes opérations flottantes, mêmes
+    cas particuliers pour une référence ou une hypothèse vide).
+    """
+    hits, subs, dels, ins = (np.asarray(x, dtype=np.float64) for x in (hits, subs, dels, ins))
+    ref_len, hyp_len = np.asarray(ref_len), np.asarray(hyp_len)
+    errors = subs + dels + ins
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wer = np.where(ref_len == 0, ins, errors / (hits + subs + dels))
+        mer = np.where(ref_len == 0, np.where(hyp_len == 0, 0.0, 1.0), errors / (hits + subs + dels + ins))
+        wip = np.where(
+            ref_len == 0,
+            np.where(hyp_len == 0, 1.0, 0.0),
+            np.where(hyp_len >= 1, (hits / ref_len) * (hits / hyp_len), 0.0),
+        )
+    return {"WER": wer, "MER": mer, "WIL": 1 - wip, "WIP": wip}
+
+
+def _count_pairs(pairs: list, workers: int | None = None) -> np.ndarray:
+    """Comptes d'éditions de chaque paire, calculés par paquets sur ``workers`` processus."""
+    chunks = [pairs[start:start + CHUNK_SIZE] for start in range(0, len(pairs), CHUNK_SIZE)]
+    if not chunks:
+        return np.empty((0, len(COUNT_COLUMNS)), dtype=np.int64)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            return np.concatenate(list(pool.map(_count_chunk, chunks)))
+    return np.concatenate([_count_chunk(chunk) for chunk in chunks])
+
+
+def _utterance_frame(counts: np.ndarray, references: tuple[list, list], hypotheses: tuple[list, list], index) -> pd.DataFrame:
+    result = pd.DataFrame(counts, columns=COUNT_COLUMNS, index=index)
+    for prefix, (words, chars) in (("ref", references), ("hyp", hypotheses)):
+        result[f"{prefix}_words"] = [len(sentence) for sentence in words]
+        result[f"{prefix}_chars"] = [len(sentence) for sentence in chars]
+
+    word_rates = _rates(*counts[:, :4].T, result["ref_words"], result["hyp_words"])
+    char_rates = _rates(*counts[:, 4:].T, result["ref_chars"], result["hyp_chars"])
+    for name, values in word_rates.items():
+        result[name] = values
+    result["CER"] = char_rates["WER"]
+    return result
+
+
+def _pairs(references: tuple[list, list], hypotheses: tuple[list, list]) -> list:
+    return list(zip(references[0], hypotheses[0], references[1], hypotheses[1]))
+
+
+def utterance_metrics(
+    references: pd.Series,
+    hypotheses: pd.Series,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    Métriques par énoncé (WER, CER, MER, WIL, WIP et comptes d'éditions)
+    pour une colonne d'hypothèses.
+
+    Les alignements mots et caractères sont calculés en un passage par paire,
+    répartis sur ``workers`` processus (``os.cpu_count()`` par défaut, 1 pour
+    rester dans le processus courant).
+
+    Paramètres
+    ----------
+    references, hypotheses : pd.Series
+        Textes de référence et transcriptions, alignés ligne à ligne.
+    workers : int, optional
+        Nombre de processus.
+
+    Retour
+    ------
+    pd.DataFrame
+        Une ligne par énoncé, indexée comme ``references``.
+    """
+    normalized_references = normalize_column(references)
+    normalized_hypotheses = normalize_column(hypotheses)
+    counts = _count_pairs(_pairs(normalized_references, normalized_hypotheses), workers)
+    return _utterance_frame(counts, normalized_references, normalized_hypotheses, references.index)
+
+
+class MetricsAccumulator:
+    """
+    Résumé des métriques d'un modèle, alimenté bloc d'énoncés après bloc.
+
+    Les moyennes sont des sommes séquentielles dans l'ordre des énoncés,
+    comme ``sum(liste) / len(liste)`` dans ``compute_transcription_metrics`` :
+    le résultat ne dépend pas du découpage en blocs.
+    """
+
+    RATES = ("WER", "CER", "MER", "WIL", "WIP")
+    TOTALS = COUNT_COLUMNS + ["ref_words", "hyp_words", "ref_chars", "hyp_chars"]
+
+    def __init__(self):
+        self.utterances = 0
+        self.rate_sums = dict.fromkeys(self.RATES, 0)
+        self.totals = dict.fromkeys(self.TOTALS, 0)
+        self.ref_split_words = 0
+
+    def update(self, utterances: pd.DataFrame, references) -> None:
+        """Ajoute les métriques par énoncé d'un bloc (``utterance_metrics``) et ses références brutes."""
+        self.utterances += len(utterances)
+        for name in self.RATES:
+            total = self.rate_sums[name]
+            for value in utterances[name].tolist():
+                total += value
+            self.rate_sums[name] = total
+        for name in self.TOTALS:
+            self.totals[name] += int(utterances[name].sum())
+        # Total_Ref_Words : découpage str.split() comme dans compute_transcription_metrics
+        self.ref_split_words += sum(len(str(text).lower().strip().split()) for text in references)
+
+    def summary(self, model: str) -> dict:
+        totals = self.totals
+        corpus_words = _rates(
+            totals["hits"], totals["substitutions"], totals["deletions"], totals["insertions"],
+            totals["ref_words"], totals["hyp_words"],
+        )
+        corpus_chars = _rates(
+            totals["char_hits"], totals["char_substitutions"], totals["char_deletions"], totals["char_insertions"],
+            totals["ref_chars"], totals["hyp_chars"],
+        )
+        return {
+            "model": model,
+            **{name: self.rate_sums[name] / self.utterances for name in self.RATES},
+            "Substitutions": totals["substitutions"],
+            "Insertions": totals["insertions"],
+            "Deletions": totals["deletions"],
+            "Hits": totals["hits"],
+            "Total_Ref_Words": self.ref_split_words,
+            "corpus_WER": float(corpus_words["WER"]),
+            "corpus_CER": float(corpus_chars["WER"]),
+            "corpus_MER": float(corpus_words["MER"]),
+            "corpus_WIL": float(corpus_words["WIL"]),
+        }
+
+
+def compute_transcription_metrics_fast(
+    df: pd.DataFrame,
+    ref_col: str = "raw_text",
+    workers: int | None = None,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Équivalent parallèle de ``compute_transcription_metrics``.
+
+    La référence est normalisée une fois pour toutes les colonnes
+    ``*_transcription``, chaque colonne d'hypothèses une fois, et les
+    alignements de toutes les colonnes sont calculés sur un même pool de
+    processus.
+
+    Paramètres
+    ----------
+    df : pd.DataFrame
+        DataFrame contenant une colonne de référence et des colonnes de transcription.
+    ref_col : str
+        Nom de la colonne contenant le texte de référence (par défaut "raw_text").
+    workers : int, optional
+        Nombre de processus (``os.cpu_count()`` par défaut).
+
+    Retour
+    ------
+    tuple[pd.DataFrame, pd.DataFrame]
+        - résumé par modèle, trié par WER croissant : mêmes colonnes et mêmes
+          valeurs que ``compute_transcription_metrics`` (moyennes par énoncé),
+          plus ``corpus_WER``, ``corpus_CER``, ``corpus_MER`` et ``corpus_WIL``
+          (micro-moyennes : erreurs totales sur mots totaux) ;
+        - métriques par énoncé, une ligne par (énoncé, modèle).
+    """
+    transcription_cols = [col for col in df.columns if col.endswith("_transcription")]
+    references = normalize_column(df[ref_col])
+
+    # Toutes les colonnes passent dans le même pool de processus
+    hypotheses = {col: normalize_column(df[col]) for col in transcription_cols}
+    pairs = [pair for col in transcription_cols for pair in _pairs(references, hypotheses[col])]
+    counts = _count_pairs(pairs, workers)
+
+    metrics, per_utterance = [], []
+    for position, col in enumerate(transcription_cols):
+        model_name = col.replace("_transcription", "")
+        column_counts = counts[position * len(df):(position + 1) * len(df)]
+        utterances = _utterance_frame(column_counts, references, hypotheses[col], df.index)
+
+        accumulator = MetricsAccumulator()
+        accumulator.update(utterances, df[ref_col])
+        metrics.append(accumulator.summary(model_name))
+        per_utterance.append(utterances.assign(model=model_name))
+
+    accuracy_df = pd.DataFrame(metrics).sort_values(by="WER")
+    utterances_df = pd.concat(per_utterance) if per_utterance else pd.DataFrame()
+    return accuracy_df, utterances_df
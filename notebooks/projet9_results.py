@@ -0,0 +1,409 @@
+"""
+Résultats de benchmark en format long : un enregistrement par (fichier audio, modèle).
+
+Colonnes typées (``RESULT_COLUMNS``) :
+
+    audio_file, model, duration_s, raw_text, transcription,
+    inference_time_s, elapsed_time_s, real_time_factor, language_detected
+
+Les autres clés d'un modèle (métriques ajoutées par un benchmark) sont
+gardées telles quelles.
+
+Deux formats, en ajout seul :
+
+- JSONL (``*.jsonl``) : une ligne par enregistrement, écrite et vidée au fil
+  du benchmark ; ajouter un modèle ou des clips revient à ajouter des lignes ;
+- Parquet (dossier ``*.parquet``) : un fichier ``part-NNNNN.parquet`` par lot
+  écrit. Nécessite pyarrow.
+
+Conversion depuis le JSON imbriqué des notebooks de benchmark
+(``{"data": {audio_file: {"duration_s", "raw_text", modèle: {...}}}}``) :
+
+    python projet9_results.py benchmark_results_merged_cpu_gpu.json benchmark_results.jsonl
+"""
+import argparse
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from projet9_metrics import MetricsAccumulator, utterance_metrics
+
+TEXT_COLUMNS = ["audio_file", "model", "raw_text", "transcription", "language_detected"]
+FLOAT_COLUMNS = ["duration_s", "inference_time_s", "elapsed_time_s", "real_time_factor"]
+RESULT_COLUMNS = ["audio_file", "model", "duration_s", "raw_text", "transcription",
+                  "inference_time_s", "elapsed_time_s", "real_time_factor", "language_detected"]
+# Clés communes à tous les modèles d'un fichier audio, dans le format imbriqué
+AUDIO_COLUMNS = ["duration_s", "raw_text"]
+
+CHUNKSIZE = 50_000
+
+
+def _typed(frame: pd.DataFrame) -> pd.DataFrame:
+    """Ajoute les colonnes manquantes, force le type des colonnes numériques et note NaN les textes absents."""
+    for column in RESULT_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = np.nan
+    for column in FLOAT_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype("float64")
+    for column in TEXT_COLUMNS:
+        # null JSONL ou None : NaN, comme les références manquantes des transcripts.json
+        frame[column] = frame[column].where(frame[column].notna(), np.nan)
+    extra = [column for column in frame.columns if column not in RESULT_COLUMNS]
+    return frame[RESULT_COLUMNS + extra]
+
+
+def _is_parquet(path: Path) -> bool:
+    return path.suffix == ".parquet"
+
+
+class ResultWriter:
+    """
+    Écriture en ajout seul des résultats d'un benchmark.
+
+    En JSONL, chaque ``write`` ajoute une ligne vidée sur disque : un
+    benchmark interrompu garde tout ce qu'il a déjà mesuré. En Parquet, les
+    enregistrements sont regroupés par ``batch_size``, ou au plus tard
+    ``flush_interval_s`` secondes après le premier enregistrement en
+    attente, et chaque lot devient un nouveau fichier du dossier (écrit
+    sous un nom temporaire puis renommé : un arrêt brutal ne laisse pas de
+    fichier tronqué). Un arrêt brutal perd au plus le lot en attente.
+    """
+
+    def __init__(self, path: str | Path, batch_size: int = 10_000, flush_interval_s: float | None = None):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._buffer: list[dict] = []
+        self._buffered_since = 0.0
+        if _is_parquet(self.path):
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._file = None
+        else:
+            _drop_partial_line(self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, record: dict) -> None:
+        """Ajoute un enregistrement (``audio_file`` et ``model`` obligatoires)."""
+        if not record.get("audio_file") or not record.get("model"):
+            raise ValueError("audio_file et model sont obligatoires")
+        if self._file is not None:
+            self._file.write(json.dumps(_json_safe(record), ensure_ascii=False) + "\n")
+            self._file.flush()
+            return
+        if not self._buffer:
+            self._buffered_since = time.monotonic()
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size or (
+            self.flush_interval_s is not None
+            and time.monotonic() - self._buffered_since >= self.flush_interval_s
+        ):
+            self.flush()
+
+    def write_many(self, records) -> None:
+        for record in records:
+            self.write(record)
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+            return
+        if not self._buffer:
+            return
+        index = len(list(self.path.glob("part-*.parquet")))
+        frame = _typed(pd.DataFrame(self._buffer))
+        temporary = self.path / f".part-{index:05d}.parquet.tmp"
+        frame.to_parquet(temporary, index=False)
+        os.replace(temporary, self.path / f"part-{index:05d}.parquet")
+        self._buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _drop_partial_line(path: Path) -> None:
+    """Retire une dernière ligne incomplète (écriture interrompue) avant d'ajouter à un JSONL."""
+    if not path.exists() or path.stat().st_size == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) == b"\n":
+            return
+        # Recul jusqu'au dernier saut de ligne
+        position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            step = min(65536, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                f.truncate(position + newline + 1)
+                return
+        f.truncate(0)
+
+
+def _json_safe(record: dict) -> dict:
+    # NaN n'est pas du JSON valide : null à la place
+    return {key: None if isinstance(value, float) and math.isnan(value) else value for key, value in record.items()}
+
+
+def _skip_whitespace(text: str, position: int) -> int:
+    while position < len(text) and text[position] in " \t\r\n":
+        position += 1
+    return position
+
+
+def _expect(text: str, position: int, char: str) -> int:
+    position = _skip_whitespace(text, position)
+    if text[position:position + 1] != char:
+        raise ValueError(f"« {char} » attendu à la position {position}")
+    return position + 1
+
+
+def _next_key(text: str, position: int, decoder: json.JSONDecoder, first: bool) -> tuple[str | None, int]:
+    """Clé suivante d'un objet JSON (None en fin d'objet) et position de sa valeur."""
+    position = _skip_whitespace(text, position)
+    if text[position:position + 1] == "}":
+        return None, position + 1
+    if not first:
+        position = _skip_whitespace(text, _expect(text, position, ","))
+    key, position = decoder.raw_decode(text, position)
+    return key, _skip_whitespace(text, _expect(text, position, ":"))
+
+
+def iter_nested_json(json_path: str | Path) -> Iterator[dict]:
+    """
+    Enregistrements longs d'un JSON de benchmark imbriqué, fichier audio par fichier audio.
+
+    Les entrées de ``data`` sont décodées une par une : seule l'entrée en
+    cours est convertie en objets Python (le texte du fichier est lu en
+    entier, mais le dictionnaire de tous les fichiers n'est jamais construit).
+    """
+    text = Path(json_path).read_text(encoding="utf-8")
+    decoder = json.JSONDecoder()
+    position = _expect(text, 0, "{")
+    first = True
+    while True:
+        key, position = _next_key(text, position, decoder, first)
+        if key is None:
+            return
+        first = False
+        if key != "data":
+            _, position = decoder.raw_decode(text, position)
+            continue
+        position = _expect(text, position, "{")
+        first_entry = True
+        while True:
+            audio_file, position = _next_key(text, position, decoder, first_entry)
+            if audio_file is None:
+                break
+            first_entry = False
+            metrics, position = decoder.raw_decode(text, position)
+            yield from _flatten_entry(audio_file, metrics)
+
+
+def _flatten_entry(audio_file: str, metrics: dict) -> Iterator[dict]:
+    common = {key: value for key, value in metrics.items() if not isinstance(value, dict)}
+    for model, values in metrics.items():
+        if isinstance(values, dict):
+            yield {"audio_file": audio_file, "model": model, **common, **values}
+
+
+def convert_nested_json(json_path: str | Path, output_path: str | Path, batch_size: int = 10_000) -> int:
+    """Convertit un JSON de benchmark imbriqué en JSONL ou Parquet ; retourne le nombre d'enregistrements."""
+    count = 0
+    with ResultWriter(output_path, batch_size=batch_size) as writer:
+        for record in iter_nested_json(json_path):
+            writer.write(record)
+            count += 1
+    return count
+
+
+def iter_results(
+    path: str | Path,
+    columns: list | None = None,
+    models: list | None = None,
+    chunksize: int = CHUNKSIZE,
+) -> Iterator[pd.DataFrame]:
+    """
+    Lit des résultats par blocs d'au plus ``chunksize`` enregistrements.
+
+    Paramètres
+    ----------
+    path : str | Path
+        Fichier JSONL, dossier Parquet ou JSON imbriqué (converti à la volée).
+    columns : list, optional
+        Colonnes à garder (``audio_file`` et ``model`` sont toujours lues).
+    models : list, optional
+        Modèles à garder.
+    chunksize : int
+        Taille des blocs.
+    """
+    path = Path(path)
+    keep = None if columns is None else list(dict.fromkeys(["audio_file", "model", *columns]))
+
+    if _is_parquet(path):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("La lecture Parquet nécessite pyarrow (pip install pyarrow)") from exc
+        for part in sorted(path.glob("part-*.parquet")):
+            parquet = pq.ParquetFile(part)
+            available = [column for column in keep if column in parquet.schema.names] if keep else None
+            for batch in parquet.iter_batches(batch_size=chunksize, columns=available):
+                yield from _select(batch.to_pandas(), keep, models)
+        return
+
+    if path.suffix == ".json":
+        frames = _batched(iter_nested_json(path), chunksize)
+    else:
+        frames = (pd.DataFrame(records) for records in _batched(_iter_jsonl(path), chunksize))
+    for frame in frames:
+        yield from _select(pd.DataFrame(frame), keep, models)
+
+
+def _iter_jsonl(path: Path) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Dernière ligne tronquée par une écriture interrompue : ignorée
+                if line.endswith("\n"):
+                    raise
+
+
+def _batched(records: Iterator[dict], size: int) -> Iterator[list]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _select(frame: pd.DataFrame, keep: list | None, models: list | None) -> Iterator[pd.DataFrame]:
+    if models is not None:
+        frame = frame[frame["model"].isin(models)]
+    if frame.empty:
+        return
+    frame = _typed(frame)
+    yield frame if keep is None else frame[keep]
+
+
+def to_wide(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Format long vers le format large de ``benchmark_json_to_dataframe`` :
+    une ligne par fichier audio, colonnes ``{modèle}_{métrique}``.
+    """
+    common = [column for column in ["audio_file", *AUDIO_COLUMNS] if column in results.columns]
+    wide = results[common].drop_duplicates("audio_file").set_index("audio_file")
+    metrics = [column for column in results.columns if column not in common and column != "model"]
+    for model, group in results.groupby("model", sort=False):
+        values = group.set_index("audio_file")[metrics].dropna(axis=1, how="all")
+        wide = wide.join(values.add_prefix(f"{model}_"), how="outer")
+    return wide.reset_index()
+
+
+def load_results(
+    path: str | Path,
+    columns: list | None = None,
+    models: list | None = None,
+    wide: bool = True,
+) -> pd.DataFrame:
+    """Charge des résultats (colonnes et modèles choisis) ; ``wide`` : format de ``benchmark_json_to_dataframe``."""
+    frames = list(iter_results(path, columns, models))
+    results = pd.concat(frames, ignore_index=True) if frames else _typed(pd.DataFrame(columns=RESULT_COLUMNS))
+    return to_wide(results) if wide else results
+
+
+def summarize_results(path: str | Path, models: list | None = None, chunksize: int = CHUNKSIZE) -> pd.DataFrame:
+    """
+    Équivalent de ``summarize_benchmark_dataframe`` calculé bloc par bloc.
+
+    Les sommes et moyennes de durée portent sur les fichiers de chaque
+    modèle (identiques à celles de ``summarize_benchmark_dataframe`` quand
+    tous les modèles ont traité tous les fichiers).
+    """
+    columns = ["duration_s", "inference_time_s", "elapsed_time_s", "real_time_factor"]
+    sums, counts = {}, {}
+    for chunk in iter_results(path, ["model", *columns], models, chunksize):
+        grouped = chunk.groupby("model", sort=False)[columns]
+        for model, total in grouped.sum().iterrows():
+            sums[model] = sums.get(model, 0) + total
+        for model, count in grouped.count().iterrows():
+            counts[model] = counts.get(model, 0) + count
+
+    summary = []
+    for model in sums:
+        total, count = sums[model], counts[model]
+        row = {"model": model}
+        for column in columns:
+            if count[column] == 0:
+                continue
+            if column != "real_time_factor":
+                row[f"sum_{column}"] = total[column]
+            row[f"mean_{column}"] = total[column] / count[column]
+        summary.append(row)
+
+    summary_df = pd.DataFrame(summary)
+    if "sum_elapsed_time_s" in summary_df.columns:
+        summary_df = summary_df.sort_values(by="sum_elapsed_time_s", ascending=False)
+    return summary_df
+
+
+def transcription_metrics_results(
+    path: str | Path,
+    models: list | None = None,
+    chunksize: int = CHUNKSIZE,
+    workers: int | None = None,
+    ref_col: str = "raw_text",
+) -> pd.DataFrame:
+    """
+    Équivalent de ``compute_transcription_metrics`` calculé bloc par bloc
+    (moteur de ``projet9_metrics``) : mêmes valeurs quand les
+    enregistrements de chaque modèle suivent l'ordre des lignes du
+    DataFrame large, plus les métriques corpus.
+
+    Les moyennes par fichier (``WER``, ``CER``...) portent sur les fichiers
+    transcrits par chaque modèle : un fichier sans transcription n'a pas
+    d'enregistrement, alors que le DataFrame large le compte avec
+    l'hypothèse ``"nan"``. Les valeurs diffèrent donc pour un modèle qui a
+    sauté des fichiers (identiques quand tous les modèles les ont tous
+    traités).
+    """
+    accumulators = {}
+    for chunk in iter_results(path, [ref_col, "transcription"], models, chunksize):
+        if ref_col not in chunk.columns:
+            raise KeyError(f"Colonne de référence {ref_col!r} absente des résultats {path}")
+        for model, group in chunk.groupby("model", sort=False):
+            utterances = utterance_metrics(group[ref_col], group["transcription"], workers)
+            accumulators.setdefault(model, MetricsAccumulator()).update(utterances, group[ref_col])
+    metrics = [accumulator.summary(model) for model, accumulator in accumulators.items()]
+    return pd.DataFrame(metrics).sort_values(by="WER") if metrics else pd.DataFrame()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("json_path", help="JSON de benchmark imbriqué")
+    parser.add_argument("output_path", help="fichier .jsonl ou dossier .parquet")
+    args = parser.parse_args()
+    print(f"{convert_nested_json(args.json_path, args.output_path)} enregistrements écrits dans {args.output_path}")
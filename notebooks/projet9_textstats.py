@@ -0,0 +1,332 @@
+"""
+Statistiques de texte en flux sur de gros corpus (mots et caractères).
+
+``TextStats`` reçoit les transcriptions par blocs (``update``) et tient à
+jour les compteurs de mots et de caractères sans jamais concaténer tout le
+corpus : la mémoire ne dépend que de la taille d'un bloc et du vocabulaire.
+Les mots et caractères sont comptés comme dans ``analyze_text_from_dataframe``
+(texte en minuscules, mots séparés par les blancs, caractères hors espaces).
+
+Avec ``top_k``, le vocabulaire n'est plus gardé en entier : un résumé
+Space-Saving de ``top_k`` mots donne les mots fréquents (avec une borne
+d'erreur par mot) et un HyperLogLog estime le nombre de mots différents.
+Les caractères, peu nombreux, restent comptés exactement.
+
+Deux résultats partiels se fusionnent (``merge``), y compris sauvegardés en
+JSON : un gros TSV ou plusieurs morceaux de TSV se traitent en parallèle
+(``stats_from_tsv``), sur une ou plusieurs machines.
+
+Usage (depuis le dossier notebooks/) :
+
+    python projet9_textstats.py data/cv-corpus-21.0/fr/validated.tsv --top-k 20000 --workers 8 --output stats.json
+    python projet9_textstats.py stats_part1.json stats_part2.json --output stats.json
+"""
+import argparse
+import json
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 100_000
+# 2^14 registres HyperLogLog : erreur relative d'environ 0,8 %
+HLL_PRECISION = 14
+
+
+class _HyperLogLog:
+    """Estimation du nombre d'éléments distincts en mémoire fixe (fusion par maximum)."""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, items: list[str]) -> None:
+        if not items:
+            return
+        # Empreinte 64 bits stable d'un processus à l'autre (contrairement à hash())
+        hashes = pd.util.hash_array(np.asarray(items, dtype=object))
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Rang du premier bit à 1 ; exact en float64 car rest < 2^53
+        rank = np.full(len(rest), rest_bits + 1, dtype=np.uint8)
+        nonzero = rest > 0
+        rank[nonzero] = rest_bits - np.floor(np.log2(rest[nonzero].astype(np.float64))).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "_HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Petites cardinalités : comptage linéaire
+            raw = m * np.log(m / zeros)
+        return int(round(raw))
+
+
+class _SpaceSaving:
+    """
+    Résumé Space-Saving des ``capacity`` éléments les plus fréquents.
+
+    ``counts`` surestime le vrai compte d'au plus ``errors`` ; tout élément
+    plus fréquent que ``floor`` est présent dans le résumé. La fusion suit
+    Agarwal et al. (« Mergeable Summaries ») : un élément absent d'un résumé
+    plein y est compté au minimum de ce résumé.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+
+    @property
+    def floor(self) -> int:
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, counts: dict, errors: dict | None = None, floor: int = 0) -> None:
+        errors = errors or {}
+        own_floor = self.floor
+        merged, merged_errors = {}, {}
+        # Ordre déterministe (premières apparitions) pour départager les ex æquo
+        for key in [*self.counts, *(key for key in counts if key not in self.counts)]:
+            merged[key] = self.counts.get(key, own_floor) + counts.get(key, floor)
+            merged_errors[key] = (
+                (self.errors.get(key, 0) if key in self.counts else own_floor)
+                + (errors.get(key, 0) if key in counts else floor)
+            )
+        if len(merged) > self.capacity:
+            kept = sorted(merged, key=merged.__getitem__, reverse=True)[:self.capacity]
+            merged = {key: merged[key] for key in kept}
+        self.counts = merged
+        self.errors = {key: merged_errors[key] for key in merged}
+
+
+class TextStats:
+    """
+    Compteurs de mots et de caractères mis à jour bloc par bloc.
+
+    Paramètres
+    ----------
+    top_k : int | None
+        None : comptes exacts de tout le vocabulaire. Sinon, seuls ``top_k``
+        mots sont suivis (Space-Saving) et le nombre de mots différents est
+        estimé (HyperLogLog).
+    """
+
+    def __init__(self, top_k: int | None = None):
+        self.top_k = top_k
+        self.texts = 0
+        self.total_words = 0
+        self.total_chars = 0
+        self.chars: Counter = Counter()
+        self.words: Counter = Counter()
+        self._summary = _SpaceSaving(top_k) if top_k else None
+        self._distinct = _HyperLogLog() if top_k else None
+
+    def update(self, texts: Iterable) -> "TextStats":
+        """Ajoute un bloc de transcriptions (valeurs converties avec ``str``)."""
+        texts = [str(text) for text in texts]
+        if not texts:
+            return self
+        text = " ".join(texts).lower()
+        words = text.split()
+        chars = text.replace(" ", "")
+        self.texts += len(texts)
+        self.total_words += len(words)
+        self.total_chars += len(chars)
+        self.chars.update(chars)
+        if self._summary is None:
+            self.words.update(words)
+        else:
+            chunk = Counter(words)
+            self._distinct.add(list(chunk))
+            self._summary.merge(chunk)
+        return self
+
+    def merge(self, other: "TextStats") -> "TextStats":
+        """Ajoute les comptes d'un résultat partiel (même ``top_k``)."""
+        if other.top_k != self.top_k:
+            raise ValueError("Fusion de statistiques calculées avec des top_k différents")
+        self.texts += other.texts
+        self.total_words += other.total_words
+        self.total_chars += other.total_chars
+        self.chars.update(other.chars)
+        if self._summary is None:
+            self.words.update(other.words)
+        else:
+            self._distinct.merge(other._distinct)
+            self._summary.merge(other._summary.counts, other._summary.errors, other._summary.floor)
+        return self
+
+    @property
+    def exact(self) -> bool:
+        return self._summary is None
+
+    @property
+    def num_words(self) -> int:
+        """Nombre de mots différents (estimé si ``top_k``)."""
+        return len(self.words) if self.exact else self._distinct.estimate()
+
+    @property
+    def num_chars(self) -> int:
+        return len(self.chars)
+
+    def word_counts(self) -> Counter:
+        """Comptes des mots suivis (surestimés d'au plus ``word_errors()`` si ``top_k``)."""
+        return self.words if self.exact else Counter(self._summary.counts)
+
+    def word_errors(self) -> dict[str, int]:
+        return {} if self.exact else dict(self._summary.errors)
+
+    def most_common_words(self, n: int = 10) -> list[tuple[str, int]]:
+        return self.word_counts().most_common(n)
+
+    def most_common_chars(self, n: int = 10) -> list[tuple[str, int]]:
+        return self.chars.most_common(n)
+
+    def to_dict(self) -> dict:
+        data = {
+            "top_k": self.top_k,
+            "texts": self.texts,
+            "total_words": self.total_words,
+            "total_chars": self.total_chars,
+            "chars": dict(self.chars),
+        }
+        if self.exact:
+            data["words"] = dict(self.words)
+        else:
+            data["words"] = self._summary.counts
+            data["word_errors"] = self._summary.errors
+            data["hll_registers"] = self._distinct.registers.tolist()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TextStats":
+        stats = cls(data["top_k"])
+        stats.texts = data["texts"]
+        stats.total_words = data["total_words"]
+        stats.total_chars = data["total_chars"]
+        stats.chars = Counter(data["chars"])
+        if stats.exact:
+            stats.words = Counter(data["words"])
+        else:
+            stats._summary.counts = dict(data["words"])
+            stats._summary.errors = dict(data["word_errors"])
+            stats._distinct.registers = np.asarray(data["hll_registers"], dtype=np.uint8)
+        return stats
+
+    def save(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "TextStats":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def __repr__(self) -> str:
+        mode = "exact" if self.exact else f"top_k={self.top_k}"
+        return f"TextStats({mode}, {self.texts} textes, {self.total_words} mots, {self.num_words} différents)"
+
+
+def iter_text_chunks(source, text_col: str, chunksize: int = CHUNK_SIZE) -> Iterator[list]:
+    """Blocs de transcriptions d'un DataFrame ou d'un TSV (lu par blocs)."""
+    if isinstance(source, pd.DataFrame):
+        values = source[text_col]
+        for start in range(0, len(values), chunksize):
+            yield values.iloc[start:start + chunksize].tolist()
+        return
+    # Même lecture que les notebooks (read_csv sep="\t"), limitée à la colonne utile
+    for chunk in pd.read_csv(source, sep="\t", usecols=[text_col], chunksize=chunksize):
+        yield chunk[text_col].tolist()
+
+
+def _chunk_stats(texts: list, top_k: int | None) -> TextStats:
+    return TextStats(top_k).update(texts)
+
+
+def _merge_ready(stats: TextStats, done: dict, merged: int) -> int:
+    # Fusion dans l'ordre de lecture : les blocs terminés en avance attendent leur tour
+    while merged in done:
+        stats.merge(done.pop(merged))
+        merged += 1
+    return merged
+
+
+def text_stats(source, text_col: str = "raw_text", top_k: int | None = None, chunksize: int = CHUNK_SIZE) -> TextStats:
+    """Statistiques d'un DataFrame ou d'un TSV, bloc par bloc dans ce processus."""
+    stats = TextStats(top_k)
+    for texts in iter_text_chunks(source, text_col, chunksize):
+        stats.update(texts)
+    return stats
+
+
+def stats_from_tsv(
+    paths: list[str],
+    text_col: str = "sentence",
+    top_k: int | None = None,
+    workers: int | None = None,
+    chunksize: int = CHUNK_SIZE,
+) -> TextStats:
+    """
+    Statistiques d'un ou plusieurs TSV (morceaux d'un même corpus).
+
+    Les blocs sont lus ici et comptés sur un pool de processus, au plus
+    ``2 × workers`` à la fois ; les résultats partiels sont fusionnés dans
+    l'ordre de lecture (comptes exacts identiques à un calcul séquentiel).
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = (texts for path in paths for texts in iter_text_chunks(path, text_col, chunksize))
+    stats = TextStats(top_k)
+    if workers <= 1:
+        for texts in chunks:
+            stats.update(texts)
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending, done, merged = {}, {}, 0
+        for position, texts in enumerate(chunks):
+            pending[pool.submit(_chunk_stats, texts, top_k)] = position
+            if len(pending) >= 2 * workers:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done[pending.pop(future)] = future.result()
+                merged = _merge_ready(stats, done, merged)
+        for future, position in pending.items():
+            done[position] = future.result()
+        _merge_ready(stats, done, merged)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="TSV (ou morceaux de TSV) et/ou résultats partiels .json à fusionner")
+    parser.add_argument("--text-column", default="sentence", help="colonne des transcriptions (CommonVoice : sentence)")
+    parser.add_argument("--top-k", type=int, default=None, help="mots suivis en mode approché (défaut : comptes exacts)")
+    parser.add_argument("--workers", type=int, default=None, help="processus de comptage (défaut : tous les cœurs)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE, help="lignes par bloc")
+    parser.add_argument("--output", default=None, help="fichier JSON où sauvegarder le résultat (fusionnable)")
+    args = parser.parse_args()
+
+    tsv_paths = [path for path in args.inputs if not path.endswith(".json")]
+    stats = TextStats(args.top_k)
+    if tsv_paths:
+        stats.merge(stats_from_tsv(tsv_paths, args.text_column, args.top_k, args.workers, args.chunksize))
+    for path in args.inputs:
+        if path.endswith(".json"):
+            stats.merge(TextStats.load(path))
+
+    print(stats)
+    print(f"Nombre de mots différents : {stats.num_words}{'' if stats.exact else ' (estimé)'}")
+    print(f"Nombre de caractères différents : {stats.num_chars}")
+    print(f"Top 10 mots les plus fréquents : {stats.most_common_words(10)}")
+    print(f"Top 10 caractères les plus fréquents : {stats.most_common_chars(10)}")
+    if args.output:
+        stats.save(args.output)
@@ -1,37 +1,165 @@
 import streamlit as st
 import requests
 import json
+import os
+import queue
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from io import BytesIO
-from audiorecorder import audiorecorder
+import av
+import jiwer
+import websocket
+from requests.adapters import HTTPAdapter
+from streamlit_webrtc import webrtc_streamer, WebRtcMode
 
 FASTAPI_URL = "http://fastapi:10300/transcribe"
+FASTAPI_STREAM_URL = f"{FASTAPI_URL}/stream"
+FASTAPI_BATCH_URL = f"{FASTAPI_URL}/batch"
+FASTAPI_WS_URL = "ws://fastapi:10300/transcribe/ws"
 
-# Charger transcriptions CommonVoice
-with open("samples_commonvoice21/transcripts.json", "r", encoding="utf-8") as f:
-    transcripts_commonvoice = json.load(f)
+# Délais HTTP (connexion, lecture) : une API arrêtée ou saturée ne bloque pas l'interface
+CONNECT_TIMEOUT_S = float(os.environ.get("CONNECT_TIMEOUT_S", "5"))
+READ_TIMEOUT_S = float(os.environ.get("READ_TIMEOUT_S", "300"))
+TIMEOUT = (CONNECT_TIMEOUT_S, READ_TIMEOUT_S)
+# Requêtes simultanées maximales de la page d'évaluation (taille du pool de connexions)
+EVAL_MAX_PARALLEL = int(os.environ.get("EVAL_MAX_PARALLEL", "16"))
+
+SAMPLE_SETS = {
+    "VoxPopuli": ("samples_voxpopuli", "*.wav"),
+    "CommonVoice21FR": ("samples_commonvoice21", "*.mp3"),
+}
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Session HTTP partagée par toutes les sessions Streamlit : connexions réutilisées (keep-alive)."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=EVAL_MAX_PARALLEL)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_data
+def load_transcripts(folder: str) -> dict:
+    """Transcriptions de référence d'un dossier de samples (lues une fois, pas à chaque rerun)."""
+    with open(Path(folder) / "transcripts.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@st.cache_data
+def list_samples(folder: str, pattern: str) -> list[str]:
+    """Noms des fichiers audio d'un dossier de samples, triés."""
+    return sorted(path.name for path in Path(folder).glob(pattern))
+
+
+def transcribe_all_samples(folder, sample_names, transcripts):
+    """Transcrit tous les samples en une requête /transcribe/batch et affiche le tableau prédiction / référence."""
+    files = [("files", (name, (Path(folder) / name).read_bytes())) for name in sample_names]
+    progress = st.progress(0.0, text="Transcription des samples...")
+    rows = []
+    # Réponse en flux NDJSON : une ligne par fichier dès qu'il est transcrit
+    with get_session().post(FASTAPI_BATCH_URL, files=files, params={"stream": "true"}, stream=True, timeout=TIMEOUT) as resp:
+        if resp.status_code != 200:
+            st.error(f"Erreur API: {resp.text}")
+            return
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            message = json.loads(line)
+            if "filename" not in message:
+                continue
+            rows.append({
+                "sample": message["filename"],
+                "prédiction": message["error"] or " ".join(seg["text"].strip() for seg in message["segments"]),
+                "référence": transcripts.get(message["filename"], ""),
+            })
+            progress.progress(len(rows) / len(files), text=f"{len(rows)}/{len(files)} samples transcrits")
+    st.dataframe(sorted(rows, key=lambda row: row["sample"]), use_container_width=True)
+
+
+def transcribe_sample(path: Path, tier: str | None) -> dict:
+    """Transcrit un sample avec /transcribe (appelé depuis un thread du pool d'évaluation)."""
+    params = {"tier": tier} if tier else None
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            resp = get_session().post(FASTAPI_URL, files={"file": (path.name, f)}, params=params, timeout=TIMEOUT)
+        latency = time.perf_counter() - start
+        if resp.status_code != 200:
+            return {"sample": path.name, "latency_s": latency, "prediction": None, "error": f"{resp.status_code} {resp.text[:200]}"}
+        segments = resp.json()["segments"]
+        prediction = " ".join(seg["text"].strip() for seg in segments)
+        return {"sample": path.name, "latency_s": latency, "prediction": prediction, "error": None}
+    except requests.RequestException as exc:
+        return {"sample": path.name, "latency_s": time.perf_counter() - start, "prediction": None, "error": str(exc)}
+
+
+def evaluate_samples(folder: str, sample_names: list[str], transcripts: dict, parallel: int, tier: str | None):
+    """
+    Envoie tous les samples à /transcribe, ``parallel`` à la fois, et affiche au fil
+    des réponses la progression, la latence de chaque clip et le WER courant
+    (moyenne par fichier et WER corpus, textes en minuscules comme dans les notebooks).
+    """
+    progress = st.progress(0.0, text="Évaluation des samples...")
+    col_done, col_wer, col_corpus, col_p50, col_p95 = st.columns(5)
+    table = st.empty()
+    rows, wers, latencies = [], [], []
+    errors_total, words_total = 0, 0
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        futures = [pool.submit(transcribe_sample, Path(folder) / name, tier) for name in sample_names]
+        for future in as_completed(futures):
+            result = future.result()
+            reference = str(transcripts.get(result["sample"], "")).lower().strip()
+            row = {"sample": result["sample"], "latence (s)": round(result["latency_s"], 2), "WER": None,
+                   "prédiction": result["prediction"] or result["error"], "référence": reference}
+            if result["error"] is None:
+                latencies.append(result["latency_s"])
+                if reference:
+                    measures = jiwer.process_words(reference, result["prediction"].lower().strip())
+                    row["WER"] = round(measures.wer, 3)
+                    wers.append(measures.wer)
+                    errors_total += measures.substitutions + measures.deletions + measures.insertions
+                    words_total += measures.hits + measures.substitutions + measures.deletions
+            rows.append(row)
+
+            # Mise à jour en direct (depuis le thread du script : Streamlit n'accepte pas d'appels depuis le pool)
+            progress.progress(len(rows) / len(futures), text=f"{len(rows)}/{len(futures)} samples évalués")
+            col_done.metric("Erreurs API", len(rows) - len(latencies))
+            if wers:
+                col_wer.metric("WER moyen", f"{statistics.mean(wers):.3f}")
+                col_corpus.metric("WER corpus", f"{errors_total / words_total:.3f}" if words_total else "-")
+            if latencies:
+                ordered = sorted(latencies)
+                col_p50.metric("Latence p50", f"{ordered[int(0.5 * (len(ordered) - 1))]:.2f} s")
+                col_p95.metric("Latence p95", f"{ordered[int(0.95 * (len(ordered) - 1))]:.2f} s")
+            table.dataframe(rows, use_container_width=True)
+
+    elapsed = time.perf_counter() - start
+    st.caption(f"{len(rows)} samples en {elapsed:.1f} s ({len(rows) / elapsed:.2f} samples/s, {parallel} requêtes simultanées)")
 
-# Charger transcriptions VoxPopuli
-with open("samples_voxpopuli/transcripts.json", "r", encoding="utf-8") as f:
-    transcripts_voxpopuli = json.load(f)
 
 st.title("Démo transcription audio FR")
 
 st.sidebar.header("Modes de test")
 mode = st.sidebar.radio(
     "Choisir une source audio",
-    ["Samples VoxPopuli", "Samples CommonVoice21FR", "Upload fichier", "Microphone"]
+    ["Samples VoxPopuli", "Samples CommonVoice21FR", "Upload fichier", "Microphone", "Évaluer tous les samples"]
 )
 
 # ===================== Mode 1 : VoxPopuli Samples =====================
 if mode == "Samples VoxPopuli":
-    sample_files = list(Path("samples_voxpopuli").glob("*.wav"))
-    choice = st.selectbox("Choisir un sample", [f.name for f in sample_files])
+    sample_names = list_samples("samples_voxpopuli", "*.wav")
+    transcripts_voxpopuli = load_transcripts("samples_voxpopuli")
+    choice = st.selectbox("Choisir un sample", sample_names)
     st.audio(str(Path("samples_voxpopuli") / choice), format="audio/wav")
 
     if st.button("Transcrire ce sample VoxPopuli"):
         with open(Path("samples_voxpopuli") / choice, "rb") as f:
-            resp = requests.post(FASTAPI_URL, files={"file": f})
+            resp = get_session().post(FASTAPI_URL, files={"file": f}, timeout=TIMEOUT)
         if resp.status_code == 200:
             result = resp.json()
             st.subheader("Transcription prédite")
@@ -42,15 +170,19 @@ if mode == "Samples VoxPopuli":
         else:
             st.error(f"Erreur API: {resp.text}")
 
+    if st.button("Transcrire tous les samples VoxPopuli"):
+        transcribe_all_samples("samples_voxpopuli", sample_names, transcripts_voxpopuli)
+
 # ===================== Mode 2 : CommonVoiceFR Samples =====================
 elif mode == "Samples CommonVoice21FR":
-    sample_files = list(Path("samples_commonvoice21").glob("*.mp3"))
-    choice = st.selectbox("Choisir un sample", [f.name for f in sample_files])
+    sample_names = list_samples("samples_commonvoice21", "*.mp3")
+    transcripts_commonvoice = load_transcripts("samples_commonvoice21")
+    choice = st.selectbox("Choisir un sample", sample_names)
     st.audio(str(Path("samples_commonvoice21") / choice), format="audio/mp3")
 
     if st.button("Transcrire ce sample"):
         with open(Path("samples_commonvoice21") / choice, "rb") as f:
-            resp = requests.post(FASTAPI_URL, files={"file": f})
+            resp = get_session().post(FASTAPI_URL, files={"file": f}, timeout=TIMEOUT)
         if resp.status_code == 200:
             result = resp.json()
             st.subheader("Transcription prédite")
@@ -61,43 +193,108 @@ elif mode == "Samples CommonVoice21FR":
         else:
             st.error(f"Erreur API: {resp.text}")
 
+    if st.button("Transcrire tous les samples CommonVoice"):
+        transcribe_all_samples("samples_commonvoice21", sample_names, transcripts_commonvoice)
+
 
 # ===================== Mode 3 : Upload fichier =====================
 elif mode == "Upload fichier":
     uploaded_file = st.file_uploader("Choisir un fichier audio (mp3/wav)", type=["mp3", "wav"])
     if uploaded_file and st.button("Transcrire fichier uploadé"):
-        resp = requests.post(FASTAPI_URL, files={"file": uploaded_file})
-        if resp.status_code == 200:
-            result = resp.json()
-            st.subheader("Transcription prédite")
-            for seg in result["segments"]:
-                st.write(f"[{seg['start']:.1f}s - {seg['end']:.1f}s] {seg['text']}")
-        else:
-            st.error(f"Erreur API: {resp.text}")
+        # Réponse en flux NDJSON : métadonnées puis un segment par ligne
+        with get_session().post(FASTAPI_STREAM_URL, files={"file": uploaded_file}, stream=True, timeout=TIMEOUT) as resp:
+            if resp.status_code == 200:
+                st.subheader("Transcription prédite")
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if "error" in message:
+                        st.error(f"Erreur API: {message['error']}")
+                    elif "duration" in message:
+                        st.caption(f"Durée de l'audio : {message['duration']:.1f}s")
+                    else:
+                        st.write(f"[{message['start']:.1f}s - {message['end']:.1f}s] {message['text']}")
+            else:
+                st.error(f"Erreur API: {resp.text}")
 
 # ===================== Mode 4 : Microphone =====================
 elif mode == "Microphone":
-    st.write("Appuie sur **Start** pour enregistrer, parle, puis **Stop**")
+    st.write("Appuie sur **Start** et parle : la transcription s'affiche pendant l'enregistrement, **Stop** pour terminer")
 
-    audio = audiorecorder("Start", "Stop")
+    webrtc_ctx = webrtc_streamer(
+        key="microphone",
+        mode=WebRtcMode.SENDONLY,
+        audio_receiver_size=256,
+        media_stream_constraints={"video": False, "audio": True},
+    )
 
-    if len(audio) > 0:
-        buf = BytesIO()
-        audio.export(buf, format="wav")
-        buf.seek(0)
+    st.subheader("Transcription")
+    # Les énoncés finalisés survivent au rerun déclenché par Stop
+    if "mic_finals" not in st.session_state:
+        st.session_state.mic_finals = []
+    final_box = st.empty()
+    partial_box = st.empty()
+    final_box.write(" ".join(st.session_state.mic_finals))
 
-        st.audio(buf, format="audio/wav")
+    if webrtc_ctx.audio_receiver:
+        finals = st.session_state.mic_finals = []
+        final_box.empty()
+        try:
+            # Le micro est envoyé au fil de l'eau au WebSocket (PCM 16 bits, mono, 16 kHz)
+            ws = websocket.create_connection(FASTAPI_WS_URL, timeout=CONNECT_TIMEOUT_S)
+        except (websocket.WebSocketException, OSError) as exc:
+            # Handshake refusé (1013 : modèle en cours de chargement) ou API injoignable
+            st.error(f"Connexion au service de transcription impossible : {exc}")
+        else:
+            resampler = av.AudioResampler(format="s16", layout="mono", rate=16000)
+            try:
+                try:
+                    ws.settimeout(0.05)
+                    while webrtc_ctx.state.playing:
+                        try:
+                            frames = webrtc_ctx.audio_receiver.get_frames(timeout=1)
+                        except queue.Empty:
+                            continue
+                        for frame in frames:
+                            for resampled in resampler.resample(frame):
+                                ws.send_binary(resampled.to_ndarray().tobytes())
 
-        resp = requests.post(
-            FASTAPI_URL,
-            files={"file": ("record.wav", buf, "audio/wav")}
-        )
+                        # Lire les hypothèses déjà disponibles sans bloquer l'envoi de l'audio
+                        while True:
+                            try:
+                                message = json.loads(ws.recv())
+                            except websocket.WebSocketTimeoutException:
+                                break
+                            if message["type"] == "partial":
+                                partial_box.caption(message["text"])
+                            elif message["type"] == "final":
+                                finals.append(message["text"])
+                                final_box.write(" ".join(finals))
+                                partial_box.empty()
+                finally:
+                    # Stop (ou rerun qui interrompt la boucle) : "end" fait décoder le dernier énoncé,
+                    # lu jusqu'au message de fin ; seul session_state est modifié ici
+                    ws.settimeout(READ_TIMEOUT_S)
+                    ws.send("end")
+                    while (message := json.loads(ws.recv()))["type"] != "end":
+                        if message["type"] == "final":
+                            finals.append(message["text"])
+            except (websocket.WebSocketConnectionClosedException, websocket.WebSocketTimeoutException, OSError):
+                st.warning("Connexion interrompue par le service de transcription.")
+            finally:
+                ws.close()
+            final_box.write(" ".join(finals))
+            partial_box.empty()
 
-        if resp.status_code == 200:
-            result = resp.json()
-            text = " ".join([seg["text"] for seg in result["segments"]])
-            st.subheader("Transcription")
-            st.write(text)
-        else:
-            st.error(f"Erreur API: {resp.text}")
+# ===================== Mode 5 : Évaluation de tous les samples =====================
+elif mode == "Évaluer tous les samples":
+    st.write("Transcrit tout un jeu de samples avec des requêtes `/transcribe` simultanées et compare chaque prédiction à sa référence.")
+    dataset = st.selectbox("Jeu de samples", list(SAMPLE_SETS))
+    folder, pattern = SAMPLE_SETS[dataset]
+    sample_names = list_samples(folder, pattern)
+    parallel = st.slider("Requêtes simultanées", 1, EVAL_MAX_PARALLEL, min(4, EVAL_MAX_PARALLEL))
+    tier = st.selectbox("Niveau de décodage", ["(défaut)", "quality", "balanced", "fast", "greedy"])
 
+    if st.button(f"Évaluer les {len(sample_names)} samples {dataset}"):
+        evaluate_samples(folder, sample_names, load_transcripts(folder), parallel, None if tier == "(défaut)" else tier)